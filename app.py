@@ -8,7 +8,7 @@ from sqlalchemy import text
 app = create_app()
 
 # Initialize migration engine
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, render_as_batch=True)
 
 # Define a CLI command to initialize the database and SuperAdmin
 @app.cli.command("init_db")
@@ -17,6 +17,18 @@ bcrypt = Bcrypt()
 csrf = CSRFProtect()
 bootstrap = Bootstrap5()
 
+from app.image_jobs import ImageJobQueue
+image_jobs = ImageJobQueue()
+
+from app.login_guard import LoginGuard
+login_guard = LoginGuard()
+
+from app.metrics import RequestMetrics
+request_metrics = RequestMetrics()
+
+from app.nplusone import QueryDetector
+query_detector = QueryDetector()
+
 
 def create_app(config_class=Config):
     """Application factory."""
@@ -25,13 +37,24 @@ def create_app(config_class=Config):
 
     os.makedirs(app.instance_path, exist_ok=True)
 
+    # Engine profile: pool sizing, pre-ping for server databases
+    from app.database import engine_options, apply_sqlite_pragmas
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
     # Initialize extensions
     db.init_app(app)
-    migrate.init_app(app, db)
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+    # Batch mode lets Alembic alter SQLite tables (copy-and-move)
+    migrate.init_app(app, db, render_as_batch=True)
     login_manager.init_app(app)
     bcrypt.init_app(app)
     csrf.init_app(app)
     bootstrap.init_app(app)
+    image_jobs.init_app(app)
+    login_guard.init_app(app)
+    request_metrics.init_app(app)
+    query_detector.init_app(app)
 
     # Register blueprints
     from app.main import bp as main_bp
@@ -45,18 +68,26 @@ def create_app(config_class=Config):
 
     from app.supplier import bp as supplier_bp
     app.register_blueprint(supplier_bp) 
+
+    from app.api import bp as api_bp
+    app.register_blueprint(api_bp)
         
     # Flask-Login settings
     login_manager.login_view = 'main.login'
     login_manager.login_message_category = 'info'
 
-    # Setup user loader
-    from app.models import User
+    # Setup user loader (served from the snapshot cache, see app/cache.py)
+    from app.cache import user_cache
+    user_cache.init_app(app)
+
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return user_cache.load(user_id)
 
     from app import models  # Ensure models are loaded
+    from app import search  # Registers the FTS index sync events
+    from app import dashboard  # Registers the dashboard counter events
+    from app import versions  # Bumps TableVersion counters on catalog writes
 
     # Register CLI commands
     from app.cli import register_cli_commands
@@ -0,0 +1,7 @@
+# app/api/__init__.py
+
+from flask import Blueprint
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+from . import routes
@@ -0,0 +1,410 @@
+# app/api/routes.py
+
+import hmac
+import zlib
+from flask import current_app, g, jsonify, request, url_for
+from flask_login import current_user
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only, selectinload
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import BadRequest, Forbidden, HTTPException, NotFound, Unauthorized
+from app import csrf, db
+from app.api import bp
+from app.cache import current_versions
+from app.forms import ProductForm, SupplierForm, UniqueFieldsMixin
+from app.inventory import batches
+from app.models import Product, Supplier, product_color_association
+from app.product.routes import MODELS, populate_product_choices
+from app.uniqueness import CASE_INSENSITIVE_COLUMNS, existing_values, fold_value
+from app.utils import keyset_paginate
+
+# Versioned JSON API over the catalog models. Reads are keyset-paginated by id and accept
+# a sparse fieldset (?fields=id,name). Writes are validated by the same WTForms classes as
+# the HTML views. Every response carries a weak ETag built from the resource's TableVersion
+# counter (app/versions.py), so a matching If-None-Match is answered with 304 after one
+# small version lookup, before any row is loaded or serialized.
+
+
+class Resource:
+    """How one model is exposed: its fields, the form validating writes, who may write."""
+
+    def __init__(self, model, name, form_class, natural_key=None, prepare_form=None,
+                 write_roles=(1,), collections=None):
+        self.model = model
+        # TableVersion name (also the URL segment)
+        self.name = name
+        self.form_class = form_class
+        # Unique column a bulk upsert may match existing rows on, besides the id
+        self.natural_key = natural_key
+        self.prepare_form = prepare_form
+        # Roles that may write through a session; mirrors the HTML views' decorators
+        self.write_roles = write_roles
+        # Many-to-many fields exposed as id lists: name -> (association table, own fk, other fk)
+        self.collections = collections or {}
+        self.columns = [column.key for column in model.__table__.columns]
+        self.fields = self.columns + list(self.collections)
+
+    def writable_fields(self, form):
+        return [name for name in self.fields if name != 'id' and name in form._fields]
+
+
+RESOURCES = {
+    'products': Resource(Product, 'products', ProductForm, prepare_form=populate_product_choices,
+                         write_roles=(0, 1),
+                         collections={'colors': (product_color_association, 'product_id', 'color_id')}),
+    'suppliers': Resource(Supplier, 'suppliers', SupplierForm, natural_key='name'),
+}
+for model, route_name, form_class in MODELS:
+    RESOURCES[route_name] = Resource(model, route_name, form_class, natural_key='name')
+
+
+# --- Authentication and errors ---
+
+# Token clients cannot carry a CSRF token; session clients are checked in authenticate()
+csrf.exempt(bp)
+
+
+@bp.before_request
+def authenticate():
+    """
+    Machine clients send `Authorization: Bearer <API_TOKEN>`. Otherwise the request needs
+    a logged-in Admin or SuperAdmin session and, for writes, the X-CSRFToken header.
+    """
+    token = current_app.config['API_TOKEN']
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer '):
+        if not hmac.compare_digest(header[7:].encode(), token.encode()):
+            raise Unauthorized('Invalid API token.')
+        g.api_token = True
+        return
+    if not current_user.is_authenticated:
+        raise Unauthorized('Log in or send a bearer token.')
+    if current_user.role not in (0, 1):
+        raise Forbidden()
+    if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        csrf.protect()
+    g.api_token = False
+
+
+@bp.errorhandler(HTTPException)
+def json_error(error):
+    return jsonify(error=error.name, message=error.description), error.code
+
+
+def validation_error(errors):
+    return jsonify(error='Unprocessable Entity', message='Validation failed.', errors=errors), 422
+
+
+def get_resource(name, write=False):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        raise NotFound(f"Unknown resource '{name}'.")
+    if write and not g.api_token and current_user.role not in resource.write_roles:
+        raise Forbidden(f"Your role cannot modify {name}.")
+    return resource
+
+
+# --- Representations ---
+
+def requested_fields(resource):
+    """The ?fields= sparse fieldset (id is always included), or every field."""
+    raw = request.args.get('fields', '')
+    if not raw.strip():
+        return resource.fields
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in resource.fields]
+    if unknown:
+        raise BadRequest(f"Unknown field(s) for {resource.name}: {', '.join(unknown)}.")
+    return ['id'] + [name for name in fields if name != 'id']
+
+
+def load_collections(resource, fields, ids):
+    """{field: {item id: [related ids]}} for the requested collections, one query each."""
+    loaded = {}
+    for name in fields:
+        if name not in resource.collections:
+            continue
+        table, own, other = resource.collections[name]
+        values = {}
+        for chunk in batches(ids):
+            for item_id, related_id in db.session.execute(
+                    select(table.c[own], table.c[other]).where(table.c[own].in_(chunk))
+                    .order_by(table.c[own], table.c[other])):
+                values.setdefault(item_id, []).append(related_id)
+        loaded[name] = values
+    return loaded
+
+
+def serialize(resource, items, fields):
+    collections = load_collections(resource, fields, [item.id for item in items])
+    return [
+        {name: collections[name].get(item.id, []) if name in collections else getattr(item, name)
+         for name in fields}
+        for item in items
+    ]
+
+
+def column_query(resource, fields):
+    """Query loading only the requested columns."""
+    model = resource.model
+    columns = [getattr(model, name) for name in fields if name in resource.columns]
+    return model.query.options(load_only(*columns))
+
+
+# --- ETags ---
+
+def current_etag(resource):
+    """
+    Weak validator for this request's representation: the resource's version plus a hash
+    of the path and query string (page, fields), so any write to the table changes it.
+    """
+    version = current_versions().get(resource.name, 0)
+    return f"{resource.name}.{version}.{zlib.crc32(request.full_path.encode()):08x}"
+
+
+def not_modified(etag):
+    """A bodiless 304 if the client already holds `etag`, else None."""
+    if request.if_none_match.contains_weak(etag):
+        return with_etag(current_app.response_class(status=304), etag)
+    return None
+
+
+def with_etag(response, etag):
+    response.set_etag(etag, weak=True)
+    # Clients may keep the body but must revalidate before reusing it
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+# --- Writes ---
+
+def build_form(resource, payload, item=None, check_unique=True):
+    """
+    The resource's form bound to a JSON object. For updates, the stored values are merged
+    under the payload first, so a partial object only changes the fields it names.
+    With `check_unique` False the caller checks the unique fields itself (bulk writes).
+    """
+    data = {}
+    if item is not None:
+        data = {name: getattr(item, name) for name in resource.columns}
+        for name in resource.collections:
+            data[name] = [related.id for related in getattr(item, name)]
+    data.update(payload)
+    formdata = MultiDict()
+    for name, value in data.items():
+        # Unchecked booleans and empty values are simply absent, as in a browser post
+        if name == 'id' or value is None or value is False:
+            continue
+        for single in (value if isinstance(value, (list, tuple)) else [value]):
+            formdata.add(name, 'y' if single is True else str(single))
+    form = resource.form_class(formdata=formdata, meta={'csrf': False})
+    if isinstance(form, UniqueFieldsMixin):
+        form.unique_model = resource.model
+        form.original = item
+        form.check_unique = check_unique
+    if resource.prepare_form:
+        resource.prepare_form(form)
+    return form
+
+
+def unknown_keys(resource, form, payload, allow_id=False):
+    allowed = set(resource.writable_fields(form)) | ({'id'} if allow_id else set())
+    return sorted(set(payload) - allowed)
+
+
+def json_payload():
+    payload = request.get_json(silent=True)
+    if payload is None:
+        raise BadRequest('Expected a JSON body (Content-Type: application/json).')
+    return payload
+
+
+def save(resource, item, form, status):
+    is_new = item is None
+    if is_new:
+        item = resource.model()
+        db.session.add(item)
+    form.populate_obj(item)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify(error='Conflict', message='A unique value is already taken.'), 409
+    response = jsonify(serialize(resource, [item], resource.fields)[0])
+    response.status_code = status
+    if is_new:
+        response.headers['Location'] = url_for('api.get_item', resource_name=resource.name, item_id=item.id)
+    return response
+
+
+# --- Endpoints ---
+
+@bp.route('/', methods=['GET'])
+def index():
+    """The available resources with their fields and current versions."""
+    versions = current_versions()
+    return jsonify({
+        name: {'url': url_for('api.list_items', resource_name=name), 'fields': resource.fields,
+               'version': versions.get(name, 0)}
+        for name, resource in RESOURCES.items()
+    })
+
+
+@bp.route('/<resource_name>', methods=['GET'])
+def list_items(resource_name):
+    """One keyset page (?after=<cursor>&per_page=&fields=), ordered by id."""
+    resource = get_resource(resource_name)
+    fields = requested_fields(resource)
+    etag = current_etag(resource)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    per_page = request.args.get('per_page', current_app.config['API_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['API_MAX_PER_PAGE']))
+    items, next_cursor = keyset_paginate(column_query(resource, fields), (resource.model.id,),
+                                         request.args.get('after'), per_page)
+
+    body = {'data': serialize(resource, items, fields), 'next_cursor': next_cursor}
+    if next_cursor:
+        body['next'] = url_for('api.list_items', resource_name=resource.name, after=next_cursor,
+                               per_page=per_page, fields=request.args.get('fields') or None)
+    return with_etag(jsonify(body), etag)
+
+
+@bp.route('/<resource_name>/<int:item_id>', methods=['GET'])
+def get_item(resource_name, item_id):
+    resource = get_resource(resource_name)
+    fields = requested_fields(resource)
+    etag = current_etag(resource)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    item = column_query(resource, fields).filter(resource.model.id == item_id).first()
+    if item is None:
+        raise NotFound(f"No {resource.name} item with id {item_id}.")
+    return with_etag(jsonify(serialize(resource, [item], fields)[0]), etag)
+
+
+@bp.route('/<resource_name>', methods=['POST'])
+def create_item(resource_name):
+    resource = get_resource(resource_name, write=True)
+    payload = json_payload()
+    if not isinstance(payload, dict):
+        raise BadRequest('Expected a JSON object.')
+    form = build_form(resource, payload)
+    unknown = unknown_keys(resource, form, payload)
+    if unknown:
+        raise BadRequest(f"Unknown or read-only field(s): {', '.join(unknown)}.")
+    if not form.validate():
+        return validation_error(form.errors)
+    return save(resource, None, form, 201)
+
+
+@bp.route('/<resource_name>/<int:item_id>', methods=['PATCH'])
+def update_item(resource_name, item_id):
+    resource = get_resource(resource_name, write=True)
+    payload = json_payload()
+    if not isinstance(payload, dict):
+        raise BadRequest('Expected a JSON object.')
+    item = db.session.get(resource.model, item_id)
+    if item is None:
+        raise NotFound(f"No {resource.name} item with id {item_id}.")
+    form = build_form(resource, payload, item)
+    unknown = unknown_keys(resource, form, payload)
+    if unknown:
+        raise BadRequest(f"Unknown or read-only field(s): {', '.join(unknown)}.")
+    if not form.validate():
+        return validation_error(form.errors)
+    return save(resource, item, form, 200)
+
+
+@bp.route('/<resource_name>/bulk', methods=['POST'])
+def bulk_upsert(resource_name):
+    """
+    Creates or updates up to API_BULK_LIMIT items ({"items": [...]} or a bare list) in one
+    transaction. An item with an "id" updates that row; otherwise one matching on the
+    natural key (e.g. "name"), if the resource has one, is updated, else a row is created.
+    Items are all validated first; any error rejects the whole batch (422, keyed by index).
+    """
+    resource = get_resource(resource_name, write=True)
+    payload = json_payload()
+    items = payload.get('items') if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not all(isinstance(entry, dict) for entry in items):
+        raise BadRequest('Expected a list of JSON objects.')
+    if len(items) > current_app.config['API_BULK_LIMIT']:
+        raise BadRequest(f"At most {current_app.config['API_BULK_LIMIT']} items per request.")
+
+    # Existing rows for the whole batch: one IN lookup per batch of ids / natural keys
+    model = resource.model
+    query = model.query.options(*(selectinload(getattr(model, name)) for name in resource.collections))
+    by_id, by_key = {}, {}
+    for chunk in batches([entry['id'] for entry in items if entry.get('id') is not None]):
+        by_id.update((item.id, item) for item in query.filter(model.id.in_(chunk)))
+    natural_key = resource.natural_key
+    if natural_key:
+        # Same comparison as the uniqueness checks, so 'red' updates a stored 'Red'
+        key_column = getattr(model, natural_key)
+        if natural_key in CASE_INSENSITIVE_COLUMNS:
+            key_column = func.lower(key_column)
+        keys = {fold_value(natural_key, entry.get(natural_key))
+                for entry in items if entry.get('id') is None}
+        for chunk in batches([key for key in keys if key is not None]):
+            by_key.update((fold_value(natural_key, getattr(item, natural_key)), item)
+                          for item in query.filter(key_column.in_(chunk)))
+
+    errors, validated = {}, []
+    with db.session.no_autoflush:
+        for index, entry in enumerate(items):
+            if entry.get('id') is not None:
+                item = by_id.get(entry['id'])
+                if item is None:
+                    errors[index] = {'id': [f"No {resource.name} item with id {entry['id']}."]}
+                    continue
+            else:
+                item = by_key.get(fold_value(natural_key, entry.get(natural_key))) if natural_key else None
+            form = build_form(resource, entry, item, check_unique=False)
+            unknown = unknown_keys(resource, form, entry, allow_id=True)
+            if unknown:
+                errors[index] = {name: ['Unknown or read-only field.'] for name in unknown}
+            elif not form.validate():
+                errors[index] = form.errors
+            else:
+                validated.append((index, item, form))
+
+    # Unique values of the whole batch in one query, rather than one per entry
+    checked = [(index, form) for index, _, form in validated if isinstance(form, UniqueFieldsMixin)]
+    wanted = {}
+    for _, form in checked:
+        for name, value in form.unique_values().items():
+            wanted.setdefault(name, []).append(value)
+    if wanted:
+        found = existing_values(model, wanted)
+        for index, form in checked:
+            if form.flag_taken(found):
+                errors[index] = form.errors
+    if errors:
+        return validation_error(errors)
+
+    created, saved = 0, []
+    try:
+        with db.session.no_autoflush:
+            for _, item, form in validated:
+                if item is None:
+                    item = model()
+                    db.session.add(item)
+                    created += 1
+                form.populate_obj(item)
+                saved.append(item)
+        # Ids are read after the flush, before commit expires every saved row
+        db.session.flush()
+        ids = [item.id for item in saved]
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify(error='Conflict', message='A unique value is already taken (or repeated in the batch).'), 409
+
+    return jsonify(created=created, updated=len(saved) - created, ids=ids)
@@ -0,0 +1,78 @@
+# app/audit.py
+
+from sqlalchemy import select, text, tuple_
+from app import db
+from app.models import (User, Supplier, Product, ProductImage, ImageDerivative,
+                        ProductVariant, StockMovement, product_color_association)
+
+
+def known_queries():
+    """
+    Representative statements for the app's hot paths, as (label, statement).
+    Parameter values are placeholders; only the plan shape matters.
+    """
+    return [
+        ('login: user by username', select(User).where(User.username == 'admin')),
+        ('login: user by email', select(User).where(User.email == 'admin@example.com')),
+        ('product list: first page',
+         select(Product).order_by(Product.name, Product.id).limit(51)),
+        ('product list: next page',
+         select(Product).where(tuple_(Product.name, Product.id) > tuple_('m', 1))
+         .order_by(Product.name, Product.id).limit(51)),
+        ('browse: filter by style', select(Product.id).where(Product.style_id == 1)),
+        ('browse: filter by category', select(Product.id).where(Product.category_id == 1)),
+        ('browse: filter by brand', select(Product.id).where(Product.brand_id == 1)),
+        ('browse: filter by material', select(Product.id).where(Product.material_id == 1)),
+        ('browse: filter by supplier', select(Product.id).where(Product.supplier_id == 1)),
+        ('browse: filter by color',
+         select(product_color_association.c.product_id)
+         .where(product_color_association.c.color_id == 1)),
+        ('product colors',
+         select(product_color_association.c.color_id)
+         .where(product_color_association.c.product_id == 1)),
+        ('edit product: image by type',
+         select(ProductImage).where(ProductImage.product_id == 1, ProductImage.type == 'base')),
+        ('image dedup: by content hash',
+         select(ProductImage).where(ProductImage.content_hash == '0' * 64,
+                                    ProductImage.status == 'ready')),
+        ('image derivatives (selectin)',
+         select(ImageDerivative).where(ImageDerivative.image_id.in_([1, 2, 3]))),
+        ('supplier products', select(Product).where(Product.supplier_id == 1)),
+        ('supplier by name', select(Supplier).where(Supplier.name == 'x')),
+        ('product variants', select(ProductVariant).where(ProductVariant.product_id == 1)),
+        ('variant by SKU', select(ProductVariant.id).where(ProductVariant.sku.in_(['A-1', 'A-2']))),
+        ('variant stock history',
+         select(StockMovement).where(StockMovement.variant_id == 1)
+         .order_by(StockMovement.id.desc()).limit(50)),
+    ]
+
+
+def explain(statement):
+    """Returns the EXPLAIN QUERY PLAN detail lines for a SQLAlchemy statement (SQLite)."""
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).all()
+    # Rows are (id, parent, notused, detail)
+    return [row[-1] for row in rows]
+
+
+def plan_problems(details):
+    """
+    Flags plan steps that read a whole table: 'SCAN <table>' without an index, and
+    temp B-trees for ORDER BY/GROUP BY (a sort over every matching row).
+    """
+    problems = []
+    for detail in details:
+        if detail.startswith('SCAN ') and ' USING ' not in detail:
+            problems.append(detail)
+        elif detail.startswith('USE TEMP B-TREE'):
+            problems.append(detail)
+    return problems
+
+
+def audit_queries():
+    """Runs the audit. Returns [(label, details, problems)] for every known query."""
+    results = []
+    for label, statement in known_queries():
+        details = explain(statement)
+        results.append((label, details, plan_problems(details)))
+    return results
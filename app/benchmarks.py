@@ -0,0 +1,364 @@
+# app/benchmarks.py
+
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from app.utils import percentile
+
+
+@contextmanager
+def scratch_app(base_config, **overrides):
+    """
+    Yields an app built from `base_config` but bound to a throw-away SQLite database and
+    upload folder, with CSRF off, so benchmarks never touch real data.
+    """
+    from app import create_app, db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = dict(
+            TESTING=True,
+            WTF_CSRF_ENABLED=False,
+            SECRET_KEY='benchmark',
+            SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(tmp, 'bench.sqlite'),
+            UPLOAD_FOLDER=os.path.join(tmp, 'uploads'),
+        )
+        settings.update(overrides)
+        config_class = type('BenchmarkConfig', (base_config,), settings)
+
+        app = create_app(config_class)
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.engine.dispose()
+
+
+def run_login_benchmark(app, threads, seconds, password='bench-password'):
+    """
+    Drives POST /login from `threads` clients for `seconds`, each as its own user and IP.
+    Returns logins/sec and latency percentiles (ms) for successful logins.
+    """
+    from app import db
+    from app.models import User
+
+    for i in range(threads):
+        if not User.query.filter_by(username=f'bench{i}').first():
+            user = User(role=1, name=f'Bench {i}', username=f'bench{i}', email=f'bench{i}@example.com')
+            user.set_password(password)
+            db.session.add(user)
+    db.session.commit()
+
+    latencies = [[] for _ in range(threads)]
+    statuses = [dict() for _ in range(threads)]
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        environ = {'REMOTE_ADDR': f'10.0.{index // 250}.{index % 250 + 1}'}
+        while time.perf_counter() < deadline:
+            client = app.test_client()
+            started = time.perf_counter()
+            response = client.post('/login', environ_base=environ,
+                                   data={'username': f'bench{index}', 'password': password})
+            elapsed = time.perf_counter() - started
+            statuses[index][response.status_code] = statuses[index].get(response.status_code, 0) + 1
+            if response.status_code == 302:
+                latencies[index].append(elapsed * 1000)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [ms for per_thread in latencies for ms in per_thread]
+    status_counts = {}
+    for per_thread in statuses:
+        for code, n in per_thread.items():
+            status_counts[code] = status_counts.get(code, 0) + n
+    return {
+        'logins_per_sec': len(all_latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(all_latencies, 50),
+        'p95_ms': percentile(all_latencies, 95),
+        'p99_ms': percentile(all_latencies, 99),
+        'statuses': status_counts,
+    }
+
+
+def run_stuffing_benchmark(app, attempts):
+    """
+    Fires `attempts` wrong-password logins at one account from one IP and reports how many
+    were rejected by the throttle (429) and the rejection throughput.
+    """
+    client = app.test_client()
+    environ = {'REMOTE_ADDR': '192.0.2.1'}
+    rejected = 0
+    started = time.perf_counter()
+    for i in range(attempts):
+        response = client.post('/login', environ_base=environ,
+                               data={'username': 'bench0', 'password': f'guess-{i}'})
+        rejected += response.status_code == 429
+    elapsed = time.perf_counter() - started
+    return {
+        'attempts': attempts,
+        'rejected': rejected,
+        'attempts_per_sec': attempts / elapsed if elapsed else 0.0,
+    }
+
+
+# --- Application benchmark suite (flask bench_app) ---
+
+BENCH_PASSWORD = 'bench-password'
+
+
+def synthetic_jpeg(size=(1600, 1200), seed=0):
+    """JPEG bytes of a generated photo (a gradient, so it compresses like a real one)."""
+    import io
+    from PIL import Image
+
+    width, height = size
+    image = Image.linear_gradient('L').resize(size).convert('RGB')
+    image.paste((seed * 37 % 256, 80, 160), (width // 4, height // 4, width // 2, height // 2))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def seed_dataset(products=1000, suppliers=50, colors=20, images_per_product=2, users=10,
+                 reference_rows=10, seed=0, chunk_size=1000):
+    """
+    Fills the current database with a synthetic catalog through the models in app/models.py:
+    reference tables, suppliers, colors, users (one Admin 'bench-admin' plus moderators),
+    products with 1-3 colors each and image rows with derivative records (no files).
+    Deterministic for a given seed. Returns the counts created.
+    """
+    import random
+    from app import db
+    from app.models import (User, Style, Category, Brand, Material, Color, Supplier, Product,
+                            ProductImage, ImageDerivative)
+
+    rng = random.Random(seed)
+    admin = User(role=1, name='Bench Admin', username='bench-admin', email='bench-admin@example.com')
+    admin.set_password(BENCH_PASSWORD)
+    db.session.add(admin)
+    # Other users share one hash; hashing each at the production cost would dominate seeding
+    for i in range(users - 1):
+        user = User(role=2, name=f'Bench User {i}', username=f'bench-user{i}',
+                    email=f'bench-user{i}@example.com', password_hash=admin.password_hash)
+        db.session.add(user)
+
+    reference = {}
+    for model in (Style, Category, Brand, Material):
+        rows = [model(name=f'{model.__name__} {i}') for i in range(reference_rows)]
+        db.session.add_all(rows)
+        reference[model] = rows
+    color_rows = [Color(name=f'Color {i}', hex_code=f'#{rng.randrange(0x1000000):06x}') for i in range(colors)]
+    supplier_rows = [Supplier(name=f'Supplier {i}', phone=f'0170000{i:04d}', supplier_type=i % 2 + 1,
+                              contact_person=f'Contact {i}') for i in range(suppliers)]
+    db.session.add_all(color_rows + supplier_rows)
+    db.session.commit()
+
+    sizes = (96, 320, 800)
+    for start in range(0, products, chunk_size):
+        for i in range(start, min(start + chunk_size, products)):
+            product = Product(
+                name=f'{rng.choice(["Tote", "Backpack", "Clutch", "Satchel", "Duffel"])} {i:06d}',
+                description=f'Synthetic product {i} for benchmarks.',
+                keywords='bag, leather, synthetic',
+                style=rng.choice(reference[Style]), category=rng.choice(reference[Category]),
+                brand=rng.choice(reference[Brand]), material=rng.choice(reference[Material]),
+                supplier=rng.choice(supplier_rows),
+                colors=rng.sample(color_rows, rng.randint(1, min(3, colors))),
+            )
+            for n in range(images_per_product):
+                content_hash = f'{seed:08x}{i:024x}{n:032x}'
+                folder = f'{content_hash[:2]}/{content_hash}'
+                product.images.append(ProductImage(
+                    type='base' if n == 0 else 'additional', content_hash=content_hash,
+                    file_path=f'{folder}/800.jpg', status='ready',
+                    derivatives=[ImageDerivative(width=w, format=f, file_path=f'{folder}/{w}.{ext}')
+                                 for w in sizes for f, ext in (('webp', 'webp'), ('jpeg', 'jpg'))],
+                ))
+            db.session.add(product)
+        db.session.commit()
+        # Keep the identity map (and so memory) flat while seeding large catalogs
+        db.session.expunge_all()
+
+    return {'products': products, 'suppliers': suppliers, 'colors': colors,
+            'images': products * images_per_product, 'users': users,
+            'reference_rows': reference_rows}
+
+
+def app_scenarios(app):
+    """
+    The request mix measured by bench_app, as {name: callable(client, i) -> response}.
+    Ids refer to rows created by seed_dataset.
+    """
+    import io
+    from app import db
+    from app.models import Product, Style, Color
+    from app.utils import encode_cursor
+
+    with app.app_context():
+        # Cursor of the middle of the catalog, so paging cost at depth is measured too
+        total = db.session.query(Product.id).count()
+        middle = db.session.query(Product.name, Product.id).order_by(Product.name, Product.id) \
+            .offset(total // 2).first()
+        deep_cursor = encode_cursor(middle) if middle is not None else ''
+        product_ids = [row[0] for row in db.session.query(Product.id).order_by(Product.id).limit(100)]
+        style_ids = [row[0] for row in db.session.query(Style.id).order_by(Style.id)]
+        color_ids = [row[0] for row in db.session.query(Color.id).order_by(Color.id).limit(2)]
+        product_fields = {column: getattr(db.session.get(Product, product_ids[0]), column)
+                          for column in ('style_id', 'category_id', 'brand_id', 'material_id', 'supplier_id')}
+    photo = synthetic_jpeg()
+
+    def login(client, i):
+        return app.test_client().post('/login', environ_base={'REMOTE_ADDR': f'10.1.{i // 250}.{i % 250 + 1}'},
+                                      data={'username': 'bench-admin', 'password': BENCH_PASSWORD})
+
+    def list_products(client, i):
+        return client.get('/products/')
+
+    def list_products_deep_page(client, i):
+        return client.get('/products/', query_string={'after': deep_cursor})
+
+    def edit_product_form(client, i):
+        return client.get(f'/products/edit/{product_ids[i % len(product_ids)]}')
+
+    def edit_product_with_image(client, i):
+        data = dict(product_fields, name=f'Bench edit {i}', description='Edited by the benchmark.',
+                    colors=color_ids, base_photo=(io.BytesIO(photo), f'bench-{i}.jpg'))
+        return client.post(f'/products/edit/{product_ids[i % len(product_ids)]}', data=data,
+                           content_type='multipart/form-data')
+
+    def list_suppliers(client, i):
+        return client.get('/suppliers/')
+
+    def list_styles(client, i):
+        return client.get('/products/styles')
+
+    def edit_style(client, i):
+        style_id = style_ids[i % len(style_ids)]
+        return client.post(f'/products/styles/edit/{style_id}', data={'name': f'Style {style_id} r{i}'})
+
+    return {
+        'login': login,
+        'list_products': list_products,
+        'list_products_deep_page': list_products_deep_page,
+        'edit_product_form': edit_product_form,
+        'edit_product_with_image': edit_product_with_image,
+        'list_suppliers': list_suppliers,
+        'list_styles': list_styles,
+        'edit_style': edit_style,
+    }
+
+
+def run_scenario(app, client, scenario, iterations, warmup=2):
+    """
+    Runs one scenario `iterations` times (after `warmup` unmeasured runs) and returns latency
+    percentiles (ms), queries per request, status counts and peak traced allocation (KiB).
+    An exception escaping the view (TESTING propagates them) counts as status 'error'.
+    """
+    import tracemalloc
+    from app import db
+    from app.nplusone import record_queries
+
+    def call(i):
+        # A fresh app context per request: the client would otherwise reuse the caller's,
+        # and with it `g` (the logged-in user, cached lookups) from the previous request
+        try:
+            with app.app_context():
+                return scenario(client, i).status_code
+        except Exception:
+            db.session.rollback()
+            return 'error'
+
+    for i in range(warmup):
+        call(i)
+
+    latencies, queries, statuses = [], [], {}
+    tracemalloc.start()
+    try:
+        for i in range(warmup, warmup + iterations):
+            with record_queries() as log:
+                started = time.perf_counter()
+                status = call(i)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(log.count)
+            statuses[status] = statuses.get(status, 0) + 1
+        peak_alloc = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'requests': iterations,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': sum(latencies) / len(latencies) if latencies else 0.0,
+        'queries_per_request': sum(queries) / len(queries) if queries else 0.0,
+        'max_queries': max(queries, default=0),
+        'statuses': {str(code): n for code, n in sorted(statuses.items(), key=lambda item: str(item[0]))},
+        'peak_alloc_kb': peak_alloc // 1024,
+    }
+
+
+def run_app_benchmark(base_config, dataset, iterations, only=None):
+    """
+    Seeds a scratch database with `dataset` (seed_dataset keyword arguments), logs in as the
+    benchmark admin and measures every scenario. Returns a JSON-serializable result.
+    """
+    import platform
+    import subprocess
+    from datetime import datetime, timezone
+    from app.file_utils import peak_rss_kb
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    # Throttle off (the suite logs in many times from few addresses); images processed inline
+    # so their Pillow time is part of the request being measured
+    with scratch_app(base_config, LOGIN_THROTTLE_ENABLED=False, IMAGE_WORKERS=0,
+                     REQUEST_LOG_ENABLED=False) as app:
+        seeding_started = time.perf_counter()
+        counts = seed_dataset(**dataset)
+        seeding = time.perf_counter() - seeding_started
+
+        client = app.test_client()
+        client.post('/login', data={'username': 'bench-admin', 'password': BENCH_PASSWORD})
+        results = {}
+        for name, scenario in app_scenarios(app).items():
+            if only and name not in only:
+                continue
+            results[name] = run_scenario(app, client, scenario, iterations)
+
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'dataset': counts,
+        'seed_seconds': round(seeding, 2),
+        'iterations': iterations,
+        'peak_rss_kb': peak_rss_kb(),
+        'scenarios': results,
+    }
+
+
+def compare_results(baseline, current, metrics=('p50_ms', 'p95_ms', 'queries_per_request')):
+    """Yields (scenario, metric, baseline value, current value, change in %) for shared scenarios."""
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        for metric in metrics:
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            yield name, metric, old, new, change
@@ -0,0 +1,163 @@
+# app/cache.py
+
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from flask import g
+from app import db
+
+
+def current_versions():
+    """
+    Returns {name: version} for every TableVersion row. Read once per request (stored on g),
+    so checking all cached lists costs a single small query.
+    """
+    from app.models import TableVersion
+
+    if 'table_versions' not in g:
+        g.table_versions = dict(db.session.query(TableVersion.name, TableVersion.version).all())
+    return g.table_versions
+
+
+class ChoiceCache:
+    """
+    In-process cache of rarely-changing lists (e.g. SelectField choices), keyed by name.
+
+    Each entry remembers the TableVersion it was built from; a bump in any worker process
+    invalidates that one list everywhere on the next request that reads it.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def get(self, name, loader):
+        """Returns the cached list for `name`, calling loader() to rebuild it when stale."""
+        version = current_versions().get(name, 0)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == version:
+                self.hits[name] += 1
+                return list(entry[1])
+            self.misses[name] += 1
+
+        value = tuple(loader())
+        with self._lock:
+            self._entries[name] = (version, value)
+        return list(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters per list, e.g. for a monitoring endpoint."""
+        with self._lock:
+            names = sorted(set(self.hits) | set(self.misses))
+            return {name: {'hits': self.hits[name], 'misses': self.misses[name]} for name in names}
+
+
+class UserCache:
+    """
+    TTL/LRU cache of UserSnapshot objects for the Flask-Login user loader, so an
+    authenticated request does not need a User query.
+
+    invalidate() drops an entry in this process at once and touches a stamp file in the
+    instance folder; other worker processes on the host see the new mtime (one stat() per
+    load) and clear their caches. USER_CACHE_TTL bounds staleness across hosts.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stamp_path = None
+        self._stamp_seen = None
+        self.maxsize = 1024
+        self.ttl = 300
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.maxsize = app.config['USER_CACHE_SIZE']
+        self.ttl = app.config['USER_CACHE_TTL']
+        self._stamp_path = os.path.join(app.instance_path, 'user_cache.stamp')
+        self._stamp_seen = self._read_stamp()
+        app.extensions['user_cache'] = self
+
+    def _read_stamp(self):
+        try:
+            return os.stat(self._stamp_path).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    def _check_stamp(self):
+        stamp = self._read_stamp()
+        if stamp != self._stamp_seen:
+            with self._lock:
+                self._entries.clear()
+                self._stamp_seen = stamp
+
+    def load(self, session_id):
+        """
+        Resolves a Flask-Login session id ('<id>:<credential_version>') to a UserSnapshot.
+        Returns None for unknown or deleted users and for outdated credential versions.
+        """
+        from app.models import User, UserSnapshot
+
+        user_id, _, version = str(session_id).partition(':')
+        try:
+            user_id, version = int(user_id), int(version or 0)
+        except ValueError:
+            return None
+
+        self._check_stamp()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                snapshot = entry[1]
+            else:
+                snapshot = None
+                self.misses += 1
+
+        if snapshot is None:
+            row = db.session.query(*(getattr(User, f) for f in UserSnapshot.FIELDS)) \
+                .filter(User.id == user_id).first()
+            if row is None:
+                return None
+            snapshot = UserSnapshot(*row)
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, snapshot)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        if snapshot.credential_version != version:
+            return None
+        return snapshot
+
+    def invalidate(self, user_id):
+        """Call after committing a change to (or deletion of) a user."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if self._stamp_path:
+            with open(self._stamp_path, 'a'):
+                os.utime(self._stamp_path)
+            # Our own entry is already gone; don't clear everything on the next load
+            self._stamp_seen = self._read_stamp()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+# Choice lists for ProductForm (see product.populate_product_choices)
+choice_cache = ChoiceCache()
+
+# current_user snapshots for the Flask-Login user loader
+user_cache = UserCache()
@@ -1,7 +1,8 @@
 # app/cli.py
 import click
-from app import db
-from app.models import User
+import os
+from app import db, image_jobs
+from app.models import User, ProductImage
 from sqlalchemy import text
 
 def register_cli_commands(app):
@@ -47,3 +48,406 @@ def register_cli_commands(app):
                     click.echo(f"ERROR: Failed to delete the 'alembic_version' table. {e}")
             else:
                 click.echo("INFO: The 'alembic_version' table does not exist. Nothing to delete.")
+
+
+    @app.cli.command("requeue_images")
+    def requeue_images():
+        """
+        Re-submits product images left 'pending' (e.g. after a crash) to the worker pool.
+        Only raw files staged on disk by older releases can be recovered; uploads now go
+        to the pool in memory, so any other pending image is marked as failed.
+        """
+        with app.app_context():
+            pending = ProductImage.query.filter_by(status='pending').all()
+            queued, staged = 0, []
+            for image in pending:
+                if image.source_path and os.path.exists(image.source_path):
+                    with open(image.source_path, 'rb') as f:
+                        image_jobs.submit(image.id, f.read(), image.content_hash)
+                    staged.append(image.source_path)
+                    queued += 1
+                else:
+                    # Raw upload is gone; nothing left to process
+                    image.status = 'failed'
+            db.session.commit()
+
+            # Block until the pool has drained so the results are recorded before exit
+            image_jobs.shutdown(wait=True)
+            for source_path in staged:
+                os.remove(source_path)
+            click.echo(f"INFO: Re-queued {queued} image(s); {len(pending) - queued} marked as failed.")
+
+
+    @app.cli.command("export_data")
+    @click.argument("dataset")
+    @click.option("--format", "fmt", type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True)
+    @click.option("--output", "-o", type=click.Path(dir_okay=False, allow_dash=True), default='-',
+                  show_default=True, help="Output file ('-' for stdout).")
+    @click.option("--gzip", "compress", is_flag=True, help="Gzip the output on the fly.")
+    def export_data(dataset, fmt, output, compress):
+        """Streams products, suppliers or a reference table as CSV or JSON Lines."""
+        from app.export import export_datasets, export_stream
+        with app.app_context():
+            stream = export_stream(dataset, fmt, compress)
+            if stream is None:
+                click.echo(f"ERROR: Unknown dataset '{dataset}'. Choose from: {', '.join(export_datasets())}.", err=True)
+                raise SystemExit(1)
+            with click.open_file(output, 'wb') as out:
+                for chunk in stream:
+                    out.write(chunk)
+        if output != '-':
+            click.echo(f"SUCCESS: Exported {dataset} to {output}.")
+
+
+    @app.cli.command("ingest_images")
+    @click.argument("source", type=click.Path(exists=True))
+    @click.option("--manifest", "manifest_path", type=click.Path(dir_okay=False),
+                  help="Resume manifest (default: <source>.manifest.jsonl).")
+    @click.option("--workers", type=int, default=None, help="Worker processes (default: IMAGE_WORKERS, 0 = inline).")
+    @click.option("--batch-size", default=200, show_default=True, help="Images per insert transaction.")
+    def ingest_images(source, manifest_path, workers, batch_size):
+        """Attaches a directory or zip of photos to products matched by name (resumable)."""
+        from app.image_ingest import ImageIngester
+        source = os.path.abspath(source)
+        manifest_path = manifest_path or source.rstrip(os.sep) + '.manifest.jsonl'
+        if workers is None:
+            workers = app.config['IMAGE_WORKERS']
+
+        with app.app_context():
+            report = ImageIngester(app, source, manifest_path, workers, batch_size).run()
+
+        for name, message in report.errors[:20]:
+            click.echo(f"  {name}: {message}")
+        if len(report.errors) > 20:
+            click.echo(f"  ... and {len(report.errors) - 20} more (see {manifest_path})")
+        click.echo(f"SUCCESS: {report.ingested} image(s) attached, {report.resumed} already done, "
+                   f"{report.duplicates} already attached, {report.unmatched} unmatched, "
+                   f"{report.failed} failed, of {report.seen} file(s).")
+        click.echo(f"INFO: {report.images_per_sec:.1f} images/s, {report.mb_per_sec:.1f} MB/s read "
+                   f"in {report.elapsed:.1f}s.")
+        if report.worker_cpu:
+            cores = workers or 1
+            click.echo(f"INFO: Core utilization {report.utilization(cores):.0%} across {cores} worker(s):")
+            for pid in sorted(report.worker_cpu):
+                busy = report.worker_cpu[pid] / report.elapsed if report.elapsed else 0.0
+                click.echo(f"        pid {pid}: {report.worker_images[pid]} image(s), "
+                           f"{report.worker_cpu[pid]:.1f}s CPU, {busy:.0%} busy")
+
+
+    @app.cli.command("rebuild_search_index")
+    def rebuild_search_index_command():
+        """Repopulates the product full-text search index from the product table."""
+        from app.search import rebuild_search_index
+        with app.app_context():
+            if db.engine.dialect.name != 'sqlite':
+                click.echo("INFO: Full-text index is SQLite (FTS5) only; search uses LIKE on this database.")
+                return
+            count = rebuild_search_index()
+            db.session.commit()
+            click.echo(f"SUCCESS: Indexed {count} product(s).")
+
+
+    @app.cli.command("import_products")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--chunk-size", type=int, default=None, help="Rows per insert batch (default: IMPORT_CHUNK_SIZE).")
+    @click.option("--report", "report_path", type=click.Path(dir_okay=False), help="Write rejected rows to this CSV file.")
+    def import_products_command(path, chunk_size, report_path):
+        """Bulk-imports products from a CSV or XLSX file."""
+        from app.product.importer import import_products
+        with app.app_context():
+            try:
+                with open(path, 'rb') as stream:
+                    report = import_products(stream, os.path.basename(path),
+                                             chunk_size or app.config['IMPORT_CHUNK_SIZE'])
+            except ValueError as e:
+                click.echo(f"ERROR: {e}")
+                raise SystemExit(1)
+
+            for line, message in report.errors[:20]:
+                click.echo(f"  line {line}: {message}")
+            if len(report.errors) > 20:
+                click.echo(f"  ... and {len(report.errors) - 20} more")
+            if report_path and report.errors:
+                with open(report_path, 'w', newline='') as out:
+                    report.write_csv(out)
+                click.echo(f"INFO: Rejected rows written to {report_path}.")
+
+            click.echo(f"SUCCESS: Imported {report.imported} of {report.rows} row(s), "
+                       f"{len(report.errors)} rejected, in {report.elapsed:.2f}s "
+                       f"({report.rows_per_sec:.0f} rows/s).")
+
+
+    @app.cli.command("recompute_dashboard")
+    def recompute_dashboard():
+        """Rebuilds the dashboard counters from the catalog tables (repair after bulk SQL)."""
+        from app.dashboard import recompute_stats
+        with app.app_context():
+            count = recompute_stats()
+            db.session.commit()
+            click.echo(f"SUCCESS: Recomputed {count} dashboard counter(s).")
+
+
+    @app.cli.command("post_stock")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--allow-negative", is_flag=True, help="Accept movements that take stock below zero.")
+    def post_stock(path, allow_negative):
+        """
+        Posts stock movements from a CSV file with columns sku, kind (receive/sell/adjust),
+        quantity and optional reference/note, as one all-or-nothing batch.
+        """
+        import csv
+        from app.inventory import StockError, post_movements, variant_ids_by_sku
+        with app.app_context():
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                rows = list(csv.DictReader(f))
+
+            variant_ids = variant_ids_by_sku(row.get('sku', '').strip() for row in rows)
+            movements, errors = [], []
+            for line, row in enumerate(rows, start=2):
+                sku = row.get('sku', '').strip()
+                if sku not in variant_ids:
+                    errors.append(f"line {line}: unknown SKU '{sku}'")
+                    continue
+                try:
+                    quantity = int(row.get('quantity', ''))
+                except ValueError:
+                    errors.append(f"line {line}: quantity '{row.get('quantity')}' is not a whole number")
+                    continue
+                movements.append({'variant_id': variant_ids[sku], 'kind': row.get('kind', '').strip().lower(),
+                                  'quantity': quantity, 'reference': row.get('reference'), 'note': row.get('note')})
+
+            if errors:
+                for error in errors[:20]:
+                    click.echo(f"  {error}")
+                click.echo(f"ERROR: {len(errors)} invalid row(s); nothing was posted.")
+                raise SystemExit(1)
+            try:
+                count = post_movements(movements, allow_negative=allow_negative)
+                db.session.commit()
+            except StockError as e:
+                db.session.rollback()
+                click.echo(f"ERROR: {e} Nothing was posted.")
+                raise SystemExit(1)
+            click.echo(f"SUCCESS: Posted {count} stock movement(s).")
+
+
+    @app.cli.command("receive_goods")
+    @click.argument("supplier_id", type=int)
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--reference", required=True, help="Delivery note number (unique per supplier).")
+    @click.option("--order", "order_reference", help="Purchase order number the delivery fills.")
+    @click.option("--note", help="Note stored on the receipt.")
+    def receive_goods_command(supplier_id, path, reference, order_reference, note):
+        """
+        Posts a supplier delivery from a CSV or XLSX file (sku or product_id/color_id,
+        quantity, unit_cost) as one all-or-nothing goods receipt.
+        """
+        import time
+        from app.models import Supplier, PurchaseOrder
+        from app.product.importer import read_rows
+        from app.purchasing import receive_goods
+        with app.app_context():
+            supplier = db.session.get(Supplier, supplier_id)
+            if supplier is None:
+                click.echo(f"ERROR: Supplier {supplier_id} not found.")
+                raise SystemExit(1)
+            order = None
+            if order_reference:
+                order = PurchaseOrder.query.filter_by(reference=order_reference).first()
+                if order is None:
+                    click.echo(f"ERROR: Purchase order '{order_reference}' not found.")
+                    raise SystemExit(1)
+
+            started = time.perf_counter()
+            try:
+                with open(path, 'rb') as stream:
+                    receipt = receive_goods(supplier, reference, read_rows(stream, os.path.basename(path)),
+                                            order=order, note=note)
+                db.session.commit()
+            except ValueError as e:
+                # PurchasingError (with per-line errors) or an unreadable file
+                db.session.rollback()
+                for line, message in getattr(e, 'errors', [])[:20]:
+                    click.echo(f"  line {line}: {message}")
+                click.echo(f"ERROR: {e}")
+                raise SystemExit(1)
+
+            elapsed = time.perf_counter() - started
+            count = receipt.lines.count()
+            click.echo(f"SUCCESS: Received {count} line(s) on delivery '{receipt.reference}' in {elapsed:.2f}s "
+                       f"({count / elapsed if elapsed else 0:.0f} lines/s).")
+
+
+    from app.product.routes import MODELS
+    @app.cli.command("bulk_upsert")
+    @click.argument("model_name", type=click.Choice([route_name for _, route_name, _ in MODELS]))
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    def bulk_upsert_command(model_name, path):
+        """
+        Creates or updates styles, categories, brands, materials or colors by name from a
+        CSV or XLSX file (name, plus is_own_brand for brands or hex_code for colors).
+        """
+        from app.product.bulk import bulk_upsert
+        from app.product.importer import read_rows
+        model = next(model for model, route_name, _ in MODELS if route_name == model_name)
+        with app.app_context():
+            try:
+                with open(path, 'rb') as stream:
+                    report = bulk_upsert(model, read_rows(stream, os.path.basename(path)))
+                db.session.commit()
+            except ValueError as e:
+                # BulkUpsertError (with per-line errors) or an unreadable file
+                db.session.rollback()
+                for line, message in getattr(e, 'errors', [])[:20]:
+                    click.echo(f"  line {line}: {message}")
+                click.echo(f"ERROR: {e}")
+                raise SystemExit(1)
+
+            click.echo(f"SUCCESS: {model_name.title()} from {report.rows} row(s): {report.summary()} "
+                       f"in {report.elapsed:.2f}s.")
+
+
+    @app.cli.command("recompute_stock")
+    def recompute_stock():
+        """Resets each variant's on-hand count to the sum of its stock ledger (repair after manual SQL)."""
+        from app.inventory import recompute_on_hand
+        with app.app_context():
+            count = recompute_on_hand()
+            db.session.commit()
+            click.echo(f"SUCCESS: Corrected on-hand stock for {count} variant(s).")
+
+
+    @app.cli.command("db_audit")
+    @click.option("--verbose", is_flag=True, help="Print the full plan of every query.")
+    def db_audit(verbose):
+        """Runs EXPLAIN QUERY PLAN over the app's known queries and flags full table scans."""
+        from app.audit import audit_queries
+        with app.app_context():
+            if db.engine.dialect.name != 'sqlite':
+                click.echo("INFO: db_audit reads SQLite query plans; nothing to audit on this database.")
+                return
+
+            failures = 0
+            for label, details, problems in audit_queries():
+                status = 'FAIL' if problems else 'OK'
+                click.echo(f"{status:4}  {label}")
+                for detail in (details if verbose else problems):
+                    click.echo(f"        {detail}")
+                failures += bool(problems)
+
+            if failures:
+                click.echo(f"ERROR: {failures} query plan(s) need an index.")
+                raise SystemExit(1)
+            click.echo("SUCCESS: No full table scans in known queries.")
+
+
+    @app.cli.command("bench_db_writes")
+    @click.option("--threads", default=8, show_default=True, help="Concurrent writer threads.")
+    @click.option("--writes", default=200, show_default=True, help="Write transactions per thread.")
+    def bench_db_writes(threads, writes):
+        """Compares concurrent write throughput of stock SQLite vs. the SQLITE_PRAGMAS profile."""
+        from app.database import run_write_benchmark
+        profiles = [
+            ('default (rollback journal)', {}),
+            ('tuned (SQLITE_PRAGMAS)', app.config['SQLITE_PRAGMAS']),
+        ]
+        for label, pragmas in profiles:
+            result = run_write_benchmark(pragmas, threads, writes)
+            click.echo(f"{label:28} {result['writes_per_sec']:9.1f} writes/s  "
+                       f"{result['committed']} committed, {result['failed']} failed "
+                       f"in {result['elapsed']:.2f}s")
+
+
+    @app.cli.command("bench_login")
+    @click.option("--threads", default=8, show_default=True, help="Concurrent clients (one user/IP each).")
+    @click.option("--seconds", default=10, show_default=True, help="Duration of the sustained phase.")
+    def bench_login(threads, seconds):
+        """Load-tests main.login on a scratch database: sustained logins/sec, then a stuffing burst."""
+        from config import Config
+        from app.benchmarks import scratch_app, run_login_benchmark, run_stuffing_benchmark
+
+        # Throttle off: measures raw verification throughput of the bcrypt pool
+        with scratch_app(Config, LOGIN_THROTTLE_ENABLED=False) as bench:
+            result = run_login_benchmark(bench, threads, seconds)
+        click.echo(f"sustained: {result['logins_per_sec']:.1f} logins/s  "
+                   f"p50 {result['p50_ms']:.0f} ms  p95 {result['p95_ms']:.0f} ms  "
+                   f"p99 {result['p99_ms']:.0f} ms  statuses {result['statuses']}")
+
+        # Throttle on: one IP hammering one account is rejected before hashing
+        with scratch_app(Config) as bench:
+            run_login_benchmark(bench, 1, 0)  # seeds bench0
+            stuffing = run_stuffing_benchmark(bench, 500)
+        click.echo(f"stuffing:  {stuffing['rejected']}/{stuffing['attempts']} rejected "
+                   f"at {stuffing['attempts_per_sec']:.0f} attempts/s")
+
+
+    @app.cli.command("bench_app")
+    @click.option("--products", default=1000, show_default=True)
+    @click.option("--suppliers", default=50, show_default=True)
+    @click.option("--colors", default=20, show_default=True)
+    @click.option("--images", "images_per_product", default=2, show_default=True, help="Image rows per product.")
+    @click.option("--users", default=10, show_default=True)
+    @click.option("--iterations", default=30, show_default=True, help="Measured requests per scenario.")
+    @click.option("--scenario", "only", multiple=True, help="Run only these scenarios (repeatable).")
+    @click.option("--output", "-o", type=click.Path(dir_okay=False), help="Write the results as JSON.")
+    @click.option("--compare", type=click.Path(exists=True, dir_okay=False), help="Baseline JSON to diff against.")
+    def bench_app(products, suppliers, colors, images_per_product, users, iterations, only, output, compare):
+        """Seeds a synthetic catalog on a scratch database and benchmarks the main views."""
+        import json
+        from config import Config
+        from app.benchmarks import run_app_benchmark, compare_results
+
+        dataset = dict(products=products, suppliers=suppliers, colors=colors,
+                       images_per_product=images_per_product, users=users)
+        result = run_app_benchmark(Config, dataset, iterations, only)
+
+        click.echo(f"INFO: Seeded {result['dataset']} in {result['seed_seconds']}s "
+                   f"(commit {result['commit'] or 'unknown'}).")
+        click.echo(f"{'scenario':26} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'alloc KiB':>10}  statuses")
+        for name, r in result['scenarios'].items():
+            click.echo(f"{name:26} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f} "
+                       f"{r['queries_per_request']:8.1f} {r['peak_alloc_kb']:10}  {r['statuses']}")
+        click.echo(f"INFO: Peak RSS {result['peak_rss_kb']} KiB.")
+
+        if compare:
+            with open(compare) as f:
+                baseline = json.load(f)
+            click.echo(f"Compared with {compare} (commit {baseline.get('commit') or 'unknown'}):")
+            for name, metric, old, new, change in compare_results(baseline, result):
+                click.echo(f"  {name:26} {metric:20} {old:9.1f} -> {new:9.1f}  ({change:+.0f}%)")
+        if output:
+            with open(output, 'w') as f:
+                json.dump(result, f, indent=2)
+            click.echo(f"SUCCESS: Results written to {output}.")
+
+
+    @app.cli.command("bench_bcrypt")
+    @click.option("--min-cost", default=10, show_default=True)
+    @click.option("--max-cost", default=14, show_default=True)
+    @click.option("--rounds", default=3, show_default=True, help="Hashes timed per cost.")
+    def bench_bcrypt(min_cost, max_cost, rounds):
+        """Measures bcrypt hash time per work factor on this host and suggests BCRYPT_LOG_ROUNDS."""
+        import time
+        import bcrypt as bcrypt_lib
+
+        budget = app.config['LOGIN_HASH_BUDGET_MS']
+        suggested = None
+        for cost in range(min_cost, max_cost + 1):
+            timings = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                bcrypt_lib.hashpw(b'benchmark-password', bcrypt_lib.gensalt(rounds=cost))
+                timings.append((time.perf_counter() - started) * 1000)
+            median = sorted(timings)[len(timings) // 2]
+            marker = ''
+            if median <= budget:
+                suggested = cost
+            if cost == app.config['BCRYPT_LOG_ROUNDS']:
+                marker = '  <- current'
+            click.echo(f"cost {cost:2}: {median:8.1f} ms{marker}")
+
+        if suggested is None:
+            click.echo(f"WARNING: No cost in range fits the {budget} ms budget (LOGIN_HASH_BUDGET_MS).")
+        else:
+            click.echo(f"SUGGESTED: BCRYPT_LOG_ROUNDS={suggested} (highest cost within {budget} ms). "
+                       "Existing hashes are upgraded on each user's next login.")
@@ -0,0 +1,223 @@
+# app/dashboard.py
+
+from collections import Counter
+from sqlalchemy import bindparam, delete, event, func, insert, literal, select, tuple_, update
+from sqlalchemy.orm.base import NO_VALUE
+from app import db
+from app.models import (DashboardStat, Product, ProductImage, Supplier,
+                        product_color_association)
+
+# Materialized dashboard counters, one DashboardStat row per (metric, key):
+#   ('products', 'total'), ('products', 'missing_base_photo'), ('suppliers', 'total'),
+#   ('category'|'brand'|'supplier'|'color', <id>) -> products, ('supplier_type', <type>) -> suppliers.
+# Kept current by the ORM events below, in the same transaction as the change itself, so the
+# dashboard reads one small table instead of running GROUP BYs over the catalog.
+
+# Product foreign keys counted per referenced row
+PRODUCT_FACETS = {'category': 'category_id', 'brand': 'brand_id', 'supplier': 'supplier_id'}
+
+
+def apply_deltas(connection, deltas):
+    """
+    Adds each {(metric, key): delta} to its counter on `connection`; counters missing from
+    the table start at zero. One read of the affected keys, then one executemany each for
+    the updates and the inserts, however many counters change.
+    """
+    table = DashboardStat.__table__
+    changes = {(metric, str(key)): delta for (metric, key), delta in deltas.items() if delta}
+    if not changes:
+        return
+    existing = set(connection.execute(
+        select(table.c.metric, table.c.key).where(tuple_(table.c.metric, table.c.key).in_(list(changes)))
+    ).all())
+    updates = [{'m': metric, 'k': key, 'delta': delta}
+               for (metric, key), delta in changes.items() if (metric, key) in existing]
+    inserts = [{'metric': metric, 'key': key, 'value': delta}
+               for (metric, key), delta in changes.items() if (metric, key) not in existing]
+    if updates:
+        connection.execute(
+            update(table).where(table.c.metric == bindparam('m'), table.c.key == bindparam('k'))
+            .values(value=table.c.value + bindparam('delta')),
+            updates,
+        )
+    if inserts:
+        connection.execute(insert(table), inserts)
+
+
+def product_deltas(values, color_ids, sign=1):
+    """Counter changes for adding (sign=1) or removing (sign=-1) one product without a base photo."""
+    deltas = Counter({('products', 'total'): sign, ('products', 'missing_base_photo'): sign})
+    for metric, column in PRODUCT_FACETS.items():
+        if values.get(column) is not None:
+            deltas[(metric, values[column])] += sign
+    for color_id in color_ids:
+        deltas[('color', color_id)] += sign
+    return deltas
+
+
+def _has_base_photo(connection, product_id, exclude_image_id=None):
+    query = select(ProductImage.id).where(ProductImage.product_id == product_id,
+                                          ProductImage.type == 'base')
+    if exclude_image_id is not None:
+        query = query.where(ProductImage.id != exclude_image_id)
+    return connection.execute(query.limit(1)).first() is not None
+
+
+def _old_values(connection, target, columns):
+    """
+    Returns {column: value as stored} when any of `columns` is modified on `target`, else
+    None. Read in before_update, so the row still holds the old values even if they were
+    expired from the instance.
+    """
+    state = db.inspect(target)
+    if not any(state.attrs[column].history.has_changes() for column in columns):
+        return None
+    table = target.__table__
+    row = connection.execute(
+        select(*(table.c[column] for column in columns)).where(table.c.id == target.id)
+    ).mappings().first()
+    return dict(row) if row is not None else None
+
+
+# --- Product ---
+
+def _product_inserted(mapper, connection, target):
+    # A new product has no images yet; base photos inserted in the same flush come after it.
+    # Colors come from the attribute history, which never triggers a load mid-flush.
+    apply_deltas(connection, product_deltas(
+        {column: getattr(target, column) for column in PRODUCT_FACETS.values()},
+        [color.id for color in db.inspect(target).attrs.colors.history.added]))
+
+
+def _product_updating(mapper, connection, target):
+    deltas = Counter()
+    old = _old_values(connection, target, list(PRODUCT_FACETS.values()))
+    if old is not None:
+        for metric, column in PRODUCT_FACETS.items():
+            new_value = getattr(target, column)
+            if old[column] != new_value:
+                if old[column] is not None:
+                    deltas[(metric, old[column])] -= 1
+                if new_value is not None:
+                    deltas[(metric, new_value)] += 1
+
+    # The association rows are written after this event, so use the collection history
+    history = db.inspect(target).attrs.colors.history
+    for color in history.added:
+        deltas[('color', color.id)] += 1
+    for color in history.deleted:
+        deltas[('color', color.id)] -= 1
+    apply_deltas(connection, deltas)
+
+
+def _product_deleting(mapper, connection, target):
+    # The unit of work loads the colors to delete the association rows, which happens
+    # before this event; read them from the table only if the collection was never loaded
+    colors = db.inspect(target).attrs.colors
+    if colors.loaded_value is not NO_VALUE:
+        color_ids = [color.id for color in (*colors.history.unchanged, *colors.history.deleted)]
+    else:
+        color_ids = connection.execute(
+            select(product_color_association.c.color_id)
+            .where(product_color_association.c.product_id == target.id)
+        ).scalars().all()
+    deltas = product_deltas({column: getattr(target, column) for column in PRODUCT_FACETS.values()},
+                            color_ids, sign=-1)
+    if _has_base_photo(connection, target.id):
+        # Not yet counted as missing; cascaded image deletes usually run first and count it
+        deltas[('products', 'missing_base_photo')] += 1
+    apply_deltas(connection, deltas)
+
+
+# --- ProductImage (base photos) ---
+
+def _image_inserted(mapper, connection, target):
+    if target.type == 'base' and not _has_base_photo(connection, target.product_id, target.id):
+        apply_deltas(connection, {('products', 'missing_base_photo'): -1})
+
+
+def _image_updating(mapper, connection, target):
+    old = _old_values(connection, target, ['product_id', 'type'])
+    if old is None:
+        return
+    deltas = Counter()
+    if old['type'] == 'base' and not _has_base_photo(connection, old['product_id'], target.id):
+        deltas[('products', 'missing_base_photo')] += 1
+    if target.type == 'base' and not _has_base_photo(connection, target.product_id, target.id):
+        deltas[('products', 'missing_base_photo')] -= 1
+    apply_deltas(connection, deltas)
+
+
+def _image_deleted(mapper, connection, target):
+    if target.type == 'base' and not _has_base_photo(connection, target.product_id):
+        apply_deltas(connection, {('products', 'missing_base_photo'): 1})
+
+
+# --- Supplier ---
+
+def _supplier_inserted(mapper, connection, target):
+    apply_deltas(connection, {('suppliers', 'total'): 1, ('supplier_type', target.supplier_type): 1})
+
+
+def _supplier_updating(mapper, connection, target):
+    old = _old_values(connection, target, ['supplier_type'])
+    if old is not None and old['supplier_type'] != target.supplier_type:
+        apply_deltas(connection, {('supplier_type', old['supplier_type']): -1,
+                                  ('supplier_type', target.supplier_type): 1})
+
+
+def _supplier_deleted(mapper, connection, target):
+    apply_deltas(connection, {('suppliers', 'total'): -1, ('supplier_type', target.supplier_type): -1})
+
+
+event.listen(Product, 'after_insert', _product_inserted)
+event.listen(Product, 'before_update', _product_updating)
+event.listen(Product, 'before_delete', _product_deleting)
+event.listen(ProductImage, 'after_insert', _image_inserted)
+event.listen(ProductImage, 'before_update', _image_updating)
+event.listen(ProductImage, 'after_delete', _image_deleted)
+event.listen(Supplier, 'after_insert', _supplier_inserted)
+event.listen(Supplier, 'before_update', _supplier_updating)
+event.listen(Supplier, 'after_delete', _supplier_deleted)
+
+
+# --- Full recompute and reads ---
+
+def recompute_stats():
+    """
+    Rebuilds every counter from the source tables with one GROUP BY per metric, in the
+    caller's transaction. For repair after bulk SQL or a missed event. Returns the row count.
+    """
+    table = DashboardStat.__table__
+    connection = db.session.connection()
+    connection.execute(delete(table))
+
+    def fill(metric, query):
+        connection.execute(insert(table).from_select(['metric', 'key', 'value'], query))
+
+    has_base = (select(ProductImage.id)
+                .where(ProductImage.product_id == Product.id, ProductImage.type == 'base')
+                .exists())
+    fill('products', select(literal('products'), literal('total'), func.count(Product.id)))
+    fill('products', select(literal('products'), literal('missing_base_photo'), func.count(Product.id))
+         .where(~has_base))
+    for metric, column in PRODUCT_FACETS.items():
+        column = Product.__table__.c[column]
+        fill(metric, select(literal(metric), func.cast(column, db.String), func.count())
+             .where(column.isnot(None)).group_by(column))
+    association = product_color_association.c
+    fill('color', select(literal('color'), func.cast(association.color_id, db.String), func.count())
+         .group_by(association.color_id))
+    fill('suppliers', select(literal('suppliers'), literal('total'), func.count(Supplier.id)))
+    fill('supplier_type', select(literal('supplier_type'), func.cast(Supplier.supplier_type, db.String),
+                                 func.count()).group_by(Supplier.supplier_type))
+    return connection.execute(select(func.count()).select_from(table)).scalar()
+
+
+def load_stats():
+    """Returns {metric: {key: value}} from one read of the counter table."""
+    stats = {}
+    for metric, key, value in db.session.execute(
+            select(DashboardStat.metric, DashboardStat.key, DashboardStat.value)):
+        stats.setdefault(metric, {})[key] = value
+    return stats
@@ -0,0 +1,110 @@
+# app/database.py
+
+import os
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+
+def is_file_sqlite(uri):
+    """True for an on-disk SQLite database (pragmas and pool sizing apply)."""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def engine_options(config):
+    """
+    Builds SQLALCHEMY_ENGINE_OPTIONS for the configured database. Values set explicitly
+    in SQLALCHEMY_ENGINE_OPTIONS win over the computed profile.
+    """
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    url = make_url(uri)
+    options = {}
+
+    if url.get_backend_name() == 'sqlite':
+        if is_file_sqlite(uri):
+            options.update(
+                pool_size=config['DB_POOL_SIZE'],
+                max_overflow=config['DB_MAX_OVERFLOW'],
+                # pysqlite's own lock wait, in seconds; busy_timeout pragma mirrors it
+                connect_args={'timeout': config['SQLITE_PRAGMAS'].get('busy_timeout', 5000) / 1000},
+            )
+    else:
+        # Server databases (e.g. Postgres): drop dead connections and recycle idle ones
+        options.update(
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_pre_ping=True,
+            pool_recycle=config['DB_POOL_RECYCLE'],
+        )
+
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Runs `PRAGMA key=value` for every entry on each new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for key, value in pragmas.items():
+            cursor.execute(f'PRAGMA {key}={value}')
+        cursor.close()
+
+
+def run_write_benchmark(pragmas, threads, writes_per_thread):
+    """
+    Hammers a scratch SQLite file with concurrent short write transactions (one INSERT and
+    one read-modify-write UPDATE each, like a typical edit view) from `threads` threads.
+
+    Returns: dict with elapsed seconds, committed writes, writes/sec and failed transactions.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}",
+                               pool_size=threads, max_overflow=0,
+                               connect_args={'timeout': pragmas.get('busy_timeout', 5000) / 1000})
+        apply_sqlite_pragmas(engine, pragmas)
+
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT, qty INTEGER)"))
+            conn.execute(text("CREATE TABLE counter (id INTEGER PRIMARY KEY, n INTEGER)"))
+            conn.execute(text("INSERT INTO counter (id, n) VALUES (1, 0)"))
+
+        committed = [0] * threads
+        failed = [0] * threads
+        barrier = threading.Barrier(threads)
+
+        def worker(index):
+            barrier.wait()
+            for i in range(writes_per_thread):
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(text("INSERT INTO item (name, qty) VALUES (:name, :qty)"),
+                                     {'name': f'item-{index}-{i}', 'qty': i})
+                        conn.execute(text("UPDATE counter SET n = n + 1 WHERE id = 1"))
+                    committed[index] += 1
+                except OperationalError:
+                    failed[index] += 1
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    total = sum(committed)
+    return {
+        'elapsed': elapsed,
+        'committed': total,
+        'writes_per_sec': total / elapsed if elapsed else 0.0,
+        'failed': sum(failed),
+    }
@@ -0,0 +1,172 @@
+# app/export.py
+
+import csv
+import io
+import json
+import zlib
+from sqlalchemy import select
+from app import db
+from app.models import (Product, ProductImage, Style, Category, Brand, Material, Supplier, Color,
+                        SUPPLIER_TYPES, product_color_association)
+
+# Rows fetched per round trip; also the server-side cursor batch on Postgres
+EXPORT_BATCH_SIZE = 1000
+
+# Output is handed to the client in chunks of roughly this many characters
+CHUNK_CHARS = 64 * 1024
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# Product columns match the import format (see app/product/importer.py), so an export
+# can be edited and imported again; id and images are informational.
+PRODUCT_FIELDS = ('id', 'name', 'description', 'facebook_post', 'youtube_video', 'keywords',
+                  'style', 'category', 'brand', 'material', 'supplier', 'colors', 'images')
+
+REFERENCE_MODELS = {
+    'styles': Style,
+    'categories': Category,
+    'brands': Brand,
+    'materials': Material,
+    'colors': Color,
+}
+
+
+def _stream(statement):
+    """Executes `statement` with a server-side cursor, yielding lists of row mappings."""
+    result = db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    return result.mappings().partitions()
+
+
+def product_rows():
+    """
+    Yields one dict per product with attribute names resolved. Colors and image paths are
+    fetched per batch of EXPORT_BATCH_SIZE products (two queries each), so memory stays
+    flat however many products there are.
+    """
+    statement = (
+        select(Product.id, Product.name, Product.description, Product.facebook_post,
+               Product.youtube_video, Product.keywords,
+               Style.name.label('style'), Category.name.label('category'),
+               Brand.name.label('brand'), Material.name.label('material'),
+               Supplier.name.label('supplier'))
+        .outerjoin(Style, Product.style_id == Style.id)
+        .outerjoin(Category, Product.category_id == Category.id)
+        .outerjoin(Brand, Product.brand_id == Brand.id)
+        .outerjoin(Material, Product.material_id == Material.id)
+        .outerjoin(Supplier, Product.supplier_id == Supplier.id)
+        .order_by(Product.id)
+    )
+    for batch in _stream(statement):
+        ids = [row['id'] for row in batch]
+
+        colors = {product_id: [] for product_id in ids}
+        for product_id, name in db.session.execute(
+                select(product_color_association.c.product_id, Color.name)
+                .join(Color, Color.id == product_color_association.c.color_id)
+                .where(product_color_association.c.product_id.in_(ids))
+                .order_by(Color.name)):
+            colors[product_id].append(name)
+
+        images = {product_id: [] for product_id in ids}
+        for product_id, file_path in db.session.execute(
+                select(ProductImage.product_id, ProductImage.file_path)
+                .where(ProductImage.product_id.in_(ids), ProductImage.status == 'ready')
+                # Base photo first, then additional ones in upload order
+                .order_by(ProductImage.type != 'base', ProductImage.id)):
+            images[product_id].append(file_path)
+
+        for row in batch:
+            yield dict(row, colors=colors[row['id']], images=images[row['id']])
+
+
+def supplier_rows():
+    """Yields one dict per supplier, with the supplier type as its display name."""
+    columns = Supplier.__table__.columns
+    for batch in _stream(select(*columns).order_by(Supplier.id)):
+        for row in batch:
+            yield dict(row, supplier_type=SUPPLIER_TYPES.get(row['supplier_type'], row['supplier_type']))
+
+
+def reference_rows(model):
+    """Yields one dict per row of a reference table, all columns."""
+    for batch in _stream(select(*model.__table__.columns).order_by(model.id)):
+        for row in batch:
+            yield dict(row)
+
+
+def get_dataset(name):
+    """Returns (field names, row iterator) for an export dataset, or None if unknown."""
+    if name == 'products':
+        return list(PRODUCT_FIELDS), product_rows()
+    if name == 'suppliers':
+        return [c.name for c in Supplier.__table__.columns], supplier_rows()
+    model = REFERENCE_MODELS.get(name)
+    if model is not None:
+        return [c.name for c in model.__table__.columns], reference_rows(model)
+    return None
+
+
+def export_datasets():
+    return ['products', 'suppliers'] + list(REFERENCE_MODELS)
+
+
+def csv_chunks(fields, rows):
+    """Encodes rows as CSV text chunks, header first. List values are joined with '; '."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    # Header goes out on its own so the client gets a first byte before any row is read
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        writer.writerow(['; '.join(v) if isinstance(v, list) else v
+                         for v in (row.get(field) for field in fields)])
+        if buffer.tell() >= CHUNK_CHARS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def jsonl_chunks(fields, rows):
+    """Encodes rows as JSON Lines text chunks (one object per line)."""
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps({field: row.get(field) for field in fields}, default=str)
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_CHARS:
+            yield '\n'.join(lines) + '\n'
+            lines, size = [], 0
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def encode_chunks(chunks, compress=False):
+    """
+    UTF-8 encodes text chunks, gzip-compressing them on the fly when `compress` is set.
+    Each chunk is sync-flushed, so compressed output streams as steadily as plain output.
+    """
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(name, fmt, compress=False):
+    """Bytes iterator for dataset `name` in `fmt` ('csv' or 'jsonl'); None if unknown."""
+    dataset = get_dataset(name)
+    if dataset is None or fmt not in EXPORT_FORMATS:
+        return None
+    fields, rows = dataset
+    chunks = csv_chunks(fields, rows) if fmt == 'csv' else jsonl_chunks(fields, rows)
+    return encode_chunks(chunks, compress)
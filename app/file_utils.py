@@ -1,11 +1,22 @@
 # app/file_utils.py
 
+import io
 import os
-from werkzeug.utils import secure_filename
+import sys
+import time
+import hashlib
 from PIL import Image
 from flask import current_app
 import re
 
+# Raw uploads used to wait here (under UPLOAD_FOLDER) for the worker pool; never served
+INCOMING_DIR = '_incoming'
+
+# File extension written for each derivative format
+FORMAT_EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp', 'png': 'png'}
+
+HASH_CHUNK_SIZE = 64 * 1024
+
 # --- Constants from Config ---
 def allowed_file(filename):
     """Check if the file extension is allowed."""
@@ -19,67 +30,149 @@ def slugify(text):
     text = re.sub(r'[-\s]+', '-', text)       # Replace spaces and hyphens with a single hyphen
     return text
 
-def save_and_process_image(file_storage, product_slug, filename_prefix):
+def content_dir(content_hash):
+    """Directory (relative to UPLOAD_FOLDER) holding every derivative of one source image."""
+    return os.path.join(content_hash[:2], content_hash)
+
+def hash_upload(file_storage):
     """
-    Saves and processes an image: checks security, resizes to 1:1, compresses, 
-    and saves to a slug-based directory.
-    
-    Returns: The relative file path on success, or None on failure.
+    Returns the SHA-256 hex digest of an upload's bytes, read in chunks from its stream.
+    The stream is rewound afterwards so it can still be saved or decoded.
     """
-    if not file_storage or not file_storage.filename or not allowed_file(file_storage.filename):
-        return None
+    digest = hashlib.sha256()
+    stream = file_storage.stream
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+def read_upload(file_storage):
+    """
+    Returns the raw bytes of an upload, for handing to the background pool (see
+    app/image_jobs.py) without writing a copy to disk. The request body, and so the
+    upload, is already capped by MAX_CONTENT_LENGTH.
+    """
+    stream = file_storage.stream
+    stream.seek(0)
+    data = stream.read()
+    stream.seek(0)
+    return data
 
-    # 1. Prepare Paths
-    upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], product_slug)
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Secure the original filename and generate a new name
-    original_ext = file_storage.filename.rsplit('.', 1)[1].lower()
-    safe_filename = secure_filename(file_storage.filename)
-    # New filename format: prefix-timestamp-safe_filename.ext
-    new_filename = f"{filename_prefix}-{os.urandom(8).hex()[:6]}.{original_ext}"
-    full_path = os.path.join(upload_dir, new_filename)
-    
-    # Save the temporary file (Pillow needs a path or file handle)
-    temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'temp_' + new_filename)
-    file_storage.save(temp_path)
+def _save_derivative(img, path, fmt):
+    if fmt == 'jpeg':
+        # JPEG: Use quality=95 for near-lossless compression
+        img.save(path, 'JPEG', quality=95, optimize=True)
+    elif fmt == 'webp':
+        img.save(path, 'WEBP', quality=90, method=4)
+    elif fmt == 'png':
+        # PNG: Optimization is considered lossless compression
+        img.save(path, 'PNG', optimize=True)
+    else:
+        raise ValueError(f"Unsupported derivative format: {fmt}")
 
-    try:
-        # 2. Process Image (Resize 1:1 and Compress Losslessly)
-        img = Image.open(temp_path).convert('RGB')
-        target_size = current_app.config['IMAGE_SIZE']
+def process_image(source, dest_dir, sizes, formats):
+    """
+    Crops an image to 1:1 and writes one compressed derivative per (size, format) into
+    dest_dir, named <size>.<ext>. `source` is a path or a readable binary stream
+    (e.g. FileStorage.stream), so uploads never need a temporary copy on disk.
+
+    Runs inside the worker pool, so it must not touch current_app or the database;
+    every setting is passed in explicitly. Raises on failure.
+
+    Returns: A dict of stats (source/decoded size, pixel buffer, process peak RSS and how
+    much this call raised it, in KiB; run time in seconds) plus 'derivatives', a list of
+    (width, format, filename).
+    """
+    started = time.perf_counter()
+    peak_before = peak_rss_kb()
+    sizes = sorted(set(sizes), reverse=True)
+    largest = sizes[0]
+    os.makedirs(dest_dir, exist_ok=True)
+
+    with Image.open(source) as src:
+        source_size = src.size
 
-        # Crop to 1:1 aspect ratio (square center crop)
-        width, height = img.size
+        # JPEG: let libjpeg decode at 1/2, 1/4 or 1/8 scale while keeping both sides
+        # >= the largest derivative, so a 6000x4000 photo is never materialized at full
+        # resolution. No-op for formats without draft support (PNG).
+        src.draft('RGB', (largest, largest))
+
+        # Crop to 1:1 aspect ratio (square center crop) before converting, so only
+        # the kept pixels go through the mode conversion
+        width, height = src.size
         min_dim = min(width, height)
         left = (width - min_dim) // 2
         top = (height - min_dim) // 2
-        right = (width + min_dim) // 2
-        bottom = (height + min_dim) // 2
-        img = img.crop((left, top, right, bottom))
-
-        # Resize to target size (e.g., 800x800)
-        img = img.resize((target_size, target_size), Image.Resampling.LANCZOS)
-        
-        # Save compressed (JPEG uses quality for compression)
-        # Use relative path for database storage: product-slug/filename.ext
-        relative_path = os.path.join(product_slug, new_filename)
-
-        if original_ext in ['jpg', 'jpeg']:
-            # JPEG: Use quality=95 for near-lossless compression
-            img.save(full_path, 'JPEG', quality=95, optimize=True)
-        elif original_ext == 'png':
-            # PNG: Optimization is considered lossless compression
-            img.save(full_path, 'PNG', optimize=True)
-        else:
-            img.save(full_path)
-
-        return relative_path
-
-    except Exception as e:
-        current_app.logger.error(f"Image processing failed: {e}")
+        img = src.crop((left, top, left + min_dim, top + min_dim)).convert('RGB')
+    decoded_size = (width, height)
+
+    # Cheap integer box-downscale first, keeping at least 2x the target for LANCZOS to work with
+    factor = min_dim // (largest * 2)
+    if factor >= 2:
+        img = img.reduce(factor)
+
+    derivatives = []
+    # Largest first: each smaller size is resampled from the previous one, not the source
+    for size in sizes:
+        img = img.resize((size, size), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            filename = f"{size}.{FORMAT_EXTENSIONS[fmt]}"
+            _save_derivative(img, os.path.join(dest_dir, filename), fmt)
+            derivatives.append((size, fmt, filename))
+
+    peak_after = peak_rss_kb()
+    return {
+        'source_size': source_size,
+        'decoded_size': decoded_size,
+        # Largest single buffer held for this upload (RGB, 3 bytes per pixel)
+        'pixel_buffer_kb': width * height * 3 // 1024,
+        # ru_maxrss only ever grows: the process peak so far, and this call's share of it
+        'process_peak_rss_kb': peak_after,
+        'peak_rss_growth_kb': peak_after - peak_before if peak_after is not None else None,
+        'seconds': time.perf_counter() - started,
+        'derivatives': derivatives,
+    }
+
+def process_image_bytes(data, dest_dir, sizes, formats):
+    """process_image() of an upload's raw bytes; the picklable entry point for the worker pool."""
+    return process_image(io.BytesIO(data), dest_dir, sizes, formats)
+
+def stored_derivatives(dest_dir, sizes, formats):
+    """
+    Returns the (width, format, filename) list process_image would write into dest_dir
+    if every one of those files already exists there, else None.
+    """
+    expected = [(size, fmt, f"{size}.{FORMAT_EXTENSIONS[fmt]}")
+                for size in sorted(set(sizes), reverse=True) for fmt in formats]
+    if all(os.path.exists(os.path.join(dest_dir, name)) for _, _, name in expected):
+        return expected
+    return None
+
+def primary_derivative(derivatives, target_size):
+    """
+    Picks the derivative stored in ProductImage.file_path for plain <img> use:
+    the JPEG at IMAGE_SIZE when produced, otherwise the largest one.
+    `derivatives` is a list of (width, format, path).
+    """
+    for width, fmt, path in derivatives:
+        if width == target_size and fmt == 'jpeg':
+            return path
+    return max(derivatives, key=lambda d: d[0])[2]
+
+def peak_rss_kb():
+    """Peak resident set size of the current process in KiB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:  # Windows
         return None
-    finally:
-        # Clean up the temporary file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
\ No newline at end of file
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def format_image_stats(stats):
+    """One-line summary of process_image stats for the log."""
+    return (f"{stats['source_size'][0]}x{stats['source_size'][1]} decoded at "
+            f"{stats['decoded_size'][0]}x{stats['decoded_size'][1]}, "
+            f"pixel buffer {stats['pixel_buffer_kb']} KiB, process peak RSS "
+            f"{stats['process_peak_rss_kb']} KiB (+{stats['peak_rss_growth_kb']} KiB)")
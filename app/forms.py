@@ -2,10 +2,53 @@
 
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed, FileRequired
-from wtforms import StringField, PasswordField, SubmitField, BooleanField, SelectField, TextAreaField, URLField, SelectMultipleField, MultipleFileField
-from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError
+from wtforms import StringField, PasswordField, SubmitField, BooleanField, SelectField, TextAreaField, URLField, SelectMultipleField, MultipleFileField, IntegerField, DecimalField
+from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, InputRequired, NumberRange, Optional
 from wtforms.widgets import CheckboxInput, ListWidget
-from app.models import User, USER_ROLES, SUPPLIER_TYPES, Style, Category, Brand, Material, Supplier
+from app.models import User, USER_ROLES, SUPPLIER_TYPES, Style, Category, Brand, Material, Supplier, Color, ProductVariant, MOVEMENT_KINDS
+from app.uniqueness import existing_values
+
+# --- Unique Field Checks ---
+class UniqueFieldsMixin:
+    """
+    Checks the form's `unique_fields` against stored `unique_model` rows in one query
+    (app/uniqueness.py) once the field validators have passed, instead of one query per
+    field or a failed commit. The row being edited is `original`, set by the route.
+    """
+    unique_model = None      # set by the route for forms shared by several models
+    unique_fields = ()
+    unique_messages = {}
+    original = None
+    check_unique = True      # False when the caller checks a batch of forms itself
+
+    def unique_values(self):
+        """{field name: submitted value} of the unique fields that passed their own validators."""
+        fields = (getattr(self, name) for name in self.unique_fields)
+        return {field.name: field.data for field in fields if field.data and not field.errors}
+
+    def flag_taken(self, found):
+        """
+        Adds an error to each unique field whose value is held by another row in `found`
+        (existing_values output). True if any was taken.
+        """
+        own_id = self.original.id if self.original is not None else None
+        taken = False
+        for name, value in self.unique_values().items():
+            holder = found.get(name, {}).get(value)
+            if holder is not None and holder != own_id:
+                field = getattr(self, name)
+                field.errors.append(self.unique_messages.get(name) or
+                                    f'That {field.label.text.lower()} is already in use. Please choose a different one.')
+                taken = True
+        return taken
+
+    def validate(self, extra_validators=None):
+        valid = super().validate(extra_validators)
+        if not self.check_unique or self.unique_model is None:
+            return valid
+        values = self.unique_values()
+        taken = bool(values) and self.flag_taken(existing_values(self.unique_model, values))
+        return valid and not taken
 
 # --- Login Form ---
 class LoginForm(FlaskForm):
@@ -16,7 +59,7 @@ class LoginForm(FlaskForm):
     submit = SubmitField('Log In')
 
 # --- User CRUD Form ---
-class UserForm(FlaskForm):
+class UserForm(UniqueFieldsMixin, FlaskForm):
     # DataRequired ensures the field isn't empty on submission
     name = StringField('Full Name', validators=[DataRequired(), Length(min=2, max=100)])
     phone = StringField('Phone Number', validators=[DataRequired()])
@@ -37,35 +80,33 @@ class UserForm(FlaskForm):
     
     submit = SubmitField('Save User')
 
-    # Custom validation methods to ensure unique fields when adding/editing
-    def validate_username(self, username):
-        user = User.query.filter_by(username=username.data).first()
-        if user:
-            # Check if this user is the one being edited (if applicable)
-            if not hasattr(self, 'original_user') or self.original_user.username != username.data:
-                raise ValidationError('That username is already taken. Please choose a different one.')
-    
-    def validate_email(self, email):
-        user = User.query.filter_by(email=email.data).first()
-        if user:
-             # Check if this user is the one being edited (if applicable)
-            if not hasattr(self, 'original_user') or self.original_user.email != email.data:
-                raise ValidationError('That email is already in use. Please choose a different one.')
-            
+    # Username and email are checked together in one query (UniqueFieldsMixin)
+    unique_model = User
+    unique_fields = ('username', 'email')
+    unique_messages = {
+        'username': 'That username is already taken. Please choose a different one.',
+        'email': 'That email is already in use. Please choose a different one.',
+    }
 
 # --- Category Form ---
-class CategoricalForm(FlaskForm):
+class CategoricalForm(UniqueFieldsMixin, FlaskForm):
+    # Shared by styles, categories and materials: the route sets unique_model
+    unique_fields = ('name',)
     name = StringField('Name', validators=[DataRequired(), Length(max=100)])
     submit = SubmitField('Save')
 
 # --- Brand Form ---
 class BrandForm(CategoricalForm):
     # Brand is slightly different because of the boolean field
+    unique_model = Brand
     is_own_brand = BooleanField('Is Own Brand?')
     # No need to redefine name or submit
 
 # --- Color Form ---
-class ColorForm(FlaskForm):
+class ColorForm(UniqueFieldsMixin, FlaskForm):
+    unique_model = Color
+    unique_fields = ('name', 'hex_code')
+
     # Name is still required
     name = StringField('Color Name', validators=[DataRequired(), Length(max=100)])
     
@@ -77,7 +118,11 @@ class ColorForm(FlaskForm):
     submit = SubmitField('Save')
 
 # --- Supplier CRUD Form ---
-class SupplierForm(FlaskForm):
+class SupplierForm(UniqueFieldsMixin, FlaskForm):
+    unique_model = Supplier
+    unique_fields = ('name',)
+    unique_messages = {'name': 'A supplier with that name already exists.'}
+
     # Select field for type
     supplier_type = SelectField('Type', coerce=int, validators=[DataRequired()], 
                                 choices=[(r, name) for r, name in SUPPLIER_TYPES.items()])
@@ -130,4 +175,85 @@ class ProductForm(FlaskForm):
         FileAllowed(['jpg', 'jpeg', 'png'], 'Allowed file types are PNG, JPG, JPEG.')
     ])
     
-    submit = SubmitField('Save Product Details')
\ No newline at end of file
+    submit = SubmitField('Save Product Details')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # colors holds Color rows on the model but ids in the form
+        obj = kwargs.get('obj')
+        if obj is not None and not self.is_submitted():
+            self.colors.data = [c.id for c in obj.colors]
+
+    def populate_obj(self, obj):
+        """Populates the product, resolving the submitted color ids to Color rows."""
+        for name, field in self._fields.items():
+            if name != 'colors':
+                field.populate_obj(obj, name)
+        color_ids = self.colors.data or []
+        obj.colors = Color.query.filter(Color.id.in_(color_ids)).all() if color_ids else []
+
+# --- Product Import Form ---
+class ProductImportForm(FlaskForm):
+    file = FileField('Product File (CSV or XLSX)', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'xlsx'], 'Allowed file types are CSV and XLSX.')
+    ])
+    submit = SubmitField('Import Products')
+
+# --- Product Variant Form ---
+class VariantForm(UniqueFieldsMixin, FlaskForm):
+    unique_model = ProductVariant
+    unique_fields = ('sku',)
+    unique_messages = {'sku': 'That SKU is already in use. Please choose a different one.'}
+
+    # Choices (the product's colors) are populated in the route
+    color_id = SelectField('Color', coerce=int, validators=[DataRequired()])
+    sku = StringField('SKU', validators=[DataRequired(), Length(max=64)])
+    price = DecimalField('Price', places=2, validators=[InputRequired(), NumberRange(min=0)])
+    reorder_level = IntegerField('Reorder Level (low stock at or below)', default=0,
+                                 validators=[InputRequired(), NumberRange(min=0)])
+    submit = SubmitField('Save Variant')
+
+# --- Stock Movement Form ---
+class StockMovementForm(FlaskForm):
+    kind = SelectField('Movement', choices=list(MOVEMENT_KINDS.items()), validators=[DataRequired()])
+    # Positive for receive/sell; signed for adjust (see inventory.signed_quantity)
+    quantity = IntegerField('Quantity', validators=[InputRequired()])
+    reference = StringField('Reference (order/invoice no.)', validators=[Optional(), Length(max=100)])
+    note = StringField('Note', validators=[Optional(), Length(max=255)])
+    submit = SubmitField('Post Movement')
+
+# --- Purchasing Forms ---
+# Lines come from an uploaded CSV/XLSX file or pasted CSV text (see app/purchasing.py)
+LINES_FILE_VALIDATORS = [FileAllowed(['csv', 'xlsx'], 'Allowed file types are CSV and XLSX.')]
+
+def lines_required(form, field):
+    """Validator for lines_text: a document needs pasted lines or a lines file."""
+    if not (field.data or '').strip() and not form.lines_file.data:
+        raise ValidationError('Upload a lines file or paste the lines.')
+
+class PurchaseOrderForm(FlaskForm):
+    reference = StringField('Order Number', validators=[DataRequired(), Length(max=50)])
+    lines_file = FileField('Lines File (CSV or XLSX)', validators=LINES_FILE_VALIDATORS)
+    lines_text = TextAreaField('Or Paste Lines (CSV with a header row)', validators=[lines_required],
+                               render_kw={'rows': 8})
+    note = StringField('Note', validators=[Optional(), Length(max=255)])
+    submit = SubmitField('Create Purchase Order')
+
+class GoodsReceiptForm(FlaskForm):
+    reference = StringField('Delivery Note Number', validators=[DataRequired(), Length(max=50)])
+    # Choices (the supplier's open orders) are populated in the route; 0 = no order
+    order_id = SelectField('Against Purchase Order', coerce=int, default=0)
+    lines_file = FileField('Lines File (CSV or XLSX)', validators=LINES_FILE_VALIDATORS)
+    lines_text = TextAreaField('Or Paste Lines (CSV with a header row)', validators=[lines_required],
+                               render_kw={'rows': 8})
+    note = StringField('Note', validators=[Optional(), Length(max=255)])
+    submit = SubmitField('Receive Goods')
+
+# --- Categorical Bulk Form ---
+# Rows are names plus the model's extra columns (see app/product/bulk.py)
+class CategoricalBulkForm(FlaskForm):
+    lines_file = FileField('File (CSV or XLSX)', validators=LINES_FILE_VALIDATORS)
+    lines_text = TextAreaField('Or Paste Rows (one per line)', validators=[lines_required],
+                               render_kw={'rows': 12})
+    submit = SubmitField('Save All')
@@ -0,0 +1,343 @@
+# app/image_ingest.py
+
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from sqlalchemy import delete, insert, select, update
+from app import db
+from app.dashboard import apply_deltas
+from app.file_utils import (HASH_CHUNK_SIZE, content_dir, primary_derivative, process_image,
+                            slugify, stored_derivatives)
+
+# Manifest line statuses. Only 'done' files are skipped on resume; the others are retried
+# (an unmatched photo may match a product imported since).
+MANIFEST_DONE = 'done'
+MANIFEST_FAILED = 'failed'
+MANIFEST_UNMATCHED = 'unmatched'
+
+
+# --- Source discovery ---
+
+def list_sources(source, allowed_extensions):
+    """
+    Yields the image names under `source`, a directory (paths relative to it) or a zip
+    archive (member names), in sorted order so reruns see the same sequence.
+    """
+    def allowed(name):
+        return '.' in name and name.rsplit('.', 1)[1].lower() in allowed_extensions
+
+    if os.path.isdir(source):
+        names = []
+        for root, dirs, files in os.walk(source):
+            names.extend(os.path.relpath(os.path.join(root, f), source) for f in files)
+    else:
+        with zipfile.ZipFile(source) as archive:
+            names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    for name in sorted(names):
+        if allowed(name) and not os.path.basename(name).startswith('.'):
+            yield name
+
+
+def match_name(name):
+    """
+    Maps an image name to (product slug, image type). `<product name>.jpg` is the base
+    photo; `<product name>.<anything>.jpg` (e.g. `Linen Shirt.2.jpg`) is an additional one.
+    Folders are ignored, so files can be grouped freely.
+    """
+    stem = os.path.basename(name).rsplit('.', 1)[0]
+    if '.' in stem:
+        return slugify(stem.rsplit('.', 1)[0]), 'additional'
+    return slugify(stem), 'base'
+
+
+def product_slug_map():
+    """{slug: product id} for every product; slugs shared by several products map to None."""
+    from app.models import Product
+
+    slugs = {}
+    for product_id, name in db.session.execute(select(Product.id, Product.name)):
+        slug = slugify(name)
+        slugs[slug] = None if slug in slugs else product_id
+    return slugs
+
+
+# --- Worker side (runs in the process pool; no app context, no database) ---
+
+# One open ZipFile per worker process, so the central directory is read once, not per image
+_open_archives = {}
+
+
+def _open_source(source, name):
+    if os.path.isdir(source):
+        return open(os.path.join(source, name), 'rb')
+    archive = _open_archives.get(source)
+    if archive is None:
+        archive = _open_archives[source] = zipfile.ZipFile(source)
+    return archive.open(name)
+
+
+def ingest_image(source, name, upload_folder, sizes, formats):
+    """
+    Hashes one image from a directory or zip and writes its derivatives into the
+    content-addressed store, skipping the decode when they are already stored.
+
+    Returns: dict with content_hash, derivatives [(width, format, relative path)], bytes
+    read, the worker pid and the CPU seconds this image took. Raises on failure.
+    """
+    cpu_started = time.process_time()
+    digest = hashlib.sha256()
+    size = 0
+    with _open_source(source, name) as stream:
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    content_hash = digest.hexdigest()
+
+    relative_dir = content_dir(content_hash)
+    dest_dir = os.path.join(upload_folder, relative_dir)
+    derivatives = stored_derivatives(dest_dir, sizes, formats)
+    if derivatives is None:
+        with _open_source(source, name) as stream:
+            derivatives = process_image(stream, dest_dir, sizes, formats)['derivatives']
+
+    return {
+        'content_hash': content_hash,
+        'derivatives': [(w, f, os.path.join(relative_dir, n)) for w, f, n in derivatives],
+        'bytes': size,
+        'pid': os.getpid(),
+        'cpu': time.process_time() - cpu_started,
+    }
+
+
+# --- Manifest ---
+
+def read_manifest(path):
+    """{name: status} from a manifest file; the last line for a name wins."""
+    statuses = {}
+    if path and os.path.exists(path):
+        with open(path) as manifest:
+            for line in manifest:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line from an interrupted run
+                statuses[entry['file']] = entry['status']
+    return statuses
+
+
+class IngestReport:
+    """Counters, timing and per-worker CPU time for one ingestion run."""
+
+    def __init__(self):
+        self.seen = 0
+        self.resumed = 0
+        self.ingested = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.unmatched = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.errors = []
+        self.worker_cpu = defaultdict(float)
+        self.worker_images = defaultdict(int)
+
+    @property
+    def images_per_sec(self):
+        return self.ingested / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_sec(self):
+        return self.bytes / 1024 / 1024 / self.elapsed if self.elapsed else 0.0
+
+    def utilization(self, workers):
+        """Average share of `workers` cores spent in image work over the run (0..1)."""
+        if not self.elapsed or not workers:
+            return 0.0
+        return sum(self.worker_cpu.values()) / (self.elapsed * workers)
+
+
+# --- Main process ---
+
+class ImageIngester:
+    """
+    Attaches a directory or zip of photos to existing products.
+
+    Files are matched to products by slug (see match_name), hashed and processed on a
+    process pool, and the ProductImage/ImageDerivative rows are bulk-inserted
+    `batch_size` results at a time. Every committed batch is appended to a JSON Lines
+    manifest, so a rerun with the same manifest skips the files already recorded.
+    """
+
+    def __init__(self, app, source, manifest_path, workers, batch_size=200):
+        self.app = app
+        self.source = source
+        self.manifest_path = manifest_path
+        self.workers = workers
+        self.batch_size = batch_size
+        self.report = IngestReport()
+        self._batch = []
+        self._manifest = None
+        self._claimed_bases = set()
+
+    def run(self):
+        config = self.app.config
+        started = time.perf_counter()
+        done = read_manifest(self.manifest_path)
+        slugs = product_slug_map()
+        job_args = (config['UPLOAD_FOLDER'], config['IMAGE_DERIVATIVE_SIZES'],
+                    config['IMAGE_DERIVATIVE_FORMATS'])
+
+        self._manifest = open(self.manifest_path, 'a')
+        executor = None
+        if self.workers:
+            executor = ProcessPoolExecutor(max_workers=self.workers,
+                                           mp_context=multiprocessing.get_context('spawn'))
+        try:
+            # Bounded number of jobs in flight keeps memory flat on huge sources
+            in_flight = {}
+            for name in list_sources(self.source, config['ALLOWED_EXTENSIONS']):
+                self.report.seen += 1
+                if done.get(name) == MANIFEST_DONE:
+                    self.report.resumed += 1
+                    continue
+
+                slug, image_type = match_name(name)
+                product_id = slugs.get(slug)
+                if product_id is None:
+                    reason = 'ambiguous product name' if slug in slugs else 'no matching product'
+                    self._record(name, MANIFEST_UNMATCHED, reason)
+                    continue
+                if image_type == 'base':
+                    if product_id in self._claimed_bases:
+                        self._record(name, MANIFEST_FAILED, 'second base photo for the product')
+                        continue
+                    self._claimed_bases.add(product_id)
+
+                job = (name, product_id, image_type)
+                if executor is None:
+                    # workers = 0: process inline (small batches, debugging)
+                    try:
+                        self._collect(job, ingest_image(self.source, name, *job_args))
+                    except Exception as e:
+                        self._record(name, MANIFEST_FAILED, str(e))
+                    continue
+                in_flight[executor.submit(ingest_image, self.source, name, *job_args)] = job
+                if len(in_flight) >= self.workers * 4:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        self._collect_future(in_flight.pop(future), future)
+
+            for future in list(in_flight):
+                self._collect_future(in_flight.pop(future), future)
+            self._flush()
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+            self._manifest.close()
+            self.report.elapsed = time.perf_counter() - started
+        return self.report
+
+    def _collect_future(self, job, future):
+        error = future.exception()
+        if error is not None:
+            self._record(job[0], MANIFEST_FAILED, str(error))
+        else:
+            self._collect(job, future.result())
+
+    def _collect(self, job, result):
+        self.report.worker_cpu[result['pid']] += result['cpu']
+        self.report.worker_images[result['pid']] += 1
+        self.report.bytes += result['bytes']
+        self._batch.append((job, result))
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def _record(self, name, status, message=None):
+        if status == MANIFEST_FAILED:
+            self.report.failed += 1
+            self.report.errors.append((name, message))
+        elif status == MANIFEST_UNMATCHED:
+            self.report.unmatched += 1
+            self.report.errors.append((name, message))
+        self._write_manifest([{'file': name, 'status': status, 'error': message}])
+
+    def _write_manifest(self, entries):
+        for entry in entries:
+            self._manifest.write(json.dumps(entry) + '\n')
+        self._manifest.flush()
+        os.fsync(self._manifest.fileno())
+
+    def _flush(self):
+        """Writes the pending results in one transaction, then records them in the manifest."""
+        from app.models import ProductImage, ImageDerivative
+
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+
+        target_size = self.app.config['IMAGE_SIZE']
+        # Idempotent reruns: an image whose rows committed just before a crash is not added twice
+        pairs = {(product_id, result['content_hash']) for (_, product_id, _), result in batch}
+        existing = set(db.session.execute(
+            select(ProductImage.product_id, ProductImage.content_hash)
+            .where(ProductImage.product_id.in_({p for p, _ in pairs}),
+                   ProductImage.content_hash.in_({h for _, h in pairs}))
+        ).all())
+        base_products = {product_id for (_, product_id, image_type), _ in batch if image_type == 'base'}
+        base_ids = dict(db.session.execute(
+            select(ProductImage.product_id, ProductImage.id)
+            .where(ProductImage.type == 'base', ProductImage.product_id.in_(base_products))
+        ).all())
+
+        new_rows, new_derivatives, replaced = [], [], []
+        duplicates = 0
+        for (name, product_id, image_type), result in batch:
+            if (product_id, result['content_hash']) in existing:
+                duplicates += 1
+                continue
+            values = {'file_path': primary_derivative(result['derivatives'], target_size),
+                      'content_hash': result['content_hash'], 'status': 'ready', 'source_path': None}
+            if image_type == 'base' and product_id in base_ids:
+                # A new base photo replaces the current one, as in edit_product
+                replaced.append((base_ids[product_id], values, result['derivatives']))
+            else:
+                new_rows.append(dict(values, product_id=product_id, type=image_type))
+                new_derivatives.append(result['derivatives'])
+
+        try:
+            if new_rows:
+                ids = db.session.execute(
+                    insert(ProductImage).returning(ProductImage.id, sort_by_parameter_order=True),
+                    new_rows,
+                ).scalars().all()
+            else:
+                ids = []
+            derivative_rows = [{'image_id': image_id, 'width': w, 'format': f, 'file_path': p}
+                               for image_id, derivatives in zip(ids, new_derivatives)
+                               for w, f, p in derivatives]
+            for image_id, values, derivatives in replaced:
+                db.session.execute(update(ProductImage).where(ProductImage.id == image_id).values(**values))
+                db.session.execute(delete(ImageDerivative).where(ImageDerivative.image_id == image_id))
+                derivative_rows.extend({'image_id': image_id, 'width': w, 'format': f, 'file_path': p}
+                                       for w, f, p in derivatives)
+            if derivative_rows:
+                db.session.execute(insert(ImageDerivative), derivative_rows)
+            # Core inserts skip the dashboard events; every new base row fills a missing one
+            new_bases = sum(1 for row in new_rows if row['type'] == 'base')
+            apply_deltas(db.session.connection(), {('products', 'missing_base_photo'): -new_bases})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for (name, _, _), _ in batch:
+                self._record(name, MANIFEST_FAILED, f"database error: {e}")
+            return
+
+        self.report.ingested += len(batch) - duplicates
+        self.report.duplicates += duplicates
+        self._write_manifest([{'file': name, 'status': MANIFEST_DONE, 'hash': result['content_hash']}
+                              for (name, _, _), result in batch])
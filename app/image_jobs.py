@@ -0,0 +1,156 @@
+# app/image_jobs.py
+
+import os
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from flask import current_app
+from app import db
+from app.file_utils import (allowed_file, content_dir, format_image_stats, hash_upload,
+                            primary_derivative, process_image_bytes)
+from app.metrics import record_timing
+
+
+def stage_upload(image, file_storage):
+    """
+    Points `image` (a ProductImage) at an upload in the content-addressed store.
+
+    If the same bytes were already processed, the existing derivatives are reused and
+    the image is 'ready' at once. Otherwise the image is left 'pending', and the caller
+    hands the upload's bytes (file_utils.read_upload) to ImageJobQueue.submit() after
+    commit; nothing is written to disk until the worker stores the derivatives.
+
+    Hashing the raw bytes counts towards the request's 'image' timer.
+
+    Returns: False if the upload is missing or not an allowed image type, else True.
+    """
+    if not file_storage or not file_storage.filename or not allowed_file(file_storage.filename):
+        return False
+
+    started = time.perf_counter()
+    try:
+        _stage(image, file_storage)
+    finally:
+        record_timing('image', time.perf_counter() - started)
+    return True
+
+
+def _stage(image, file_storage):
+    from app.models import ProductImage, ImageDerivative
+
+    content_hash = hash_upload(file_storage)
+    image.content_hash = content_hash
+    image.derivatives = []
+
+    # Deduplicate: copy the derivative records of a processed image with the same bytes
+    existing = ProductImage.query.filter_by(content_hash=content_hash, status='ready').first()
+    if existing is not None and existing.derivatives:
+        image.derivatives = [ImageDerivative(width=d.width, format=d.format, file_path=d.file_path)
+                             for d in existing.derivatives]
+        image.file_path = existing.file_path
+        image.status = 'ready'
+        image.source_path = None
+        return
+
+    image.source_path = None
+    # Provisional path of the primary derivative; confirmed when processing finishes
+    image.file_path = os.path.join(content_dir(content_hash), 'pending')
+    image.status = 'pending'
+
+
+class ImageJobQueue:
+    """
+    Local job queue that runs Pillow processing for product uploads on a process pool.
+
+    The request only commits a 'pending' ProductImage row, then calls submit() with the
+    upload's bytes. A worker process decodes them and writes every configured derivative,
+    and the done-callback (running in this process) records them and flips the row to
+    'ready' or 'failed'.
+    """
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['image_jobs'] = self
+
+    def _get_executor(self, app):
+        # Created lazily so each gunicorn worker gets its own pool after forking
+        with self._lock:
+            if self._executor is None:
+                workers = app.config.get('IMAGE_WORKERS') or os.cpu_count()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    # 'spawn' avoids forking a process that already runs request threads
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._executor
+
+    def submit(self, image_id, data, content_hash):
+        """Queues processing of one upload's raw bytes for the ProductImage with id `image_id`."""
+        app = current_app._get_current_object()
+        dest_dir = os.path.join(app.config['UPLOAD_FOLDER'], content_dir(content_hash))
+        # The bytes are pickled to the worker process with the job
+        job = partial(process_image_bytes, data, dest_dir,
+                      app.config['IMAGE_DERIVATIVE_SIZES'], app.config['IMAGE_DERIVATIVE_FORMATS'])
+
+        # IMAGE_WORKERS = 0 processes inline (tests, CLI one-offs)
+        if app.config.get('IMAGE_WORKERS') == 0:
+            stats, error = None, None
+            try:
+                stats = job()
+            except Exception as e:
+                error = e
+            self._finish(app, image_id, stats, error)
+            return
+
+        future = self._get_executor(app).submit(job)
+        future.add_done_callback(partial(self._on_done, app, image_id))
+
+    def _on_done(self, app, image_id, future):
+        error = future.exception()
+        self._finish(app, image_id, None if error else future.result(), error)
+
+    def _finish(self, app, image_id, stats, error):
+        from app.models import ProductImage, ImageDerivative
+
+        # Pool time goes to /metrics; inline (IMAGE_WORKERS = 0) it is also request time
+        seconds = stats['seconds'] if stats else None
+        metrics = app.extensions.get('request_metrics')
+        if metrics is not None:
+            metrics.record_job('image', seconds, failed=error is not None)
+        if seconds is not None:
+            record_timing('image', seconds)
+
+        with app.app_context():
+            try:
+                image = db.session.get(ProductImage, image_id)
+                if image is not None:
+                    if error is None:
+                        relative_dir = content_dir(image.content_hash)
+                        derivatives = [(width, fmt, os.path.join(relative_dir, name))
+                                       for width, fmt, name in stats['derivatives']]
+                        image.derivatives = [ImageDerivative(width=w, format=f, file_path=p)
+                                             for w, f, p in derivatives]
+                        image.file_path = primary_derivative(derivatives, app.config['IMAGE_SIZE'])
+                        image.status = 'ready'
+                        app.logger.info(f"Processed image {image_id}: {format_image_stats(stats)}")
+                    else:
+                        image.status = 'failed'
+                        app.logger.error(f"Image processing failed for image {image_id}: {error}")
+                    image.source_path = None
+                    db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Could not record result for image {image_id}: {e}")
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
@@ -0,0 +1,143 @@
+# app/inventory.py
+
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import bindparam, func, insert, select, update
+from app import db
+from app.models import MOVEMENT_KINDS, ProductVariant, StockMovement
+
+# Stock is an append-only ledger (StockMovement) plus a running on_hand total per variant.
+# Every posting writes its ledger rows and the matching on_hand increments in the caller's
+# transaction, so the two never disagree after a commit and on_hand/low-stock reads are a
+# single row lookup instead of a SUM over the ledger.
+
+# Ids bound per IN (...) lookup; keeps large batches under SQLite's host-parameter limit
+IN_BATCH = 500
+
+
+class StockError(ValueError):
+    """A movement that cannot be posted (unknown variant, bad quantity, not enough stock)."""
+
+
+def batches(items, size=IN_BATCH):
+    """Splits a list into consecutive slices of at most `size` items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def signed_quantity(kind, quantity):
+    """
+    The change to on_hand for a movement: receive and sell take a positive quantity
+    (sell removes it), adjust takes a signed one. Raises StockError otherwise.
+    """
+    if kind not in MOVEMENT_KINDS:
+        raise StockError(f"Unknown movement kind '{kind}'.")
+    if not isinstance(quantity, int) or quantity == 0:
+        raise StockError("Quantity must be a non-zero whole number.")
+    if kind == 'adjust':
+        return quantity
+    if quantity < 0:
+        raise StockError(f"Quantity for '{kind}' must be positive; use 'adjust' for corrections.")
+    return quantity if kind == 'receive' else -quantity
+
+
+def post_movements(movements, user_id=None, allow_negative=False):
+    """
+    Posts a batch of movements, each a dict with variant_id, kind, quantity and optional
+    reference/note, in the current transaction (the caller commits).
+
+    The batch is validated as a whole (one locked read of the affected variants) and then
+    written with one executemany for the ledger rows and one for the on_hand increments,
+    so the statement count does not grow with the batch (beyond one read per IN_BATCH
+    ids). Unless `allow_negative`, a batch that would take any variant below zero is
+    rejected entirely. Returns the rows posted.
+    """
+    posted_at = datetime.utcnow()
+    rows, deltas = [], Counter()
+    for movement in movements:
+        quantity = signed_quantity(movement['kind'], movement['quantity'])
+        rows.append({
+            'variant_id': movement['variant_id'], 'kind': movement['kind'], 'quantity': quantity,
+            'reference': movement.get('reference') or None, 'note': movement.get('note') or None,
+            'created_at': posted_at, 'user_id': user_id,
+        })
+        deltas[movement['variant_id']] += quantity
+    if not rows:
+        return 0
+
+    session = db.session
+    connection = session.connection()
+    table = ProductVariant.__table__
+
+    # Row locks (where the database has them) keep concurrent postings from both passing the check
+    on_hand = {}
+    for ids in batches(list(deltas)):
+        on_hand.update(connection.execute(
+            select(table.c.id, table.c.on_hand).where(table.c.id.in_(ids)).with_for_update()
+        ).all())
+    missing = sorted(set(deltas) - set(on_hand))
+    if missing:
+        raise StockError(f"Unknown variant id(s): {', '.join(map(str, missing))}.")
+    if not allow_negative:
+        short = [variant_id for variant_id, delta in deltas.items() if on_hand[variant_id] + delta < 0]
+        if short:
+            raise StockError("Not enough stock for variant id(s): "
+                             + ', '.join(f"{v} (on hand {on_hand[v]}, change {deltas[v]:+d})" for v in short))
+
+    connection.execute(insert(StockMovement.__table__), rows)
+    connection.execute(
+        update(table).where(table.c.id == bindparam('variant')).values(on_hand=table.c.on_hand + bindparam('delta')),
+        [{'variant': variant_id, 'delta': delta} for variant_id, delta in deltas.items() if delta],
+    )
+
+    # Variants already loaded in this session would otherwise show the old on_hand
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, ProductVariant) and obj.id in deltas:
+            session.expire(obj, ['on_hand'])
+    return len(rows)
+
+
+def post_movement(variant, kind, quantity, reference=None, note=None, user_id=None):
+    """Posts one movement for `variant` (see post_movements)."""
+    return post_movements([{'variant_id': variant.id, 'kind': kind, 'quantity': quantity,
+                            'reference': reference, 'note': note}], user_id=user_id)
+
+
+def variant_ids_by_sku(skus):
+    """{sku: variant id} for the given SKUs, one query per IN_BATCH SKUs; unknown SKUs are absent."""
+    found = {}
+    for chunk in batches(list(set(skus))):
+        found.update(db.session.execute(
+            select(ProductVariant.sku, ProductVariant.id).where(ProductVariant.sku.in_(chunk))).all())
+    return found
+
+
+def variant_counts(product_ids):
+    """{product id: number of variants} for a page of products, in one grouped query."""
+    if not product_ids:
+        return {}
+    return dict(db.session.execute(
+        select(ProductVariant.product_id, func.count(ProductVariant.id))
+        .where(ProductVariant.product_id.in_(product_ids))
+        .group_by(ProductVariant.product_id)).all())
+
+
+def low_stock_query():
+    """Variants at or below their reorder level, emptiest first."""
+    return (ProductVariant.query
+            .filter(ProductVariant.on_hand <= ProductVariant.reorder_level)
+            .order_by(ProductVariant.on_hand, ProductVariant.sku))
+
+
+def recompute_on_hand():
+    """
+    Resets every variant's on_hand to the sum of its ledger, in the caller's transaction.
+    For repair after manual SQL; returns the number of variants that were out of step.
+    """
+    table = ProductVariant.__table__
+    ledger_total = (select(func.coalesce(func.sum(StockMovement.quantity), 0))
+                    .where(StockMovement.variant_id == table.c.id)
+                    .scalar_subquery())
+    result = db.session.execute(update(table).where(table.c.on_hand != ledger_total)
+                                .values(on_hand=ledger_total))
+    return result.rowcount
@@ -0,0 +1,119 @@
+# app/login_guard.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from flask import current_app
+
+
+class LoginBusy(Exception):
+    """Raised when every password-verification slot is taken."""
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token bucket: `attempts` tokens refill evenly over `per_seconds`, and each
+    attempt takes one. Keys are kept in LRU order and capped at `max_keys`, so a flood of
+    distinct keys cannot grow memory without bound. State is per process.
+    """
+
+    def __init__(self, attempts, per_seconds, max_keys=10000):
+        self.capacity = float(attempts)
+        self.rate = attempts / float(per_seconds)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        """Takes a token for `key`. Returns False (without taking one) when the bucket is empty."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed
+
+
+def _verify_in_app_context(app, password_hash, password):
+    from app.models import verify_password
+
+    # verify_password reads config (rehash target), so the pool thread needs a context
+    with app.app_context():
+        return verify_password(password_hash, password)
+
+
+class LoginGuard:
+    """
+    Protects main.login: per-IP and per-account token buckets reject floods before any
+    user lookup or hashing, and bcrypt verification runs on a bounded thread pool
+    (bcrypt releases the GIL) so a burst can occupy at most LOGIN_VERIFY_QUEUE slots.
+    """
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.enabled = True
+        self.ip_limiter = None
+        self.account_limiter = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config['LOGIN_THROTTLE_ENABLED']
+        self.ip_limiter = TokenBucketLimiter(*app.config['LOGIN_IP_RATE'])
+        self.account_limiter = TokenBucketLimiter(*app.config['LOGIN_ACCOUNT_RATE'])
+        self.workers = app.config['LOGIN_VERIFY_THREADS'] or os.cpu_count()
+        self.queue_size = app.config['LOGIN_VERIFY_QUEUE']
+        self.timeout = app.config['LOGIN_VERIFY_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        app.extensions['login_guard'] = self
+
+    def allow(self, remote_addr, identifier):
+        """Cheap pre-check. Both buckets are charged so neither can be bypassed alone."""
+        if not self.enabled:
+            return True
+        ip_ok = self.ip_limiter.allow(remote_addr or 'unknown')
+        account_ok = self.account_limiter.allow((identifier or '').strip().lower())
+        return ip_ok and account_ok
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='bcrypt')
+            return self._executor
+
+    def verify(self, password_hash, password):
+        """
+        Runs verify_password(password_hash, password) on the verification pool and waits
+        for its (verified, new_hash). Raises LoginBusy instead of queueing when all slots
+        are in use, or when the check takes longer than the timeout.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise LoginBusy()
+        try:
+            app = current_app._get_current_object()
+            future = self._get_executor().submit(_verify_in_app_context, app, password_hash, password)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the hash finishes, even if this request stops waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise LoginBusy()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
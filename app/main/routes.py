@@ -1,10 +1,17 @@
 # app/main/routes.py
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, jsonify, Response, stream_with_context
 from functools import wraps
-from app import db
-from app.models import User, USER_ROLES
+from app import db, login_guard
+from app.login_guard import LoginBusy
+from app.models import User, USER_ROLES, SUPPLIER_TYPES
 from app.forms import LoginForm, UserForm
+from app.cache import user_cache
+from app.dashboard import load_stats
+from app.export import export_stream
+from app.product.routes import cached_choices
+from app.uniqueness import UNIQUE_CHECKS, CHECK_VALUES_LIMIT, existing_values
+from app.utils import admin_or_superadmin_required
 
 # Import the BP defined in app/__init__.py
 from app.main import bp 
@@ -29,6 +36,19 @@ def test():
 # ----------------------------
 # Authentication Routes
 # ----------------------------
+def find_login_user(identifier):
+    """
+    Looks up a user by username or email. Each path is a single equality on its own
+    unique index (an OR across both columns cannot use them well); only identifiers
+    containing '@' try the email index first.
+    """
+    if '@' in identifier:
+        user = User.query.filter_by(email=identifier).first()
+        if user is not None:
+            return user
+    return User.query.filter_by(username=identifier).first()
+
+
 @bp.route('/', methods=['GET', 'POST'])
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -37,10 +57,27 @@ def login():
 
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter(
-            (User.username == form.username.data) | (User.email == form.username.data)
-        ).first()
-        if user and user.check_password(form.password.data):
+        identifier = form.username.data.strip()
+
+        # Reject floods before any lookup or hashing
+        if not login_guard.allow(request.remote_addr, identifier):
+            flash('Too many login attempts. Please wait a minute and try again.', 'danger')
+            return render_template('login.html', form=form, title='Login'), 429, {'Retry-After': '60'}
+
+        user = find_login_user(identifier)
+        try:
+            verified, new_hash = (login_guard.verify(user.password_hash, form.password.data)
+                                  if user is not None else (False, None))
+        except LoginBusy:
+            flash('The server is busy. Please try again in a moment.', 'danger')
+            return render_template('login.html', form=form, title='Login'), 503, {'Retry-After': '5'}
+
+        if verified:
+            # Upgrade a hash made at another cost; the credential version is kept, so
+            # existing sessions stay valid
+            if new_hash:
+                user.password_hash = new_hash
+                db.session.commit()
             login_user(user, remember=form.remember.data)
             flash(f'Welcome back, {user.name}!', 'success')
             next_page = request.args.get('next')
@@ -64,7 +101,88 @@ def logout():
 @bp.route('/dashboard')
 @login_required
 def dashboard():
-    return render_template('dashboard.html', title='Dashboard')
+    """Catalog KPIs from the materialized counters (one read) and the cached name lists."""
+    stats = load_stats()
+
+    def ranked(metric, choices_name, limit=10):
+        names = dict(cached_choices(choices_name))
+        counts = [(names.get(int(key), f'#{key}'), value)
+                  for key, value in stats.get(metric, {}).items() if value]
+        return sorted(counts, key=lambda item: (-item[1], item[0]))[:limit]
+
+    products = stats.get('products', {})
+    kpis = {
+        'products': products.get('total', 0),
+        'missing_base_photo': products.get('missing_base_photo', 0),
+        'suppliers': stats.get('suppliers', {}).get('total', 0),
+    }
+    supplier_types = [(SUPPLIER_TYPES.get(int(key), 'Unknown'), value)
+                      for key, value in sorted(stats.get('supplier_type', {}).items()) if value]
+    breakdowns = [
+        ('Products by Category', ranked('category', 'categories')),
+        ('Products by Brand', ranked('brand', 'brands')),
+        ('Products by Supplier', ranked('supplier', 'suppliers')),
+        ('Products by Color', ranked('color', 'colors')),
+    ]
+    return render_template('dashboard.html', title='Dashboard', kpis=kpis,
+                           supplier_types=supplier_types, breakdowns=breakdowns)
+
+
+@bp.route('/cache-stats')
+@login_required
+@superadmin_required
+def cache_stats():
+    """Hit/miss counters of this worker's in-process caches."""
+    from app.cache import choice_cache
+    return jsonify(choices=choice_cache.stats(), users=user_cache.stats())
+
+
+@bp.route('/export/<dataset>.<fmt>')
+@login_required
+@admin_or_superadmin_required
+def export_data(dataset, fmt):
+    """
+    Streams a dataset (products, suppliers or a reference table) as CSV or JSON Lines.
+    Rows are read through a server-side cursor and sent as they are encoded, so memory
+    use is flat and the download starts at once. ?gzip=1 compresses on the fly.
+    """
+    compress = request.args.get('gzip', type=int) == 1
+    stream = export_stream(dataset, fmt, compress)
+    if stream is None:
+        abort(404)
+
+    filename = f"{dataset}.{fmt}" + ('.gz' if compress else '')
+    mimetype = 'application/gzip' if compress else \
+        ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    response = Response(stream_with_context(stream), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Tell reverse proxies not to buffer the whole body before sending it on
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@bp.route('/check-unique/<check>')
+@login_required
+@admin_or_superadmin_required
+def check_unique(check):
+    """
+    As-you-type uniqueness check for the edit forms: ?<column>=<value> for any of the
+    check's columns, plus &exclude=<id> for the row being edited. Answers
+    {"taken": {column: [values held by another row]}} from one indexed query.
+    """
+    entry = UNIQUE_CHECKS.get(check)
+    if entry is None:
+        abort(404)
+    if check == 'users' and not current_user.is_superadmin():
+        abort(403)
+    model, columns = entry
+    values = {column: request.args.getlist(column)[:CHECK_VALUES_LIMIT]
+              for column in columns if column in request.args}
+    exclude = request.args.get('exclude', type=int)
+    found = existing_values(model, values)
+    return jsonify(taken={column: sorted(value for value, row_id in found.get(column, {}).items()
+                                         if row_id != exclude)
+                          for column in values})
 
 
 # ----------------------------
@@ -91,8 +209,7 @@ def edit_user(user_id):
         return redirect(url_for('main.user_management'))
 
     form = UserForm(obj=user)
-    if user:
-        form.original_user = user  # Needed for unique field validation
+    form.original = user  # Excluded from the unique field checks
 
     if form.validate_on_submit():
         if user:
@@ -113,6 +230,8 @@ def edit_user(user_id):
             flash('New user created successfully.', 'success')
 
         db.session.commit()
+        if user:
+            user_cache.invalidate(user.id)
         return redirect(url_for('main.user_management'))
 
     return render_template('user_edit.html', form=form, user=user, title='Add/Edit User')
@@ -130,5 +249,6 @@ def delete_user(user_id):
 
     db.session.delete(user)
     db.session.commit()
+    user_cache.invalidate(user_id)
     flash(f'User "{user.username}" deleted successfully.', 'success')
     return redirect(url_for('main.user_management'))
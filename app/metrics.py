@@ -0,0 +1,244 @@
+# app/metrics.py
+
+import hmac
+import json
+import logging
+import threading
+import time
+from collections import deque
+from flask import Response, abort, current_app, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+from app.utils import percentile
+
+# Quantiles reported per endpoint on /metrics
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def record_timing(name, seconds):
+    """
+    Adds `seconds` to the current request's timer `name` (e.g. 'image'). No-op outside a
+    request or with metrics disabled, so library code can call it unconditionally.
+    """
+    if has_request_context():
+        timings = g.get('request_timings')
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + seconds
+
+
+class EndpointStats:
+    """
+    Totals plus a bounded window of recent durations for one endpoint, or one kind of
+    background job (for quantiles).
+    """
+
+    def __init__(self, window):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.recent = deque(maxlen=window)
+
+
+class RequestMetrics:
+    """
+    Per-request instrumentation: query count and DB time (cursor execute events), template
+    render time (Flask signals) and named timers such as Pillow work (record_timing).
+
+    Each response gets a Server-Timing header, one JSON log line is written per request,
+    and durations are aggregated per endpoint for /metrics (Prometheus text format).
+    Background jobs (image processing on the worker pool) report through record_job().
+    The hot path is a few perf_counter() calls and dict updates; aggregates are per
+    process, so each gunicorn worker reports its own.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._jobs = {}
+        self.enabled = False
+        self.window = 1024
+        self.logger = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['request_metrics'] = self
+        self.enabled = app.config['REQUEST_METRICS_ENABLED']
+        if not self.enabled:
+            return
+        self.window = app.config['REQUEST_METRICS_WINDOW']
+        self.logger = None
+        if app.config['REQUEST_LOG_ENABLED']:
+            # 'app.requests' propagates to the app logger's handler at INFO without
+            # lowering the level of the app logger itself
+            self.logger = app.logger.getChild('requests')
+            self.logger.setLevel(logging.INFO)
+
+        from app import db
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_after_render, app)
+
+        app.before_request(_start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def _finish_request(self, response):
+        timings = g.pop('request_timings', None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings.pop('started')
+        queries = timings.pop('queries')
+        db_seconds = timings.pop('db')
+        endpoint = request.endpoint or 'unmatched'
+
+        parts = [f'db;dur={db_seconds * 1000:.1f};desc="{queries} queries"']
+        parts += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.items()]
+        parts.append(f'total;dur={total * 1000:.1f}')
+        response.headers.add('Server-Timing', ', '.join(parts))
+
+        if self.logger is not None:
+            self.logger.info(json.dumps({
+                'event': 'request', 'method': request.method, 'path': request.path,
+                'endpoint': endpoint, 'status': response.status_code,
+                'ms': round(total * 1000, 1), 'queries': queries, 'db_ms': round(db_seconds * 1000, 1),
+                **{f'{name}_ms': round(seconds * 1000, 1) for name, seconds in timings.items()},
+            }))
+
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats(self.window)
+            stats.count += 1
+            stats.errors += response.status_code >= 500
+            stats.seconds += total
+            stats.queries += queries
+            stats.db_seconds += db_seconds
+            stats.recent.append(total)
+        return response
+
+    def record_job(self, name, seconds, failed=False):
+        """
+        Adds one run of background job `name` (e.g. 'image') to /metrics. Thread-safe, for
+        pool callbacks; `seconds` may be None for a failed run.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._jobs.get(name)
+            if stats is None:
+                stats = self._jobs[name] = EndpointStats(self.window)
+            stats.errors += failed
+            if seconds is not None:
+                stats.count += 1
+                stats.seconds += seconds
+                stats.recent.append(seconds)
+
+    def render(self):
+        """Prometheus text exposition of the per-endpoint aggregates."""
+        with self._lock:
+            snapshot = [(endpoint, stats.count, stats.errors, stats.seconds, stats.queries,
+                         stats.db_seconds, sorted(stats.recent))
+                        for endpoint, stats in sorted(self._stats.items())]
+            jobs = [(name, stats.count, stats.errors, stats.seconds, sorted(stats.recent))
+                    for name, stats in sorted(self._jobs.items())]
+
+        lines = [
+            '# HELP http_request_duration_seconds Request duration (quantiles over recent requests).',
+            '# TYPE http_request_duration_seconds summary',
+        ]
+        for endpoint, count, _, seconds, _, _, recent in snapshot:
+            for q in QUANTILES:
+                value = percentile(recent, q * 100)
+                lines.append(f'http_request_duration_seconds{{endpoint="{endpoint}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {seconds:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {count}')
+
+        counters = [
+            ('http_request_errors_total', 'Responses with a 5xx status.', 2),
+            ('http_request_db_queries_total', 'SQL statements executed by requests.', 4),
+            ('http_request_db_seconds_total', 'Time spent executing SQL.', 5),
+        ]
+        for name, help_text, index in counters:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for row in snapshot:
+                value = row[index]
+                value = f'{value:.6f}' if isinstance(value, float) else value
+                lines.append(f'{name}{{endpoint="{row[0]}"}} {value}')
+
+        if jobs:
+            lines += [
+                '# HELP background_job_duration_seconds Background job run time (quantiles over recent runs).',
+                '# TYPE background_job_duration_seconds summary',
+            ]
+            for name, count, _, seconds, recent in jobs:
+                for q in QUANTILES:
+                    value = percentile(recent, q * 100)
+                    lines.append(f'background_job_duration_seconds{{job="{name}",quantile="{q}"}} {value:.6f}')
+                lines.append(f'background_job_duration_seconds_sum{{job="{name}"}} {seconds:.6f}')
+                lines.append(f'background_job_duration_seconds_count{{job="{name}"}} {count}')
+            lines += [
+                '# HELP background_job_errors_total Background job runs that failed.',
+                '# TYPE background_job_errors_total counter',
+            ]
+            lines += [f'background_job_errors_total{{job="{name}"}} {errors}' for name, _, errors, _, _ in jobs]
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        """
+        Scrape endpoint. With METRICS_TOKEN set it requires `Authorization: Bearer <token>`.
+        Without one it is closed, except in debug or testing, where it answers requests
+        from this host (behind a reverse proxy every request comes from this host).
+        """
+        token = current_app.config['METRICS_TOKEN']
+        if token:
+            given = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(given.encode(), f'Bearer {token}'.encode()):
+                abort(403)
+        elif not (current_app.debug or current_app.testing):
+            abort(403)
+        elif request.remote_addr not in ('127.0.0.1', '::1'):
+            abort(403)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._jobs.clear()
+
+
+# --- Hooks (module level, so the engine and signal registrations hold no bound state) ---
+
+def _start_request():
+    g.request_timings = {'started': time.perf_counter(), 'queries': 0, 'db': 0.0}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        timings = g.get('request_timings')
+        if timings is not None:
+            timings['queries'] += 1
+            timings['db'] += time.perf_counter() - conn.info['query_started']
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context() and 'request_timings' in g:
+        g.setdefault('template_started', []).append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    stack = g.get('template_started') if has_request_context() else None
+    if stack:
+        started = stack.pop()
+        # Only the outermost render counts; nested renders are part of it
+        if not stack:
+            record_timing('template', time.perf_counter() - started)
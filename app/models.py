@@ -1,13 +1,65 @@
 # app/models.py
 
+from datetime import datetime
 from app import db, bcrypt
+from flask import current_app
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
 
+
+def bcrypt_cost(password_hash):
+    """Work factor of a bcrypt hash ('$2b$12$...' -> 12), or None if unparsable."""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def hash_password(password):
+    """bcrypt hash at the configured BCRYPT_LOG_ROUNDS work factor."""
+    rounds = current_app.config['BCRYPT_LOG_ROUNDS']
+    return bcrypt.generate_password_hash(password, rounds=rounds).decode('utf-8')
+
+def verify_password(password_hash, password):
+    """
+    Checks `password` against a stored bcrypt hash without touching any model or session,
+    so it can run off the request thread.
+
+    Returns: (verified, new_hash), where new_hash is a rehash at BCRYPT_LOG_ROUNDS when the
+    password is correct but the stored hash has another cost, else None.
+    """
+    if not bcrypt.check_password_hash(password_hash, password):
+        return False, None
+    if bcrypt_cost(password_hash) != current_app.config['BCRYPT_LOG_ROUNDS']:
+        return True, hash_password(password)
+    return True, None
+
+
 # Roles: 0 = SuperAdmin, 1 = Admin, 2 = Moderator
 USER_ROLES = {0: 'SuperAdmin', 1: 'Admin', 2: 'Moderator'}
 
-class User(UserMixin, db.Model):
+class UserRoleMixin:
+    """Role helpers shared by User and the cached UserSnapshot."""
+
+    def get_id(self):
+        # The credential version rides along in the session, so bumping it
+        # (e.g. on a password change) logs out every existing session
+        return f"{self.id}:{self.credential_version or 0}"
+
+    def get_role_name(self):
+        """Return human-readable role name."""
+        # FIX: Use the USER_ROLES dictionary for reliable mapping
+        return USER_ROLES.get(self.role, "User") 
+
+    def is_superadmin(self):
+        # FIX: Check against integer 0
+        return self.role == 0 
+
+    def is_admin_or_superadmin(self):
+        # FIX: Check against integers 0 or 1
+        return self.role in [0, 1]
+
+
+class User(UserRoleMixin, UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     role = db.Column(db.Integer, default=2, nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -16,9 +68,13 @@ class User(UserMixin, db.Model):
     phone = db.Column(db.String(20))
     password_hash = db.Column(db.String(128))
 
+    # Bumped whenever the password changes; part of the session id (see get_id)
+    credential_version = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+
     # NEW: Use bcrypt for hashing
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = hash_password(password)
+        self.credential_version = (self.credential_version or 0) + 1
 
     # NEW: Use bcrypt for checking
     def check_password(self, password):
@@ -27,18 +83,23 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         return f"<User {self.username}>"
 
-    def get_role_name(self):
-        """Return human-readable role name."""
-        # FIX: Use the USER_ROLES dictionary for reliable mapping
-        return USER_ROLES.get(self.role, "User") 
 
-    def is_superadmin(self):
-        # FIX: Check against integer 0
-        return self.role == 0 
+class UserSnapshot(UserRoleMixin, UserMixin):
+    """
+    Detached, read-only copy of the User fields that request handling needs
+    (current_user). Built by the login cache instead of loading a User per request.
+    """
+    FIELDS = ('id', 'role', 'name', 'username', 'credential_version')
 
-    def is_admin_or_superadmin(self):
-        # FIX: Check against integers 0 or 1
-        return self.role in [0, 1]
+    def __init__(self, id, role, name, username, credential_version):
+        self.id = id
+        self.role = role
+        self.name = name
+        self.username = username
+        self.credential_version = credential_version
+
+    def __repr__(self):
+        return f"<UserSnapshot {self.username}>"
 
 
 class Style(db.Model):
@@ -64,6 +125,19 @@ class Color(db.Model):
     hex_code = db.Column(db.String(7), unique=True, nullable=False)
 
 
+class TableVersion(db.Model):
+    """Change counter per table/list (e.g. 'brands'), bumped on every edit for cache invalidation."""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DashboardStat(db.Model):
+    """One materialized dashboard counter, e.g. ('category', '3') -> 120 (see app/dashboard.py)."""
+    metric = db.Column(db.String(30), primary_key=True)
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
 # Define Supplier Types (1=Wholesaler, 2=Factory)
 SUPPLIER_TYPES = {1: 'Wholesaler', 2: 'Factory'} 
 
@@ -100,10 +174,19 @@ class Supplier(db.Model):
 # --- Association Table ---
 product_color_association = db.Table('product_color_association',
     db.Column('product_id', db.Integer, db.ForeignKey('product.id'), primary_key=True),
-    db.Column('color_id', db.Integer, db.ForeignKey('color.id'), primary_key=True)
+    db.Column('color_id', db.Integer, db.ForeignKey('color.id'), primary_key=True),
+    # The primary key covers lookups by product_id; color facets/filters go by color_id
+    db.Index('ix_product_color_association_color_id', 'color_id')
 )
 
 class Product(db.Model):
+    __table_args__ = (
+        # Faceted browse filters on any combination of these (see app/product/facets.py)
+        db.Index('ix_product_facets', 'style_id', 'category_id', 'brand_id', 'material_id', 'supplier_id'),
+        # Keyset pagination of the product list orders by (name, id)
+        db.Index('ix_product_name_id', 'name', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
@@ -113,13 +196,14 @@ class Product(db.Model):
     keywords = db.Column(db.String(255))
 
     # Foreign Keys to Product Attributes
+    # (style_id is the leading column of ix_product_facets, so it needs no index of its own)
     style_id = db.Column(db.Integer, db.ForeignKey('style.id'))
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'))
-    brand_id = db.Column(db.Integer, db.ForeignKey('brand.id'))
-    material_id = db.Column(db.Integer, db.ForeignKey('material.id'))
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), index=True)
+    brand_id = db.Column(db.Integer, db.ForeignKey('brand.id'), index=True)
+    material_id = db.Column(db.Integer, db.ForeignKey('material.id'), index=True)
 
     # Foreign Key to Supplier
-    supplier_id = db.Column(db.Integer, db.ForeignKey('supplier.id'))
+    supplier_id = db.Column(db.Integer, db.ForeignKey('supplier.id'), index=True)
 
     # Relationships (for easy access to attribute names)
     style = db.relationship('Style')
@@ -134,22 +218,201 @@ class Product(db.Model):
     # Images relationship (NEW)
     images = db.relationship('ProductImage', backref='product', lazy='dynamic', cascade="all, delete-orphan")
 
+    # Sellable color variants (SKUs), each with its own stock
+    variants = db.relationship('ProductVariant', backref='product', lazy='dynamic', cascade="all, delete-orphan")
+
 
 # --- ProductImage Model ---
+# Processing state of an upload: 'pending' until the worker pool has written file_path
+IMAGE_STATUSES = ('pending', 'ready', 'failed')
+
 class ProductImage(db.Model):
+    __table_args__ = (
+        # edit_product looks images up by (product_id, type); also serves product_id alone
+        db.Index('ix_product_image_product_id_type', 'product_id', 'type'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     
     # Type: 'base', 'additional', or specific color type like 'color_maroon' (optional future use)
     type = db.Column(db.String(50), nullable=False) 
     
-    # Path relative to the UPLOAD_FOLDER
+    # Path relative to the UPLOAD_FOLDER (primary derivative, see file_utils.primary_derivative)
     file_path = db.Column(db.String(255), nullable=False)
+
+    # SHA-256 of the uploaded bytes; derivatives live under UPLOAD_FOLDER/<hash[:2]>/<hash>/
+    content_hash = db.Column(db.String(64), index=True)
     
     # Optional: Link to a specific color ID if this is a color-specific photo
-    color_id = db.Column(db.Integer, db.ForeignKey('color.id'), nullable=True) 
+    color_id = db.Column(db.Integer, db.ForeignKey('color.id'), nullable=True, index=True) 
 
     color = db.relationship('Color')
+
+    # Processing state (see IMAGE_STATUSES); rows created before the pool existed are ready
+    status = db.Column(db.String(10), default='ready', nullable=False)
+
+    # Absolute path of a raw upload staged on disk by older releases (see requeue_images)
+    source_path = db.Column(db.String(255), nullable=True)
+
+    # Every stored size/format of this image (for srcset), smallest first
+    derivatives = db.relationship('ImageDerivative', backref='image', lazy='selectin',
+                                  cascade="all, delete-orphan", order_by='ImageDerivative.width')
+
+    def derivatives_for(self, fmt):
+        """Derivatives in one format, smallest first."""
+        return [d for d in self.derivatives if d.format == fmt]
     
     def __repr__(self):
-        return f"<Image {self.file_path}>"
\ No newline at end of file
+        return f"<Image {self.file_path}>"
+
+
+class ImageDerivative(db.Model):
+    """One resized/re-encoded copy of a ProductImage in the content-addressed store."""
+    id = db.Column(db.Integer, primary_key=True)
+    image_id = db.Column(db.Integer, db.ForeignKey('product_image.id'), nullable=False, index=True)
+
+    # Square edge length in pixels and encoding ('jpeg', 'webp', ...)
+    width = db.Column(db.Integer, nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+
+    # Path relative to the UPLOAD_FOLDER
+    file_path = db.Column(db.String(255), nullable=False)
+
+    def __repr__(self):
+        return f"<ImageDerivative {self.file_path}>"
+
+
+# --- Variants and Stock ---
+
+class ProductVariant(db.Model):
+    """
+    One sellable SKU: a product in one color. `on_hand` is a denormalized running total of
+    the variant's StockMovement ledger, updated in the same transaction as each movement
+    (see app/inventory.py), so stock reads never sum the ledger.
+    """
+    __table_args__ = (
+        # One variant per product and color; also serves lookups by product_id
+        db.UniqueConstraint('product_id', 'color_id', name='uq_product_variant_product_color'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    color_id = db.Column(db.Integer, db.ForeignKey('color.id'), nullable=False, index=True)
+    sku = db.Column(db.String(64), unique=True, nullable=False)
+    price = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+
+    # Units in stock (sum of the ledger) and the level at which it counts as low stock
+    on_hand = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reorder_level = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    color = db.relationship('Color')
+    movements = db.relationship('StockMovement', backref='variant', lazy='dynamic',
+                                cascade="all, delete-orphan", order_by='StockMovement.id.desc()')
+
+    def is_low_stock(self):
+        return self.on_hand <= self.reorder_level
+
+    def __repr__(self):
+        return f"<ProductVariant {self.sku}>"
+
+
+# Movement kinds: receive adds stock, sell removes it, adjust corrects it either way
+MOVEMENT_KINDS = {'receive': 'Received', 'sell': 'Sold', 'adjust': 'Adjustment'}
+
+class StockMovement(db.Model):
+    """One append-only stock ledger entry; `quantity` is the signed change to on_hand."""
+    __table_args__ = (
+        # A variant's history, newest first
+        db.Index('ix_stock_movement_variant_id_id', 'variant_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    variant_id = db.Column(db.Integer, db.ForeignKey('product_variant.id'), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+
+    # Free-form reference (order or invoice number) and note
+    reference = db.Column(db.String(100))
+    note = db.Column(db.String(255))
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+    user = db.relationship('User')
+
+    def __repr__(self):
+        return f"<StockMovement {self.kind} {self.quantity:+d}>"
+
+
+# --- Purchasing ---
+
+# Purchase order states; 'partial' and 'received' follow from the goods receipts
+PURCHASE_ORDER_STATUSES = {'open': 'Open', 'partial': 'Partially Received', 'received': 'Received',
+                           'cancelled': 'Cancelled'}
+
+class PurchaseOrder(db.Model):
+    """Variants ordered from one supplier; filled by one or more GoodsReceipts."""
+    id = db.Column(db.Integer, primary_key=True)
+    supplier_id = db.Column(db.Integer, db.ForeignKey('supplier.id'), nullable=False, index=True)
+    # Our order number, as quoted on the supplier's delivery notes
+    reference = db.Column(db.String(50), unique=True, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='open')
+    note = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+    supplier = db.relationship('Supplier', backref=db.backref('purchase_orders', lazy='dynamic'))
+    lines = db.relationship('PurchaseOrderLine', backref='order', lazy='dynamic', cascade="all, delete-orphan")
+
+    def get_status_name(self):
+        return PURCHASE_ORDER_STATUSES.get(self.status, 'Unknown')
+
+
+class PurchaseOrderLine(db.Model):
+    __table_args__ = (
+        # One line per variant; also serves lookups by order_id
+        db.UniqueConstraint('order_id', 'variant_id', name='uq_purchase_order_line_order_variant'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('purchase_order.id'), nullable=False)
+    variant_id = db.Column(db.Integer, db.ForeignKey('product_variant.id'), nullable=False)
+    quantity_ordered = db.Column(db.Integer, nullable=False)
+    quantity_received = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    unit_cost = db.Column(db.Numeric(10, 2))
+
+    variant = db.relationship('ProductVariant')
+
+
+class GoodsReceipt(db.Model):
+    """
+    One delivery from a supplier, optionally against a PurchaseOrder. Posting it adds a
+    'receive' StockMovement per line (see app/purchasing.py).
+    """
+    __table_args__ = (
+        # The supplier's delivery note number; a delivery can only be posted once
+        db.UniqueConstraint('supplier_id', 'reference', name='uq_goods_receipt_supplier_reference'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    supplier_id = db.Column(db.Integer, db.ForeignKey('supplier.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('purchase_order.id'), nullable=True, index=True)
+    reference = db.Column(db.String(50), nullable=False)
+    note = db.Column(db.String(255))
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+    supplier = db.relationship('Supplier', backref=db.backref('receipts', lazy='dynamic'))
+    order = db.relationship('PurchaseOrder', backref=db.backref('receipts', lazy='dynamic'))
+    lines = db.relationship('GoodsReceiptLine', backref='receipt', lazy='dynamic', cascade="all, delete-orphan")
+
+
+class GoodsReceiptLine(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    receipt_id = db.Column(db.Integer, db.ForeignKey('goods_receipt.id'), nullable=False, index=True)
+    variant_id = db.Column(db.Integer, db.ForeignKey('product_variant.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_cost = db.Column(db.Numeric(10, 2))
+
+    variant = db.relationship('ProductVariant')
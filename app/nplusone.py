@@ -0,0 +1,158 @@
+# app/nplusone.py
+
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Expanded IN lists ("IN (?, ?, ?)") vary in length per call; collapse them to one shape
+_IN_LIST = re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+class NPlusOneError(Exception):
+    """Raised (QUERY_DETECTOR = 'raise') when a request repeats one statement shape too often."""
+
+
+def statement_shape(statement):
+    """Normalized SQL of a statement: parameters are already placeholders; IN lists collapsed."""
+    return _IN_LIST.sub('(?)', _SPACE.sub(' ', statement).strip())
+
+
+def caller_location():
+    """
+    Where the current query comes from: the innermost template line being rendered
+    ('product/product_list.html:48'), else the innermost frame in the app package.
+    """
+    frame = sys._getframe(1)
+    app_frame = None
+    while frame is not None:
+        template = frame.f_globals.get('__jinja_template__')
+        if template is not None:
+            return f"{template.name or '<string>'}:{template.get_corresponding_lineno(frame.f_lineno)}"
+        filename = frame.f_code.co_filename
+        if app_frame is None and filename.startswith(APP_DIR) and filename != __file__:
+            app_frame = f"{os.path.relpath(filename, os.path.dirname(APP_DIR))}:{frame.f_lineno} " \
+                        f"in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return app_frame or 'unknown'
+
+
+class QueryLog:
+    """Statements seen in one request or recording block, grouped by shape."""
+
+    def __init__(self):
+        self.count = 0
+        # shape -> [executions, location of the first one]
+        self.shapes = {}
+
+    def add(self, statement):
+        self.count += 1
+        shape = statement_shape(statement)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            # The stack is only walked once per distinct shape
+            self.shapes[shape] = [1, caller_location()]
+        else:
+            entry[0] += 1
+
+    def repeated(self, threshold):
+        """[(shape, executions, location)] for shapes run at least `threshold` times, worst first."""
+        offenders = [(shape, count, location) for shape, (count, location) in self.shapes.items()
+                     if count >= threshold]
+        return sorted(offenders, key=lambda item: -item[1])
+
+    def describe(self, threshold):
+        lines = [f"{self.count} queries, {len(self.shapes)} distinct."]
+        for shape, count, location in self.repeated(threshold):
+            lines.append(f"  {count}x at {location}: {shape[:200]}")
+        return '\n'.join(lines)
+
+
+# Recording blocks active in this thread (record_queries), innermost last
+_local = threading.local()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for log in getattr(_local, 'logs', ()):
+        log.add(statement)
+    if has_request_context():
+        log = g.get('query_log')
+        if log is not None:
+            log.add(statement)
+
+
+def watch_engine(engine):
+    """Installs the statement hook on `engine` (once)."""
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+
+
+@contextmanager
+def record_queries(engine=None):
+    """
+    Records every statement executed in this thread while the block runs.
+
+        with record_queries() as log:
+            client.get('/products/')
+        assert log.count <= 6, log.describe(threshold=2)
+    """
+    from app import db
+
+    watch_engine(engine if engine is not None else db.engine)
+    log = QueryLog()
+    logs = getattr(_local, 'logs', None)
+    if logs is None:
+        logs = _local.logs = []
+    logs.append(log)
+    try:
+        yield log
+    finally:
+        logs.remove(log)
+
+
+class QueryDetector:
+    """
+    Development/test mode that flags N+1 patterns: a request that runs one statement shape
+    QUERY_DETECTOR_THRESHOLD times or more (typically a lazy load per row of a list) is
+    logged with the template line or app frame that issued it, or fails with NPlusOneError.
+
+    QUERY_DETECTOR is None (off, the default), 'log' or 'raise'. Off, nothing is hooked.
+    """
+
+    def __init__(self, app=None):
+        self.mode = None
+        self.threshold = 5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['query_detector'] = self
+        self.mode = app.config['QUERY_DETECTOR']
+        self.threshold = app.config['QUERY_DETECTOR_THRESHOLD']
+        if not self.mode:
+            return
+
+        from app import db
+        with app.app_context():
+            watch_engine(db.engine)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def _start_request(self):
+        g.query_log = QueryLog()
+
+    def _finish_request(self, response):
+        log = g.pop('query_log', None)
+        if log is None or not log.repeated(self.threshold):
+            return response
+        message = f"Possible N+1 in {request.endpoint}: {log.describe(self.threshold)}"
+        if self.mode == 'raise':
+            raise NPlusOneError(message)
+        current_app.logger.warning(message)
+        return response
@@ -0,0 +1,224 @@
+# app/product/bulk.py
+
+import csv
+import io
+import re
+import time
+from sqlalchemy import bindparam, func, insert, select, update
+from app import db
+from app.models import Brand, Color
+from app.inventory import batches
+from app.product.importer import read_rows
+from app.versions import VERSIONED_MODELS, bump_versions
+
+# Bulk create/update for the categorical MODELS (styles, categories, brands, materials,
+# colors), keyed on the unique 'name'. A document is a CSV or XLSX with a 'name' column
+# plus the model's extra columns below; pasted text may leave out the header row.
+#
+# Names are matched case-insensitively, against each other and against stored rows, like
+# the product importer's lookups and the uniqueness checks (app/uniqueness.py). The whole document is validated first (one IN lookup per
+# IN_BATCH names, and hex codes for colors); then every new or changed row is written by
+# one executemany INSERT ... ON CONFLICT (name) DO UPDATE. Either all rows are saved or none.
+EXTRA_COLUMNS = {
+    Brand: ('is_own_brand',),
+    Color: ('hex_code',),
+}
+
+NAME_MAX_LENGTH = 100
+HEX_CODE = re.compile(r'^#[0-9A-Fa-f]{6}$')
+TRUE_VALUES = ('1', 'y', 'yes', 'true', 'x')
+FALSE_VALUES = ('', '0', 'n', 'no', 'false')
+
+
+class BulkUpsertError(ValueError):
+    """A document that cannot be saved; `errors` lists (line number, message) per bad line."""
+
+    def __init__(self, message, errors=()):
+        super().__init__(message)
+        self.errors = list(errors)
+
+
+class BulkReport:
+    """Outcome of one bulk upsert: row counts and timing."""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.duplicates = 0
+        self.elapsed = 0.0
+
+    def summary(self):
+        return (f"{self.created} created, {self.updated} updated, {self.unchanged} unchanged, "
+                f"{self.duplicates} duplicate(s) skipped")
+
+
+def columns_for(model):
+    return ('name',) + EXTRA_COLUMNS.get(model, ())
+
+
+def pasted_rows(text, model):
+    """(line number, row dict) pairs from pasted CSV; the header row is optional."""
+    first = next(csv.reader(io.StringIO(text.lstrip())), [''])
+    if not first or first[0].strip().lower() != 'name':
+        text = ','.join(columns_for(model)) + '\n' + text.lstrip()
+    return read_rows(io.BytesIO(text.encode('utf-8')), 'lines.csv')
+
+
+def _text(row, column):
+    value = row.get(column)
+    return '' if value is None else str(value).strip()
+
+
+def parse_row(model, row, columns):
+    """
+    Returns the values of one row: the name plus whichever extra `columns` the document
+    has. Raises ValueError with a readable message.
+    """
+    name = _text(row, 'name')
+    if not name:
+        raise ValueError("Name is required.")
+    if len(name) > NAME_MAX_LENGTH:
+        raise ValueError(f"Name is longer than {NAME_MAX_LENGTH} characters.")
+    values = {'name': name}
+
+    if 'is_own_brand' in columns:
+        flag = _text(row, 'is_own_brand').lower()
+        if flag not in TRUE_VALUES + FALSE_VALUES:
+            raise ValueError(f"Own brand flag '{flag}' is not yes/no.")
+        values['is_own_brand'] = flag in TRUE_VALUES
+    if 'hex_code' in columns:
+        hex_code = _text(row, 'hex_code')
+        if hex_code and not hex_code.startswith('#'):
+            hex_code = '#' + hex_code
+        if not HEX_CODE.match(hex_code):
+            raise ValueError(f"Hex code '{hex_code}' is not of the form #1A2B3C.")
+        values['hex_code'] = hex_code
+    return values
+
+
+def existing_rows(model, names):
+    """Stored rows whose lowercased name is in `names`, as {lowercase name: row mapping}."""
+    table = model.__table__
+    found = {}
+    for chunk in batches(sorted(names)):
+        for row in db.session.execute(select(table).where(func.lower(table.c.name).in_(chunk))).mappings():
+            found[row['name'].lower()] = row
+    return found
+
+
+def hex_owners(hex_codes):
+    """Maps each stored hex code in `hex_codes` to the lowercased name of its color."""
+    owners = {}
+    for chunk in batches(sorted(hex_codes)):
+        for name, hex_code in db.session.execute(
+                select(Color.name, Color.hex_code).where(Color.hex_code.in_(chunk))):
+            owners[hex_code] = name.lower()
+    return owners
+
+
+def upsert_statement(model, update_columns, dialect):
+    """
+    INSERT ... ON CONFLICT (name) for `dialect`: DO UPDATE of `update_columns`, or DO
+    NOTHING when the document only names rows. None where the dialect has no such clause.
+    """
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    statement = dialect_insert(model.__table__)
+    if not update_columns:
+        return statement.on_conflict_do_nothing(index_elements=['name'])
+    return statement.on_conflict_do_update(
+        index_elements=['name'],
+        set_={column: statement.excluded[column] for column in update_columns})
+
+
+def bulk_upsert(model, rows):
+    """
+    Creates or updates `model` rows by name from (line number, row dict) pairs, in the
+    current transaction (the caller commits). Returns a BulkReport, or raises
+    BulkUpsertError listing every bad line; nothing is written then.
+    """
+    report = BulkReport()
+    started = time.perf_counter()
+
+    parsed, errors, seen, columns = [], [], set(), None
+    for line, row in rows:
+        report.rows += 1
+        if columns is None:
+            columns = [column for column in columns_for(model) if column in row]
+            if 'name' not in columns:
+                raise BulkUpsertError("The document needs a 'name' column.")
+        try:
+            values = parse_row(model, row, columns)
+        except ValueError as e:
+            errors.append((line, str(e)))
+            continue
+        key = values['name'].lower()
+        if key in seen:
+            # First spelling wins; later repeats of a name are only counted
+            report.duplicates += 1
+            continue
+        seen.add(key)
+        parsed.append((line, key, values))
+
+    update_columns = [column for column in (columns or ()) if column != 'name']
+    stored = existing_rows(model, seen)
+
+    if model is Color:
+        if 'hex_code' not in update_columns:
+            errors.extend((line, "New colors need a hex code.")
+                          for line, key, _ in parsed if key not in stored)
+        else:
+            owners = hex_owners({values['hex_code'] for _, _, values in parsed})
+            claimed = {}
+            for line, key, values in parsed:
+                owner = claimed.setdefault(values['hex_code'], key)
+                if owner != key:
+                    errors.append((line, f"Hex code {values['hex_code']} is also given to another color."))
+                elif owners.get(values['hex_code'], key) != key:
+                    errors.append((line, f"Hex code {values['hex_code']} belongs to another color."))
+    if errors:
+        raise BulkUpsertError(f"{len(errors)} invalid line(s); nothing was saved.", sorted(errors))
+    if not parsed:
+        raise BulkUpsertError("The document has no rows.")
+
+    writes = []
+    for _, key, values in parsed:
+        row = stored.get(key)
+        if row is None:
+            report.created += 1
+            writes.append(values)
+        elif any(row[column] != values[column] for column in update_columns):
+            report.updated += 1
+            # Keep the stored spelling so the row hits the unique name on conflict
+            writes.append(dict(values, name=row['name']))
+        else:
+            report.unchanged += 1
+
+    if writes:
+        connection = db.session.connection()
+        statement = upsert_statement(model, update_columns, connection.dialect.name)
+        if statement is not None:
+            connection.execute(statement, writes)
+        else:
+            # No ON CONFLICT clause: insert the new rows, update the changed ones
+            table = model.__table__
+            new = [values for values in writes if values['name'].lower() not in stored]
+            changed = [values for values in writes if values['name'].lower() in stored]
+            if new:
+                connection.execute(insert(table), new)
+            if changed:
+                connection.execute(
+                    update(table).where(table.c.name == bindparam('key'))
+                    .values({column: bindparam(column) for column in update_columns}),
+                    [dict(values, key=values['name']) for values in changed])
+        # Core statements bypass the ORM flush hook that keeps the choice caches current
+        bump_versions(connection, [VERSIONED_MODELS[model]])
+
+    report.elapsed = time.perf_counter() - started
+    return report
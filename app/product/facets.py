@@ -0,0 +1,83 @@
+# app/product/facets.py
+
+from sqlalchemy import func, literal, select, union_all
+from app import db
+from app.models import Product, product_color_association
+
+# Facet name -> Product foreign key column. 'color' is handled through the association table.
+FK_FACETS = {
+    'style': Product.style_id,
+    'category': Product.category_id,
+    'brand': Product.brand_id,
+    'material': Product.material_id,
+    'supplier': Product.supplier_id,
+}
+FACETS = tuple(FK_FACETS) + ('color',)
+
+# Facet name -> key of the cached choice list holding its labels (see populate_product_choices)
+FACET_CHOICES = {
+    'style': 'styles',
+    'category': 'categories',
+    'brand': 'brands',
+    'material': 'materials',
+    'supplier': 'suppliers',
+    'color': 'colors',
+}
+
+
+def parse_filters(args):
+    """Reads ?brand=1&brand=2&color=3... into {facet: [ids]}, dropping empty facets."""
+    filters = {}
+    for facet in FACETS:
+        ids = [i for i in args.getlist(facet, type=int) if i is not None]
+        if ids:
+            filters[facet] = ids
+    return filters
+
+
+def filter_conditions(filters, exclude=None):
+    """
+    SQL conditions for `filters`: values within a facet are OR-ed, facets are AND-ed.
+    `exclude` leaves one facet out, so its counts show every option still reachable.
+    """
+    conditions = []
+    for facet, ids in filters.items():
+        if facet == exclude:
+            continue
+        if facet == 'color':
+            conditions.append(Product.id.in_(
+                select(product_color_association.c.product_id)
+                .where(product_color_association.c.color_id.in_(ids))
+            ))
+        else:
+            conditions.append(FK_FACETS[facet].in_(ids))
+    return conditions
+
+
+def facet_counts(filters):
+    """
+    Returns {facet: {value_id: product_count}} for every facet, computed by one
+    UNION ALL of GROUP BY selects, i.e. a single round-trip however many facets exist.
+    """
+    selects = []
+    for facet, column in FK_FACETS.items():
+        selects.append(
+            select(literal(facet).label('facet'), column.label('value'), func.count().label('n'))
+            .where(*filter_conditions(filters, exclude=facet))
+            .where(column.isnot(None))
+            .group_by(column)
+        )
+
+    color_id = product_color_association.c.color_id
+    selects.append(
+        select(literal('color').label('facet'), color_id.label('value'), func.count().label('n'))
+        .select_from(Product)
+        .join(product_color_association, product_color_association.c.product_id == Product.id)
+        .where(*filter_conditions(filters, exclude='color'))
+        .group_by(color_id)
+    )
+
+    counts = {facet: {} for facet in FACETS}
+    for facet, value, n in db.session.execute(union_all(*selects)):
+        counts[facet][value] = n
+    return counts
@@ -0,0 +1,204 @@
+# app/product/importer.py
+
+import csv
+import io
+import time
+from collections import Counter
+from sqlalchemy import insert
+from app import db
+from app.models import (Product, Style, Category, Brand, Material, Supplier, Color,
+                        product_color_association)
+from app.dashboard import apply_deltas, product_deltas
+from app.search import index_products
+from app.versions import bump_versions
+
+# Spreadsheet columns. Attribute columns hold names (matched case-insensitively);
+# 'colors' holds one or more color names separated by ';' or ','.
+TEXT_COLUMNS = ('name', 'description', 'facebook_post', 'youtube_video', 'keywords')
+LOOKUP_COLUMNS = {
+    'style': (Style, 'style_id'),
+    'category': (Category, 'category_id'),
+    'brand': (Brand, 'brand_id'),
+    'material': (Material, 'material_id'),
+    'supplier': (Supplier, 'supplier_id'),
+}
+REQUIRED_COLUMNS = ('name',) + tuple(LOOKUP_COLUMNS) + ('colors',)
+IMPORT_EXTENSIONS = ('csv', 'xlsx')
+
+# Column length limits, mirrored from the Product model / ProductForm
+MAX_LENGTHS = {'name': 255, 'facebook_post': 255, 'youtube_video': 255, 'keywords': 255}
+
+
+class ImportReport:
+    """Outcome of one import: counts, per-row errors (line number, message) and timing."""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def write_csv(self, stream):
+        """Writes the per-row errors as CSV (line, error)."""
+        writer = csv.writer(stream)
+        writer.writerow(['line', 'error'])
+        writer.writerows(self.errors)
+
+
+def file_extension(filename):
+    """Lowercase extension of `filename`; raises ValueError if it is not importable."""
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if ext not in IMPORT_EXTENSIONS:
+        raise ValueError(f"Unsupported file type '{filename}'. Use .csv or .xlsx.")
+    return ext
+
+
+def read_rows(stream, filename):
+    """
+    Streams (line_number, row_dict) from a CSV or XLSX upload without loading the whole
+    file. Header names are normalized to lowercase.
+    """
+    ext = file_extension(filename)
+    if ext == 'csv':
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        reader = csv.reader(text)
+        header = [h.strip().lower() for h in next(reader, [])]
+        for line, values in enumerate(reader, start=2):
+            if any(v.strip() for v in values):
+                yield line, dict(zip(header, values))
+    else:
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("XLSX import needs the 'openpyxl' package (pip install openpyxl).")
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(h or '').strip().lower() for h in next(rows, ())]
+            for line, values in enumerate(rows, start=2):
+                if any(v not in (None, '') for v in values):
+                    yield line, {k: '' if v is None else str(v) for k, v in zip(header, values)}
+        finally:
+            workbook.close()
+
+
+def build_lookup_maps():
+    """Loads {column: {lowercase name: id}} for every reference table, one query each, once."""
+    maps = {}
+    for column, (model, _) in LOOKUP_COLUMNS.items():
+        maps[column] = {name.lower(): id_ for id_, name in db.session.query(model.id, model.name)}
+    maps['colors'] = {name.lower(): id_ for id_, name in db.session.query(Color.id, Color.name)}
+    return maps
+
+
+def validate_row(row, maps):
+    """
+    Converts a spreadsheet row into (product values, color ids).
+    Raises ValueError with a readable message for the first problem found.
+    """
+    missing = [c for c in REQUIRED_COLUMNS if not (row.get(c) or '').strip()]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    values = {}
+    for column in TEXT_COLUMNS:
+        value = (row.get(column) or '').strip() or None
+        limit = MAX_LENGTHS.get(column)
+        if value and limit and len(value) > limit:
+            raise ValueError(f"{column} is longer than {limit} characters")
+        values[column] = value
+
+    for column, (_, fk) in LOOKUP_COLUMNS.items():
+        name = row[column].strip()
+        id_ = maps[column].get(name.lower())
+        if id_ is None:
+            raise ValueError(f"unknown {column} '{name}'")
+        values[fk] = id_
+
+    color_ids = []
+    for name in row['colors'].replace(';', ',').split(','):
+        name = name.strip()
+        if not name:
+            continue
+        id_ = maps['colors'].get(name.lower())
+        if id_ is None:
+            raise ValueError(f"unknown color '{name}'")
+        if id_ not in color_ids:
+            color_ids.append(id_)
+    if not color_ids:
+        raise ValueError("missing colors")
+
+    return values, color_ids
+
+
+def _insert_chunk(chunk):
+    """Inserts one chunk of validated rows in a single transaction. Returns the ids."""
+    product_rows = [values for _, values, _ in chunk]
+    # executemany with RETURNING (SQLAlchemy "insertmanyvalues"), ids in parameter order
+    result = db.session.execute(
+        insert(Product).returning(Product.id, sort_by_parameter_order=True), product_rows
+    )
+    ids = [row[0] for row in result]
+
+    color_rows = [{'product_id': product_id, 'color_id': color_id}
+                  for product_id, (_, _, color_ids) in zip(ids, chunk)
+                  for color_id in color_ids]
+    if color_rows:
+        db.session.execute(insert(product_color_association), color_rows)
+
+    # Core inserts skip ORM events, so keep the search index, dashboard counters and the
+    # 'products' version (API ETags) in step
+    connection = db.session.connection()
+    index_products(connection,
+                   [dict(values, id=product_id) for product_id, values in zip(ids, product_rows)])
+    deltas = Counter()
+    for _, values, color_ids in chunk:
+        deltas.update(product_deltas(values, color_ids))
+    apply_deltas(connection, deltas)
+    bump_versions(connection, ['products'])
+    db.session.commit()
+    return ids
+
+
+def import_products(stream, filename, chunk_size=500):
+    """
+    Imports products from a CSV/XLSX stream. Rows are validated against name->id maps built
+    once up front and inserted chunk_size at a time, one transaction per chunk; invalid rows
+    (and rows of a chunk the database rejects) are recorded in the report and skipped.
+    """
+    file_extension(filename)
+    report = ImportReport()
+    started = time.perf_counter()
+    maps = build_lookup_maps()
+
+    def flush(chunk):
+        if not chunk:
+            return
+        try:
+            report.imported += len(_insert_chunk(chunk))
+        except Exception as e:
+            db.session.rollback()
+            for line, _, _ in chunk:
+                report.errors.append((line, f"database error: {e}"))
+
+    chunk = []
+    try:
+        for line, row in read_rows(stream, filename):
+            report.rows += 1
+            try:
+                values, color_ids = validate_row(row, maps)
+            except ValueError as e:
+                report.errors.append((line, str(e)))
+                continue
+            chunk.append((line, values, color_ids))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        flush(chunk)
+    finally:
+        report.elapsed = time.perf_counter() - started
+    return report
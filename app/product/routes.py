@@ -1,15 +1,26 @@
 # app/product/routes.py (Final Revision for Modularity and Stability)
 
-from flask import render_template, redirect, url_for, flash, request, current_app
-from flask_login import login_required
+import os
+import mimetypes
+from flask import render_template, redirect, url_for, flash, request, current_app, send_from_directory, jsonify, abort
+from flask_login import current_user, login_required
 from functools import wraps
-from app import db
-from app.models import Product, Style, Category, Brand, Material, Supplier, Color, ProductImage
-from app.forms import CategoricalForm, BrandForm, ColorForm, ProductForm
+from app import db, image_jobs
+from app.models import Product, Style, Category, Brand, Material, Supplier, Color, ProductImage, ProductVariant, MOVEMENT_KINDS
+from app.forms import CategoricalForm, CategoricalBulkForm, BrandForm, ColorForm, ProductForm, ProductImportForm, VariantForm, StockMovementForm
 from app.product import bp 
-from app.utils import admin_or_superadmin_required, admin_required
-from app.file_utils import save_and_process_image, slugify
+from app.utils import admin_or_superadmin_required, admin_required, keyset_paginate
+from app.file_utils import INCOMING_DIR, read_upload
+from app.image_jobs import stage_upload
+from app.cache import choice_cache
+from app.search import search_product_ids
+from app.product.importer import import_products, read_rows
+from app.product.bulk import bulk_upsert, columns_for, pasted_rows
+from app.inventory import StockError, low_stock_query, post_movement, variant_counts
+from app.product.facets import FACET_CHOICES, facet_counts, filter_conditions, parse_filters
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from werkzeug.security import safe_join
 
 # --- Configuration: Define Models and Forms ---
 MODELS = [
@@ -22,7 +33,7 @@ MODELS = [
 
 # --- Generic Route Handler Creator ---
 def create_route_handlers(model, route_name, form_class):
-    """Creates the view functions (list and edit) using closures."""
+    """Creates the view functions (list, edit and bulk edit) using closures."""
 
     # 1. READ/LIST View Function
     def list_items_view():
@@ -36,6 +47,9 @@ def create_route_handlers(model, route_name, form_class):
     def edit_item_view(item_id=None):
         item = db.get_or_404(model, item_id) if item_id else None
         form = form_class(obj=item)
+        # Name (and hex code) collisions are found by one lookup before any write
+        form.unique_model = model
+        form.original = item
         
         # Determine which template to use: dedicated for colors, generic for others
         template_name = 'product/color_edit.html' if route_name == 'colors' else 'product/categorical_edit.html'
@@ -51,12 +65,14 @@ def create_route_handlers(model, route_name, form_class):
                     db.session.add(new_item)
                     flash(f'{route_name.title()} created successfully.', 'success')
                 
-                # Attempt the commit
+                # Attempt the commit (the flush bumps this list's TableVersion, which
+                # invalidates the cached ProductForm choices for it; see app/versions.py)
                 db.session.commit() 
                 return redirect(url_for(f'product.list_{route_name}'))
             
             except IntegrityError:
-                # Catch database error (usually unique constraint violation)
+                # Catch database error (a unique value taken by a concurrent edit;
+                # the form's own check catches the ordinary collisions)
                 db.session.rollback() 
                 
                 # Flash error message to the user
@@ -74,12 +90,42 @@ def create_route_handlers(model, route_name, form_class):
                                name=route_name, 
                                title=f'Edit {route_name.title()}')
     
-    return list_items_view, edit_item_view
+    # 3. BULK CREATE/UPDATE View Function
+    def bulk_items_view():
+        form = CategoricalBulkForm()
+        errors = []
+
+        if form.validate_on_submit():
+            upload = form.lines_file.data
+            try:
+                if upload:
+                    rows = read_rows(upload.stream, upload.filename)
+                else:
+                    rows = pasted_rows(form.lines_text.data, model)
+                report = bulk_upsert(model, rows)
+                db.session.commit()
+            except ValueError as e:
+                # BulkUpsertError (with per-line errors) or an unreadable file
+                db.session.rollback()
+                errors = getattr(e, 'errors', [])
+                flash(str(e), 'danger')
+            else:
+                flash(f'{route_name.title()}: {report.summary()}.', 'success')
+                return redirect(url_for(f'product.list_{route_name}'))
+
+        return render_template('product/categorical_bulk.html',
+                               form=form,
+                               errors=errors,
+                               columns=columns_for(model),
+                               name=route_name,
+                               title=f'Bulk Edit {route_name.title()}')
+
+    return list_items_view, edit_item_view, bulk_items_view
 
 
 # --- Route Registration (Runs on Module Import) ---
 for model, route_name, form_class in MODELS:
-    list_func, edit_func = create_route_handlers(model, route_name, form_class)
+    list_func, edit_func, bulk_func = create_route_handlers(model, route_name, form_class)
 
     # 1. Apply decorators manually:
     
@@ -90,6 +136,7 @@ for model, route_name, form_class in MODELS:
     # EDIT VIEW: Requires ONLY Admin (Role 1) to perform modifications.
     edit_func_wrapped = login_required(edit_func)
     edit_func_wrapped = admin_required(edit_func_wrapped) 
+    bulk_func_wrapped = admin_required(login_required(bulk_func))
     
     # 2. Register the URL rules... (remains the same)
     bp.add_url_rule(f'/{route_name}', 
@@ -106,26 +153,135 @@ for model, route_name, form_class in MODELS:
                     methods=['GET', 'POST'],
                     endpoint=f'edit_{route_name}',
                     view_func=edit_func_wrapped)
+
+    bp.add_url_rule(f'/{route_name}/bulk',
+                    methods=['GET', 'POST'],
+                    endpoint=f'bulk_{route_name}',
+                    view_func=bulk_func_wrapped)
     
 
 # --- Helper function to populate FK choices ---
+# Loaders for the ProductForm choice lists, keyed like MODELS route names
+CHOICE_LOADERS = {
+    'styles': lambda: [(s.id, s.name) for s in Style.query.all()],
+    'categories': lambda: [(c.id, c.name) for c in Category.query.all()],
+    'brands': lambda: [(b.id, b.name) for b in Brand.query.all()],
+    'materials': lambda: [(m.id, m.name) for m in Material.query.all()],
+    'suppliers': lambda: [(s.id, f"{s.name} ({s.get_type_name()})") for s in Supplier.query.all()],
+    'colors': lambda: [(c.id, c.name) for c in Color.query.order_by(Color.name).all()],
+}
+
+def cached_choices(name):
+    """Returns one choice list from the versioned in-process cache."""
+    return choice_cache.get(name, CHOICE_LOADERS[name])
+
 def populate_product_choices(form):
-    """Dynamically loads choices for SelectFields in ProductForm."""
-    form.style_id.choices = [(s.id, s.name) for s in Style.query.all()]
-    form.category_id.choices = [(c.id, c.name) for c in Category.query.all()]
-    form.brand_id.choices = [(b.id, b.name) for b in Brand.query.all()]
-    form.material_id.choices = [(m.id, m.name) for m in Material.query.all()]
-    form.supplier_id.choices = [(s.id, f"{s.name} ({s.get_type_name()})") for s in Supplier.query.all()]
-    form.colors.choices = [(c.id, c.name) for c in Color.query.order_by(Color.name).all()]
+    """Loads choices for SelectFields in ProductForm from the versioned in-process cache."""
+    form.style_id.choices = cached_choices('styles')
+    form.category_id.choices = cached_choices('categories')
+    form.brand_id.choices = cached_choices('brands')
+    form.material_id.choices = cached_choices('materials')
+    form.supplier_id.choices = cached_choices('suppliers')
+    form.colors.choices = cached_choices('colors')
 
 # --- Product Routes ---
 @bp.route('/', methods=['GET'])
 @login_required
 @admin_or_superadmin_required
 def list_products():
-    """Display the list of main products."""
-    products = Product.query.order_by(Product.name).all()
-    return render_template('product/product_list.html', products=products, title='Product Inventory')
+    """Display the list of main products, one keyset page at a time."""
+    # Many-to-one attributes are joined into the page query so the template
+    # does not trigger a lazy load per row (constant query count per page).
+    query = Product.query.options(
+        joinedload(Product.style),
+        joinedload(Product.category),
+        joinedload(Product.brand),
+        joinedload(Product.material),
+        joinedload(Product.supplier),
+    )
+    per_page = request.args.get('per_page', current_app.config['PRODUCTS_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['PRODUCTS_MAX_PER_PAGE']))
+
+    products, next_cursor = keyset_paginate(query, (Product.name, Product.id),
+                                            request.args.get('after'), per_page)
+
+    return render_template('product/product_list.html', 
+                           products=products, 
+                           variant_counts=variant_counts([p.id for p in products]),
+                           next_cursor=next_cursor,
+                           is_first_page=not request.args.get('after'),
+                           per_page=per_page,
+                           title='Product Inventory')
+
+
+@bp.route('/browse', methods=['GET'])
+@login_required
+@admin_or_superadmin_required
+def browse_products():
+    """
+    Faceted browse API (JSON). Filters: ?style=&category=&brand=&material=&supplier=&color=
+    (repeat a parameter to OR values). Returns a keyset page of matching products plus,
+    for each facet, the count of matching products per option.
+    """
+    filters = parse_filters(request.args)
+    per_page = request.args.get('per_page', current_app.config['PRODUCTS_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['PRODUCTS_MAX_PER_PAGE']))
+
+    query = Product.query.filter(*filter_conditions(filters))
+    products, next_cursor = keyset_paginate(query, (Product.name, Product.id),
+                                            request.args.get('after'), per_page)
+
+    counts = facet_counts(filters)
+    facets = {}
+    for facet, choices_key in FACET_CHOICES.items():
+        # Labels come from the cached choice lists, not another round of queries
+        labels = dict(cached_choices(choices_key))
+        facets[facet] = [
+            {'id': value_id, 'name': labels.get(value_id), 'count': n,
+             'selected': value_id in filters.get(facet, ())}
+            for value_id, n in sorted(counts[facet].items(), key=lambda item: -item[1])
+        ]
+
+    return jsonify(
+        filters=filters,
+        products=[{
+            'id': p.id,
+            'name': p.name,
+            'style_id': p.style_id,
+            'category_id': p.category_id,
+            'brand_id': p.brand_id,
+            'material_id': p.material_id,
+            'supplier_id': p.supplier_id,
+        } for p in products],
+        next_cursor=next_cursor,
+        facets=facets,
+    )
+
+
+@bp.route('/search', methods=['GET'])
+@login_required
+@admin_or_superadmin_required
+def search_products():
+    """Full-text search over product name, description and keywords (BM25 ranked, prefix match)."""
+    q = request.args.get('q', '').strip()
+    ids = search_product_ids(q, current_app.config['SEARCH_RESULTS_LIMIT'])
+
+    products = []
+    if ids:
+        rows = Product.query.options(
+            joinedload(Product.brand),
+            joinedload(Product.category),
+            joinedload(Product.supplier),
+        ).filter(Product.id.in_(ids)).all()
+        # Restore rank order lost by the IN () lookup
+        by_id = {p.id: p for p in rows}
+        products = [by_id[i] for i in ids if i in by_id]
+
+    return render_template('product/product_list.html', 
+                           products=products, 
+                           variant_counts=variant_counts([p.id for p in products]),
+                           q=q,
+                           title=f'Search: {q}' if q else 'Product Search')
 
 
 @bp.route('/edit', defaults={'product_id': None}, methods=['GET', 'POST'])
@@ -143,6 +299,8 @@ def edit_product(product_id):
     populate_product_choices(form)
 
     if form.validate_on_submit():
+        # Uploads left for the worker pool by this request: (ProductImage, FileStorage)
+        pending_images = []
         try:
             # 1. Save Core Details & Flush
             # Populate standard fields (name, style, colors, etc.)
@@ -151,9 +309,6 @@ def edit_product(product_id):
             # Flush session to get product.id for image paths before final commit
             db.session.flush() 
             
-            # 2. Prepare for Image Handling
-            product_slug = slugify(product.name)
-            
             # --- 3. Handle Base Photo (Required for New Product, Optional for Edit) ---
             base_photo_file = form.base_photo.data
             
@@ -165,42 +320,41 @@ def edit_product(product_id):
                  return render_template('product/product_edit.html', form=form, product=product, action_text=action_text)
 
             if base_photo_file:
-                relative_path = save_and_process_image(base_photo_file, product_slug, 'base')
-                
-                if relative_path:
-                    # Find or create the base photo record
-                    base_image = ProductImage.query.filter_by(product_id=product.id, type='base').first()
-                    
-                    if not base_image:
-                        base_image = ProductImage(product_id=product.id, type='base')
-                        db.session.add(base_image)
-                        
-                    base_image.file_path = relative_path
-                    flash("Base photo uploaded and processed.", 'success')
+                # Find or create the base photo record
+                base_image = ProductImage.query.filter_by(product_id=product.id, type='base').first()
+                if not base_image:
+                    base_image = ProductImage(product_id=product.id, type='base')
+
+                if stage_upload(base_image, base_photo_file):
+                    db.session.add(base_image)
+                    if base_image.status == 'pending':
+                        pending_images.append((base_image, base_photo_file))
+                    flash("Base photo uploaded.", 'success')
                 else:
-                    flash("Failed to process Base Photo. Check file type and content.", 'error')
+                    flash("Failed to upload Base Photo. Check file type and content.", 'error')
 
 
             # --- 4. Handle Additional Photos ---
             for file_storage in form.additional_photos.data:
                 # Check if file_storage is an actual file and not an empty field
                 if file_storage and file_storage.filename:
-                    # Process and save the file
-                    relative_path = save_and_process_image(file_storage, product_slug, 'additional')
+                    # Create a new record for each additional photo; processing happens in the worker pool
+                    image = ProductImage(product_id=product.id, type='additional')
                     
-                    if relative_path:
-                        # Create a new record for each additional photo
-                        image = ProductImage(
-                            product_id=product.id, 
-                            type='additional', 
-                            file_path=relative_path
-                        )
+                    if stage_upload(image, file_storage):
                         db.session.add(image)
+                        if image.status == 'pending':
+                            pending_images.append((image, file_storage))
                         
             
             # 5. Final Commit
             db.session.commit()
-            flash(f'Product "{product.name}" and images saved successfully.', 'success')
+
+            # 6. Hand the committed rows to the worker pool (ids exist only after commit)
+            for image, file_storage in pending_images:
+                image_jobs.submit(image.id, read_upload(file_storage), image.content_hash)
+
+            flash(f'Product "{product.name}" saved successfully.', 'success')
             
             # Redirect to the edit page to manage images/variants further
             return redirect(url_for('product.edit_product', product_id=product.id))
@@ -216,12 +370,159 @@ def edit_product(product_id):
     # Pass existing images to the template for display
     base_image = ProductImage.query.filter_by(product_id=product_id, type='base').first() if product_id else None
     additional_images = ProductImage.query.filter_by(product_id=product_id, type='additional').all() if product_id else []
+    variants = product.variants.options(joinedload(ProductVariant.color)).order_by(ProductVariant.sku).all() if product_id else []
     
     return render_template('product/product_edit.html', 
                            form=form, 
                            product=product, 
                            action_text=action_text,
                            base_image=base_image,
-                           additional_images=additional_images)
+                           additional_images=additional_images,
+                           variants=variants)
+
+
+# --- Variant and Stock Routes ---
+@bp.route('/<int:product_id>/variants/new', defaults={'variant_id': None}, methods=['GET', 'POST'])
+@bp.route('/<int:product_id>/variants/<int:variant_id>', methods=['GET', 'POST'])
+@login_required
+@admin_or_superadmin_required
+def edit_variant(product_id, variant_id):
+    """Create or update a color variant (SKU) of a product; shows its stock and recent movements."""
+    product = db.get_or_404(Product, product_id)
+    variant = None
+    if variant_id:
+        variant = ProductVariant.query.filter_by(id=variant_id, product_id=product_id).first_or_404()
+
+    form = VariantForm(obj=variant)
+    form.original = variant
+    # Variants come in the product's own colors; all colors until the product has some
+    form.color_id.choices = [(c.id, c.name) for c in product.colors] or cached_choices('colors')
+
+    if form.validate_on_submit():
+        if variant is None:
+            variant = ProductVariant(product_id=product.id)
+            db.session.add(variant)
+        form.populate_obj(variant)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash(f"Failed to save variant. {product.name} may already have a variant in that color.", 'error')
+        else:
+            flash(f'Variant "{variant.sku}" saved successfully.', 'success')
+            return redirect(url_for('product.edit_variant', product_id=product.id, variant_id=variant.id))
+
+    movements = variant.movements.limit(current_app.config['STOCK_HISTORY_LIMIT']).all() if variant and variant.id else []
+    return render_template('product/variant_edit.html',
+                           form=form,
+                           movement_form=StockMovementForm(formdata=None),
+                           product=product,
+                           variant=variant,
+                           movements=movements,
+                           movement_kinds=MOVEMENT_KINDS,
+                           title=f'{"Edit" if variant else "Add"} Variant')
+
+
+@bp.route('/<int:product_id>/variants/<int:variant_id>/stock', methods=['POST'])
+@login_required
+@admin_or_superadmin_required
+def post_stock_movement(product_id, variant_id):
+    """Posts one receive/sell/adjust movement to a variant's stock ledger."""
+    variant = ProductVariant.query.filter_by(id=variant_id, product_id=product_id).first_or_404()
+    form = StockMovementForm()
+
+    if form.validate_on_submit():
+        try:
+            post_movement(variant, form.kind.data, form.quantity.data,
+                          reference=form.reference.data, note=form.note.data, user_id=current_user.id)
+            db.session.commit()
+        except StockError as e:
+            db.session.rollback()
+            flash(str(e), 'error')
+        else:
+            flash(f'Stock for "{variant.sku}" is now {variant.on_hand}.', 'success')
+    else:
+        for errors in form.errors.values():
+            flash(' '.join(errors), 'error')
+
+    return redirect(url_for('product.edit_variant', product_id=product_id, variant_id=variant_id))
+
+
+@bp.route('/low-stock', methods=['GET'])
+@login_required
+@admin_or_superadmin_required
+def low_stock():
+    """Variants at or below their reorder level."""
+    variants = low_stock_query().options(
+        joinedload(ProductVariant.product),
+        joinedload(ProductVariant.color),
+    ).limit(current_app.config['LOW_STOCK_LIMIT']).all()
+    return render_template('product/low_stock.html', variants=variants, title='Low Stock')
+
+
+@bp.route('/import', methods=['GET', 'POST'])
+@login_required
+@admin_or_superadmin_required
+def import_product_file():
+    """Bulk-creates products from an uploaded CSV/XLSX file and shows the import report."""
+    form = ProductImportForm()
+    report = None
+
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            report = import_products(upload.stream, upload.filename,
+                                     current_app.config['IMPORT_CHUNK_SIZE'])
+        except ValueError as e:
+            flash(str(e), 'danger')
+        else:
+            flash(f'Imported {report.imported} of {report.rows} row(s) in {report.elapsed:.1f}s '
+                  f'({report.rows_per_sec:.0f} rows/s).',
+                  'success' if not report.errors else 'warning')
+
+    return render_template('product/product_import.html', title='Import Products',
+                           form=form, report=report)
+
+
+@bp.route('/uploads/<path:filename>')
+@login_required
+def uploaded_file(filename):
+    """
+    Serves a stored product image (derivative) from UPLOAD_FOLDER.
+
+    Stored filenames are content-addressed or random, so a URL never changes meaning:
+    responses carry a strong ETag derived from the path and an immutable Cache-Control,
+    and werkzeug answers If-None-Match with 304 and Range with 206.
+    """
+    config = current_app.config
+    # Raw uploads staged by older releases are not derivatives; never serve them
+    if os.path.normpath(filename).split(os.sep)[0] == INCOMING_DIR:
+        abort(404)
+    response = None
+
+    # Optional precompressed sidecar (<file>.br / <file>.gz) when the client accepts it
+    if config['IMAGE_PRECOMPRESSED']:
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            sidecar = safe_join(config['UPLOAD_FOLDER'], filename + suffix)
+            if encoding in request.accept_encodings and sidecar and os.path.isfile(sidecar):
+                response = send_from_directory(config['UPLOAD_FOLDER'], filename + suffix,
+                                               mimetype=mimetypes.guess_type(filename)[0],
+                                               etag=f"{filename}:{encoding}",
+                                               max_age=config['IMAGE_CACHE_MAX_AGE'])
+                response.content_encoding = encoding
+                break
+
+    if response is None:
+        response = send_from_directory(config['UPLOAD_FOLDER'], filename,
+                                       etag=filename,
+                                       max_age=config['IMAGE_CACHE_MAX_AGE'])
+
+    if config['IMAGE_PRECOMPRESSED']:
+        response.vary.add('Accept-Encoding')
+    # Behind login, so only the browser (not shared proxies) may keep a copy
+    response.cache_control.private = True
+    response.cache_control.public = False
+    response.cache_control.immutable = True
+    return response
 
-# NOTE: You will also need a delete_product route.
\ No newline at end of file
+# NOTE: You will also need a delete_product route.
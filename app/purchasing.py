@@ -0,0 +1,222 @@
+# app/purchasing.py
+
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import bindparam, func, insert, select, tuple_, update
+from app import db
+from app.models import (GoodsReceipt, GoodsReceiptLine, Product, ProductVariant, PurchaseOrder,
+                        PurchaseOrderLine)
+from app.inventory import batches, post_movements
+
+# Purchase orders and goods receipts arrive as whole documents (a form post, CSV or XLSX
+# file), one row per line. A line names its variant either by 'sku' or by 'product_id'
+# plus 'color_id', with a 'quantity' and an optional 'unit_cost'.
+#
+# A document is validated as a whole before anything is written. Variants are resolved
+# with one IN lookup per IN_BATCH keys, not one query per line. The rows are then written
+# with executemany (lines, stock movements, order progress) in the caller's transaction.
+# Either every line is posted or none is.
+LINE_COLUMNS = ('sku', 'product_id', 'color_id', 'quantity', 'unit_cost')
+
+
+class PurchasingError(ValueError):
+    """A document that cannot be posted; `errors` lists (line number, message) per bad line."""
+
+    def __init__(self, message, errors=()):
+        super().__init__(message)
+        self.errors = list(errors)
+
+
+def _text(row, column):
+    value = row.get(column)
+    return '' if value is None else str(value).strip()
+
+
+def parse_line(row):
+    """
+    Returns (variant key, quantity, unit cost) for one row, where the key is ('sku', sku)
+    or ('pair', (product_id, color_id)). Raises ValueError with a readable message.
+    """
+    sku = _text(row, 'sku')
+    if sku:
+        key = ('sku', sku)
+    else:
+        try:
+            key = ('pair', (int(_text(row, 'product_id')), int(_text(row, 'color_id'))))
+        except ValueError:
+            raise ValueError("Give a 'sku' or numeric 'product_id' and 'color_id'.")
+
+    try:
+        quantity = int(_text(row, 'quantity'))
+    except ValueError:
+        raise ValueError(f"Quantity '{_text(row, 'quantity')}' is not a whole number.")
+    if quantity <= 0:
+        raise ValueError("Quantity must be positive.")
+
+    unit_cost = None
+    if _text(row, 'unit_cost'):
+        try:
+            unit_cost = Decimal(_text(row, 'unit_cost'))
+        except InvalidOperation:
+            raise ValueError(f"Unit cost '{_text(row, 'unit_cost')}' is not a number.")
+        if unit_cost < 0 or not unit_cost.is_finite():
+            raise ValueError("Unit cost must be zero or more.")
+    return key, quantity, unit_cost
+
+
+def describe_key(key):
+    kind, value = key
+    return f"SKU '{value}'" if kind == 'sku' else f"product {value[0]} / color {value[1]}"
+
+
+def resolve_variants(keys):
+    """
+    Maps line keys to (variant id, supplier id of its product) with set-based lookups:
+    one IN query per IN_BATCH SKUs and one row-value IN per IN_BATCH (product, color) pairs.
+    Unknown keys are absent.
+    """
+    skus = sorted({value for kind, value in keys if kind == 'sku'})
+    pairs = sorted({value for kind, value in keys if kind == 'pair'})
+    found = {}
+    for chunk in batches(skus):
+        for sku, variant_id, supplier_id in db.session.execute(
+                select(ProductVariant.sku, ProductVariant.id, Product.supplier_id)
+                .join(Product, Product.id == ProductVariant.product_id)
+                .where(ProductVariant.sku.in_(chunk))):
+            found[('sku', sku)] = (variant_id, supplier_id)
+    for chunk in batches(pairs):
+        for product_id, color_id, variant_id, supplier_id in db.session.execute(
+                select(ProductVariant.product_id, ProductVariant.color_id, ProductVariant.id,
+                       Product.supplier_id)
+                .join(Product, Product.id == ProductVariant.product_id)
+                .where(tuple_(ProductVariant.product_id, ProductVariant.color_id).in_(chunk))):
+            found[('pair', (product_id, color_id))] = (variant_id, supplier_id)
+    return found
+
+
+def validate_lines(supplier_id, rows):
+    """
+    Checks every (line number, row dict) of a document for `supplier_id`. Returns
+    [(line number, variant id, quantity, unit cost)], or raises PurchasingError listing
+    every bad line: unparsable values, unknown variants, products of another supplier.
+    """
+    parsed, errors = [], []
+    for line, row in rows:
+        try:
+            parsed.append((line, *parse_line(row)))
+        except ValueError as e:
+            errors.append((line, str(e)))
+
+    found = resolve_variants([key for _, key, _, _ in parsed])
+    lines = []
+    for line, key, quantity, unit_cost in parsed:
+        match = found.get(key)
+        if match is None:
+            errors.append((line, f"No variant with {describe_key(key)}."))
+        elif match[1] != supplier_id:
+            errors.append((line, f"{describe_key(key)} is not a product of this supplier."))
+        else:
+            lines.append((line, match[0], quantity, unit_cost))
+
+    if errors:
+        raise PurchasingError(f"{len(errors)} invalid line(s); nothing was posted.", sorted(errors))
+    if not lines:
+        raise PurchasingError("The document has no lines.")
+    return lines
+
+
+def create_order(supplier, reference, rows, note=None, user_id=None):
+    """
+    Creates a purchase order for `supplier` from (line number, row dict) pairs, in the
+    current transaction (the caller commits). Repeated variants are merged into one line.
+    """
+    reference = reference.strip()
+    if db.session.query(PurchaseOrder.id).filter_by(reference=reference).first():
+        raise PurchasingError(f"Purchase order '{reference}' already exists.")
+    lines = validate_lines(supplier.id, rows)
+
+    merged = {}
+    for _, variant_id, quantity, unit_cost in lines:
+        entry = merged.setdefault(variant_id, {'variant_id': variant_id, 'quantity_ordered': 0,
+                                               'quantity_received': 0, 'unit_cost': unit_cost})
+        entry['quantity_ordered'] += quantity
+        if unit_cost is not None:
+            entry['unit_cost'] = unit_cost
+
+    order = PurchaseOrder(supplier_id=supplier.id, reference=reference, note=note or None,
+                          user_id=user_id, status='open')
+    db.session.add(order)
+    db.session.flush()
+    for entry in merged.values():
+        entry['order_id'] = order.id
+    db.session.connection().execute(insert(PurchaseOrderLine.__table__), list(merged.values()))
+    return order
+
+
+def receive_goods(supplier, reference, rows, order=None, note=None, user_id=None):
+    """
+    Posts a goods receipt (a delivery note `reference`) for `supplier` from (line number,
+    row dict) pairs, in the current transaction (the caller commits): the receipt and its
+    lines, one 'receive' stock movement per line and, against an `order`, the received
+    quantities and the order status. Returns the GoodsReceipt.
+    """
+    reference = reference.strip()
+    if db.session.query(GoodsReceipt.id).filter_by(supplier_id=supplier.id, reference=reference).first():
+        raise PurchasingError(f"Delivery '{reference}' from this supplier was already received.")
+    if order is not None:
+        if order.supplier_id != supplier.id:
+            raise PurchasingError(f"Purchase order '{order.reference}' belongs to another supplier.")
+        if order.status in ('received', 'cancelled'):
+            raise PurchasingError(f"Purchase order '{order.reference}' is {order.get_status_name().lower()}.")
+
+    lines = validate_lines(supplier.id, rows)
+
+    order_lines = {}
+    if order is not None:
+        order_lines = dict(db.session.execute(
+            select(PurchaseOrderLine.variant_id, PurchaseOrderLine.id)
+            .where(PurchaseOrderLine.order_id == order.id)).all())
+        missing = [(line, "This variant is not on the purchase order.")
+                   for line, variant_id, _, _ in lines if variant_id not in order_lines]
+        if missing:
+            raise PurchasingError(f"{len(missing)} line(s) are not on purchase order "
+                                  f"'{order.reference}'; nothing was posted.", missing)
+
+    receipt = GoodsReceipt(supplier_id=supplier.id, order_id=order.id if order is not None else None,
+                           reference=reference, note=note or None, user_id=user_id)
+    db.session.add(receipt)
+    db.session.flush()
+
+    connection = db.session.connection()
+    connection.execute(insert(GoodsReceiptLine.__table__), [
+        {'receipt_id': receipt.id, 'variant_id': variant_id, 'quantity': quantity, 'unit_cost': unit_cost}
+        for _, variant_id, quantity, unit_cost in lines
+    ])
+    post_movements([
+        {'variant_id': variant_id, 'kind': 'receive', 'quantity': quantity, 'reference': f"GR {reference}"}
+        for _, variant_id, quantity, _ in lines
+    ], user_id=user_id)
+
+    if order is not None:
+        received = {}
+        for _, variant_id, quantity, _ in lines:
+            received[variant_id] = received.get(variant_id, 0) + quantity
+        table = PurchaseOrderLine.__table__
+        connection.execute(
+            update(table).where(table.c.id == bindparam('line'))
+            .values(quantity_received=table.c.quantity_received + bindparam('quantity')),
+            [{'line': order_lines[variant_id], 'quantity': quantity} for variant_id, quantity in received.items()],
+        )
+        refresh_order_status(order)
+    return receipt
+
+
+def refresh_order_status(order):
+    """Sets an open order to 'partial' or 'received' from its lines (one COUNT query)."""
+    if order.status == 'cancelled':
+        return
+    outstanding = db.session.execute(
+        select(func.count(PurchaseOrderLine.id))
+        .where(PurchaseOrderLine.order_id == order.id,
+               PurchaseOrderLine.quantity_received < PurchaseOrderLine.quantity_ordered)
+    ).scalar()
+    order.status = 'partial' if outstanding else 'received'
@@ -0,0 +1,155 @@
+# app/search.py
+
+import re
+from sqlalchemy import event, text
+from app import db
+from app.models import Product
+
+# SQLite FTS5 index over Product text columns. rowid = product.id; the index keeps its own
+# copy of the text so it can be maintained from ORM events without reading old values.
+FTS_TABLE = 'product_fts'
+
+CREATE_FTS_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(name, description, keywords, tokenize='unicode61 remove_diacritics 2')"
+)
+
+# BM25 column weights: a hit in the name outranks keywords, which outrank the description
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+# Engines (by URL) on which the FTS table is known to exist
+_indexed_engines = set()
+
+
+def fts_available(connection):
+    """True if `connection` is SQLite and the FTS table exists (checked once per engine)."""
+    if connection.dialect.name != 'sqlite':
+        return False
+    key = str(connection.engine.url)
+    if key not in _indexed_engines:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': FTS_TABLE},
+        ).first()
+        if not exists:
+            return False
+        _indexed_engines.add(key)
+    return True
+
+
+def create_search_index(connection):
+    """Creates the FTS table if missing (SQLite only)."""
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(CREATE_FTS_SQL))
+        _indexed_engines.add(str(connection.engine.url))
+
+
+def build_match_query(q):
+    """
+    Turns free text into an FTS5 MATCH expression: every word must match, as a prefix.
+    Words are quoted, so FTS5 operators typed by the user are treated as plain text.
+    """
+    words = re.findall(r'\w+', q or '')
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_product_ids(q, limit):
+    """
+    Returns the ids of products matching `q`, best BM25 rank first.
+    Falls back to a LIKE scan on databases without the FTS index.
+    """
+    match = build_match_query(q)
+    if not match:
+        return []
+
+    connection = db.session.connection()
+    if fts_available(connection):
+        weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+        rows = db.session.execute(
+            text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+                 f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT :limit"),
+            {'match': match, 'limit': limit},
+        )
+        return [row[0] for row in rows]
+
+    # Slow path (e.g. Postgres before an equivalent index exists)
+    query = Product.query.with_entities(Product.id)
+    for word in re.findall(r'\w+', q):
+        pattern = f'%{word}%'
+        query = query.filter(Product.name.ilike(pattern) | Product.description.ilike(pattern)
+                             | Product.keywords.ilike(pattern))
+    return [row[0] for row in query.order_by(Product.name).limit(limit)]
+
+
+def index_products(connection, rows):
+    """
+    Adds freshly inserted products to the FTS table in one executemany. For Core bulk
+    inserts, which bypass the ORM events below. `rows` are dicts with id/name/description/keywords.
+    """
+    if not rows or not fts_available(connection):
+        return
+    connection.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, name, description, keywords) "
+             "VALUES (:id, :name, :description, :keywords)"),
+        [{'id': row['id'], 'name': row.get('name') or '',
+          'description': row.get('description') or '', 'keywords': row.get('keywords') or ''}
+         for row in rows],
+    )
+
+
+def rebuild_search_index():
+    """Repopulates the FTS table from the product table in one statement. Returns the row count."""
+    connection = db.session.connection()
+    create_search_index(connection)
+    connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    connection.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, name, description, keywords) "
+        "SELECT id, name, coalesce(description, ''), coalesce(keywords, '') FROM product"
+    ))
+    connection.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"))
+    return connection.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+
+
+# --- Keep the index in sync with Product (same connection, same transaction) ---
+
+def _index_product(mapper, connection, target):
+    if not fts_available(connection):
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': target.id})
+    connection.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, name, description, keywords) "
+             "VALUES (:id, :name, :description, :keywords)"),
+        {'id': target.id, 'name': target.name or '',
+         'description': target.description or '', 'keywords': target.keywords or ''},
+    )
+
+
+def _reindex_product(mapper, connection, target):
+    # after_update also fires for relationship-only changes (e.g. colors); skip those
+    state = db.inspect(target)
+    if any(state.attrs[key].history.has_changes() for key in ('name', 'description', 'keywords')):
+        _index_product(mapper, connection, target)
+
+
+def _unindex_product(mapper, connection, target):
+    if not fts_available(connection):
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': target.id})
+
+
+def _create_index_with_tables(metadata, connection, **kw):
+    create_search_index(connection)
+
+
+def _drop_index_with_tables(metadata, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+        _indexed_engines.discard(str(connection.engine.url))
+
+
+event.listen(Product, 'after_insert', _index_product)
+event.listen(Product, 'after_update', _reindex_product)
+event.listen(Product, 'after_delete', _unindex_product)
+# db.create_all() / drop_all() (init_db) manage the FTS table alongside the ORM tables
+event.listen(db.metadata, 'after_create', _create_index_with_tables)
+event.listen(db.metadata, 'before_drop', _drop_index_with_tables)
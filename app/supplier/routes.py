@@ -1,10 +1,16 @@
 # app/supplier/routes.py
 
-from flask import render_template, redirect, url_for, flash
-from flask_login import login_required
+import io
+import time
+from flask import render_template, redirect, url_for, flash, request
+from flask_login import current_user, login_required
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import Supplier, SUPPLIER_TYPES
-from app.forms import SupplierForm
+from app.models import (Supplier, SUPPLIER_TYPES, PurchaseOrder, PurchaseOrderLine, GoodsReceipt,
+                        GoodsReceiptLine, ProductVariant)
+from app.forms import SupplierForm, PurchaseOrderForm, GoodsReceiptForm
+from app.product.importer import read_rows
+from app.purchasing import PurchasingError, create_order, receive_goods
 from app.supplier import bp 
 from app.utils import admin_or_superadmin_required, admin_required
 from sqlalchemy.exc import IntegrityError
@@ -34,6 +40,7 @@ def edit_supplier(supplier_id):
     action_text = 'Edit' if supplier_id else 'Create'
         
     form = SupplierForm(obj=supplier)
+    form.original = supplier
 
     if form.validate_on_submit():
         try:
@@ -45,6 +52,7 @@ def edit_supplier(supplier_id):
                 db.session.add(supplier)
                 flash(f'Supplier "{supplier.name}" created successfully.', 'success')
             
+            # The flush bumps the 'suppliers' version, invalidating the cached choices
             db.session.commit()
             return redirect(url_for('supplier.list_suppliers'))
         
@@ -60,4 +68,139 @@ def edit_supplier(supplier_id):
                            supplier=supplier, 
                            action_text=action_text)
 
-# Note: A delete route should also be implemented, similar to the user delete route.
\ No newline at end of file
+
+
+# --- Purchase Orders and Goods Receipts ---
+
+def document_rows(form):
+    """(line number, row dict) pairs from the form's lines file, else from the pasted CSV."""
+    upload = form.lines_file.data
+    if upload:
+        return read_rows(upload.stream, upload.filename)
+    return read_rows(io.BytesIO(form.lines_text.data.encode('utf-8')), 'lines.csv')
+
+def line_variants_query(line_model, parent_column, parent_id):
+    """Document lines with variant, product and color joined (one query for the whole table)."""
+    return (line_model.query
+            .options(joinedload(line_model.variant).joinedload(ProductVariant.product),
+                     joinedload(line_model.variant).joinedload(ProductVariant.color))
+            .filter(parent_column == parent_id)
+            .order_by(line_model.id))
+
+
+@bp.route('/<int:supplier_id>/purchasing', methods=['GET'])
+@login_required
+@admin_or_superadmin_required
+def supplier_purchasing(supplier_id):
+    """A supplier's purchase orders and goods receipts, newest first."""
+    supplier = db.get_or_404(Supplier, supplier_id)
+    orders = supplier.purchase_orders.order_by(PurchaseOrder.id.desc()).limit(100).all()
+    receipts = supplier.receipts.options(joinedload(GoodsReceipt.order)) \
+        .order_by(GoodsReceipt.id.desc()).limit(100).all()
+    return render_template('supplier/purchasing.html',
+                           supplier=supplier,
+                           orders=orders,
+                           receipts=receipts,
+                           title=f'Purchasing: {supplier.name}')
+
+
+@bp.route('/<int:supplier_id>/orders/new', methods=['GET', 'POST'])
+@login_required
+@admin_or_superadmin_required
+def create_purchase_order(supplier_id):
+    """Creates a purchase order from an uploaded or pasted list of lines."""
+    supplier = db.get_or_404(Supplier, supplier_id)
+    form = PurchaseOrderForm()
+    errors = []
+
+    if form.validate_on_submit():
+        try:
+            order = create_order(supplier, form.reference.data, document_rows(form),
+                                 note=form.note.data, user_id=current_user.id)
+            db.session.commit()
+        except PurchasingError as e:
+            db.session.rollback()
+            errors = e.errors
+            flash(str(e), 'error')
+        except ValueError as e:
+            # Unreadable lines file (see importer.read_rows)
+            db.session.rollback()
+            flash(str(e), 'error')
+        else:
+            flash(f'Purchase order "{order.reference}" created.', 'success')
+            return redirect(url_for('supplier.view_purchase_order', order_id=order.id))
+
+    return render_template('supplier/purchase_document_edit.html',
+                           form=form,
+                           supplier=supplier,
+                           errors=errors,
+                           title='New Purchase Order')
+
+
+@bp.route('/orders/<int:order_id>', methods=['GET'])
+@login_required
+@admin_or_superadmin_required
+def view_purchase_order(order_id):
+    order = db.get_or_404(PurchaseOrder, order_id)
+    lines = line_variants_query(PurchaseOrderLine, PurchaseOrderLine.order_id, order.id).all()
+    return render_template('supplier/purchase_order.html',
+                           order=order,
+                           lines=lines,
+                           receipts=order.receipts.order_by(GoodsReceipt.id).all(),
+                           title=f'Purchase Order {order.reference}')
+
+
+@bp.route('/<int:supplier_id>/receipts/new', methods=['GET', 'POST'])
+@login_required
+@admin_or_superadmin_required
+def receive_delivery(supplier_id):
+    """
+    Posts a whole delivery (goods receipt) in one request: every line is validated
+    first, then all of them are received in a single transaction.
+    """
+    supplier = db.get_or_404(Supplier, supplier_id)
+    form = GoodsReceiptForm()
+    open_orders = supplier.purchase_orders.filter(PurchaseOrder.status.in_(('open', 'partial'))) \
+        .order_by(PurchaseOrder.id.desc()).all()
+    form.order_id.choices = [(0, '(none)')] + [(o.id, o.reference) for o in open_orders]
+    if request.method == 'GET' and request.args.get('order_id', type=int):
+        form.order_id.data = request.args.get('order_id', type=int)
+    errors = []
+
+    if form.validate_on_submit():
+        order = next((o for o in open_orders if o.id == form.order_id.data), None)
+        started = time.perf_counter()
+        try:
+            receipt = receive_goods(supplier, form.reference.data, document_rows(form), order=order,
+                                    note=form.note.data, user_id=current_user.id)
+            db.session.commit()
+        except PurchasingError as e:
+            db.session.rollback()
+            errors = e.errors
+            flash(str(e), 'error')
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e), 'error')
+        else:
+            count = receipt.lines.count()
+            elapsed = time.perf_counter() - started
+            flash(f'Received {count} line(s) on delivery "{receipt.reference}" in {elapsed:.2f}s.', 'success')
+            return redirect(url_for('supplier.view_goods_receipt', receipt_id=receipt.id))
+
+    return render_template('supplier/purchase_document_edit.html',
+                           form=form,
+                           supplier=supplier,
+                           errors=errors,
+                           title='Receive Goods')
+
+
+@bp.route('/receipts/<int:receipt_id>', methods=['GET'])
+@login_required
+@admin_or_superadmin_required
+def view_goods_receipt(receipt_id):
+    receipt = db.get_or_404(GoodsReceipt, receipt_id)
+    lines = line_variants_query(GoodsReceiptLine, GoodsReceiptLine.receipt_id, receipt.id).all()
+    return render_template('supplier/goods_receipt.html',
+                           receipt=receipt,
+                           lines=lines,
+                           title=f'Goods Receipt {receipt.reference}')
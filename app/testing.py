@@ -0,0 +1,48 @@
+# app/testing.py
+#
+# pytest plugin: enable with `pytest_plugins = ['app.testing']` in a conftest.py.
+#
+#     def test_product_list_query_budget(client, query_budget):
+#         with query_budget(6):
+#             client.get('/products/')
+
+from contextlib import contextmanager
+import pytest
+from config import Config
+from app.benchmarks import scratch_app
+from app.nplusone import record_queries
+
+
+@contextmanager
+def assert_max_queries(max_queries, repeat_threshold=None):
+    """
+    Fails if the block runs more than `max_queries` statements, or (with `repeat_threshold`)
+    any one statement shape that many times. The message lists the repeated shapes and
+    the template line or app frame that issued them.
+    """
+    with record_queries() as log:
+        yield log
+    threshold = repeat_threshold or 2
+    if log.count > max_queries:
+        pytest.fail(f"Query budget of {max_queries} exceeded: {log.describe(threshold)}", pytrace=False)
+    if repeat_threshold and log.repeated(repeat_threshold):
+        pytest.fail(f"Repeated queries (N+1): {log.describe(repeat_threshold)}", pytrace=False)
+
+
+@pytest.fixture
+def app():
+    """App on a throw-away SQLite database; the N+1 detector raises on repeated lazy loads."""
+    with scratch_app(Config, IMAGE_WORKERS=0, BCRYPT_LOG_ROUNDS=4, LOGIN_THROTTLE_ENABLED=False,
+                     QUERY_DETECTOR='raise') as app:
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def query_budget(app):
+    """assert_max_queries, with the test app's context (and so its engine) active."""
+    return assert_max_queries
@@ -0,0 +1,77 @@
+# app/uniqueness.py
+
+from sqlalchemy import func, or_, select
+from app import db
+from app.models import Brand, Category, Color, Material, ProductVariant, Style, Supplier, User
+
+# Unique columns that can be checked before a write, by check name (the MODELS route
+# names, plus users and variants). Forms and the as-you-type endpoint ask which values
+# are taken rather than finding a collision by failing a commit: one query per model,
+# however many columns, each an IN on that column's unique index (SQLite answers an OR
+# of indexed terms with one index lookup per term).
+UNIQUE_CHECKS = {
+    'users': (User, ('username', 'email')),
+    'suppliers': (Supplier, ('name',)),
+    'styles': (Style, ('name',)),
+    'categories': (Category, ('name',)),
+    'brands': (Brand, ('name',)),
+    'materials': (Material, ('name',)),
+    'colors': (Color, ('name', 'hex_code')),
+    'variants': (ProductVariant, ('sku',)),
+}
+
+# Columns compared case-insensitively: catalog names, as the bulk upsert (app/product/
+# bulk.py) and the product importer match them, so 'Red' is taken once 'red' exists.
+# Usernames, emails, SKUs and hex codes match exactly, as login and lookups do. A lower()
+# term cannot use the unique index, but the named tables are small.
+CASE_INSENSITIVE_COLUMNS = ('name',)
+
+# Values per column accepted by one as-you-type check request
+CHECK_VALUES_LIMIT = 100
+
+
+def fold_value(column, value):
+    """`value` as compared in `column`: lowercased for CASE_INSENSITIVE_COLUMNS."""
+    if column in CASE_INSENSITIVE_COLUMNS and isinstance(value, str):
+        return value.lower()
+    return value
+
+
+def existing_values(model, values):
+    """
+    Which of `values` ({column: value or list of values}) are stored in `model`, as
+    {column: {value as given: id of the row holding it}}, in one query. Empty values are
+    ignored; CASE_INSENSITIVE_COLUMNS match whatever the stored spelling.
+    """
+    wanted = {}
+    for column, given in values.items():
+        given = given if isinstance(given, (list, tuple, set)) else [given]
+        # Folded value -> the spellings given for it
+        folded = {}
+        for value in given:
+            if value not in (None, ''):
+                folded.setdefault(fold_value(column, value), set()).add(value)
+        if folded:
+            wanted[column] = folded
+    if not wanted:
+        return {}
+
+    table = model.__table__
+    terms = []
+    for column, folded in wanted.items():
+        stored = table.c[column]
+        if column in CASE_INSENSITIVE_COLUMNS:
+            stored = func.lower(stored)
+        terms.append(stored.in_(sorted(folded)))
+
+    found = {column: {} for column in wanted}
+    rows = db.session.execute(
+        select(table.c.id, *(table.c[column] for column in wanted)).where(or_(*terms))
+    ).mappings()
+    for row in rows:
+        for column, folded in wanted.items():
+            if row[column] is None:
+                continue
+            for value in folded.get(fold_value(column, row[column]), ()):
+                found[column][value] = row['id']
+    return found
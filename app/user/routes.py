@@ -6,6 +6,7 @@ from app import db
 from app.models import User, USER_ROLES
 from app.forms import UserForm # Your UserForm is in forms.py
 from app.user import bp 
+from app.cache import user_cache
 from app.utils import superadmin_required, admin_required # Assuming access utility exists
 from sqlalchemy.exc import IntegrityError
 from flask_login import current_user
@@ -50,7 +51,7 @@ def edit_user(user_id):
     form = UserForm(obj=user)
     
     # Pass the object to the form for unique validation checks
-    form.original_user = user 
+    form.original = user
     
     # Role choices are already filtered in UserForm (r > 0)
 
@@ -65,6 +66,7 @@ def edit_user(user_id):
         try:
             db.session.add(user)
             db.session.commit()
+            user_cache.invalidate(user.id)
             flash(f'User "{user.username}" saved successfully.', 'success')
             return redirect(url_for('user.list_users'))
         except Exception as e:
@@ -89,6 +91,7 @@ def delete_user(user_id):
     try:
         db.session.delete(user)
         db.session.commit()
+        user_cache.invalidate(user_id)
         flash(f'User "{user.username}" deleted successfully.', 'success')
     except Exception:
         db.session.rollback()
@@ -1,8 +1,11 @@
 # app/utils.py
 
+import base64
+import json
 from functools import wraps
 from flask_login import current_user
 from flask import abort
+from sqlalchemy import tuple_
 
 def superadmin_required(f):
     """Decorator to allow only SuperAdmin users (Role 0) to access a route."""
@@ -32,4 +35,56 @@ def admin_required(f):
         if not current_user.is_authenticated or current_user.role != 1:
             abort(403)
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+# --- Keyset (cursor) Pagination ---
+
+def encode_cursor(values):
+    """Encode the sort-key values of the last row on a page into an opaque URL-safe token."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Decode a cursor produced by encode_cursor. Returns None for a missing or tampered token."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+def keyset_paginate(query, columns, cursor, per_page):
+    """
+    Fetches one page of `query` ordered by `columns` (the last column must be unique, e.g. the id),
+    starting strictly after the row identified by `cursor`.
+
+    Uses a row-value comparison (name, id) > (:name, :id) instead of OFFSET, so every page
+    costs a single indexed range scan no matter how deep the user has paged.
+
+    Returns: (items, next_cursor) where next_cursor is None on the last page.
+    """
+    values = decode_cursor(cursor)
+    if values is not None and len(values) == len(columns):
+        query = query.filter(tuple_(*columns) > tuple_(*values))
+
+    # Fetch one extra row to find out whether a next page exists without a COUNT(*)
+    rows = query.order_by(*columns).limit(per_page + 1).all()
+    items = rows[:per_page]
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, col.key) for col in columns)
+    return items, next_cursor
+
+# --- Statistics ---
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
@@ -0,0 +1,62 @@
+# app/versions.py
+
+from flask import g, has_app_context
+from sqlalchemy import event, insert, update
+from app import db
+from app.models import Brand, Category, Color, Material, Product, Style, Supplier, TableVersion
+
+# TableVersion counter bumped whenever a row of these models is inserted, updated or
+# deleted through the ORM: ChoiceCache lists and API ETags are keyed on these versions.
+# Names match the MODELS route names (and the 'suppliers' choice list).
+VERSIONED_MODELS = {
+    Product: 'products',
+    Supplier: 'suppliers',
+    Style: 'styles',
+    Category: 'categories',
+    Brand: 'brands',
+    Material: 'materials',
+    Color: 'colors',
+}
+
+# Models whose many-to-many collections are part of what the version covers (product
+# colors). Other models only count column changes: Color rows are dirtied by the
+# 'products' backref whenever a product's colors change.
+COLLECTION_VERSIONED = {Product}
+
+
+def bump_versions(connection, names):
+    """
+    Increments each TableVersion in `names` on `connection` (update, then insert if the
+    row is missing). Runs in the caller's transaction, so a rolled back write leaves the
+    versions, and every cache keyed on them, untouched. Called by the flush hook below and
+    directly by Core bulk writes, which bypass it.
+    """
+    table = TableVersion.__table__
+    for name in sorted(set(names)):
+        result = connection.execute(
+            update(table).where(table.c.name == name).values(version=table.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(name=name, version=1))
+    if has_app_context():
+        g.pop('table_versions', None)
+
+
+def _bump_flushed(session, flush_context):
+    # Runs once per flush (not per row), in the flush's transaction; new/dirty/deleted
+    # still describe what was just written
+    names = set()
+    for obj in session.new:
+        names.add(VERSIONED_MODELS.get(type(obj)))
+    for obj in session.deleted:
+        names.add(VERSIONED_MODELS.get(type(obj)))
+    for obj in session.dirty:
+        name = VERSIONED_MODELS.get(type(obj))
+        if name and session.is_modified(obj, include_collections=type(obj) in COLLECTION_VERSIONED):
+            names.add(name)
+    names.discard(None)
+    if names:
+        bump_versions(session.connection(), names)
+
+
+event.listen(db.session, 'after_flush', _bump_flushed)
@@ -12,10 +12,45 @@ class Config:
     DEBUG = True  # Change to False for production
 
     # SQLAlchemy Configuration (Database Agnosticism is handled here)
-    SQLALCHEMY_DATABASE_URI = os.environ.get('SQLALCHEMY_DATABASE_URI')
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'instance', 'bbbms.sqlite')
+    # The env URI (e.g. postgresql+psycopg://...) wins; SQLite in instance/ is the default
+    SQLALCHEMY_DATABASE_URI = os.environ.get('SQLALCHEMY_DATABASE_URI') or \
+        'sqlite:///' + os.path.join(basedir, 'instance', 'bbbms.sqlite')
     SQLALCHEMY_TRACK_MODIFICATIONS = False # Recommended to set to False
 
+    # Engine profile (see app/database.py): pool per worker process, sized for its threads
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds, server databases only
+
+    # Applied on every new SQLite connection. WAL lets readers run alongside the single
+    # writer; busy_timeout makes concurrent writers queue instead of failing at once.
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',      # fsync at checkpoints only; safe with WAL
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # ms
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,     # negative = KiB, i.e. 64 MiB page cache
+        'temp_store': 'MEMORY',
+    }
+
+    # Logged-in user snapshot cache (per worker process)
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 300))  # seconds
+
+    # bcrypt work factor for new hashes; other costs are rehashed on the next login.
+    # Use `flask bench_bcrypt` to pick the highest cost within LOGIN_HASH_BUDGET_MS.
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    LOGIN_HASH_BUDGET_MS = int(os.environ.get('LOGIN_HASH_BUDGET_MS', 250))
+
+    # Login throttling (token buckets, per worker process): (attempts, per seconds)
+    LOGIN_THROTTLE_ENABLED = True
+    LOGIN_IP_RATE = (20, 60)
+    LOGIN_ACCOUNT_RATE = (5, 60)
+    # bcrypt verification pool: threads (default: one per core) and max logins in flight
+    LOGIN_VERIFY_THREADS = int(os.environ.get('LOGIN_VERIFY_THREADS', 0)) or None
+    LOGIN_VERIFY_QUEUE = int(os.environ.get('LOGIN_VERIFY_QUEUE', 32))
+    LOGIN_VERIFY_TIMEOUT = 10  # seconds
+
     # Custom App Configuration (Used for initial setup)
     SUPERADMIN_USERNAME = os.environ.get('SUPERADMIN_USERNAME')
     SUPERADMIN_PASSWORD = os.environ.get('SUPERADMIN_PASSWORD')
@@ -29,5 +64,49 @@ class Config:
     # UPLOAD_FOLDER = os.path.join(os.getcwd(), 'app', 'static', 'uploads')
     # Allowed extensions for product images
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'} 
-    # Target size for all images (1:1 aspect ratio)
-    IMAGE_SIZE = 800
\ No newline at end of file
+    # Target size for all images (1:1 aspect ratio); the primary derivative
+    IMAGE_SIZE = 800
+    # Every upload is stored at each of these sizes and in each of these formats (for srcset)
+    IMAGE_DERIVATIVE_SIZES = (96, 320, 800)
+    IMAGE_DERIVATIVE_FORMATS = ('webp', 'jpeg')
+    # Serving uploaded images: URLs are immutable, so browsers may cache them for a year
+    IMAGE_CACHE_MAX_AGE = 365 * 24 * 3600
+    # Serve <file>.br / <file>.gz next to an image when present and accepted
+    IMAGE_PRECOMPRESSED = os.environ.get('IMAGE_PRECOMPRESSED', '0') == '1'
+    # Let the front-end server (nginx/Apache) stream files via X-Sendfile
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '0') == '1'
+    # Processes in the image worker pool (default: one per core, 0 = process inline)
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', os.cpu_count() or 1))
+
+    # Product list pagination (keyset/cursor based)
+    PRODUCTS_PER_PAGE = int(os.environ.get('PRODUCTS_PER_PAGE', 50))
+    PRODUCTS_MAX_PER_PAGE = 200
+    # Maximum number of ranked hits returned by product search
+    SEARCH_RESULTS_LIMIT = 50
+
+    # Bulk product import: rows inserted per executemany/transaction
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 500))
+
+    # JSON API (/api/v1): page sizes, items per bulk upsert and the bearer token for
+    # machine clients (without one, only logged-in Admin/SuperAdmin sessions are accepted)
+    API_PER_PAGE = 100
+    API_MAX_PER_PAGE = 1000
+    API_BULK_LIMIT = 1000
+    API_TOKEN = os.environ.get('API_TOKEN')
+
+    # Stock: ledger rows shown per variant and rows on the low-stock report
+    STOCK_HISTORY_LIMIT = 50
+    LOW_STOCK_LIMIT = 500
+
+    # Per-request instrumentation: Server-Timing header, JSON log line, /metrics
+    REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED', '1') == '1'
+    REQUEST_LOG_ENABLED = os.environ.get('REQUEST_LOG_ENABLED', '1') == '1'
+    # Recent requests per endpoint kept for the p50/p95/p99 quantiles
+    REQUEST_METRICS_WINDOW = 1024
+    # Bearer token for /metrics; without one it answers 403, except local scrapes in debug/testing
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # N+1 detector for development/tests: None (off), 'log' or 'raise' (see app/nplusone.py)
+    QUERY_DETECTOR = os.environ.get('QUERY_DETECTOR') or None
+    # Executions of one statement shape per request that count as an N+1 pattern
+    QUERY_DETECTOR_THRESHOLD = int(os.environ.get('QUERY_DETECTOR_THRESHOLD', 5))
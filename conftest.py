@@ -0,0 +1,3 @@
+# conftest.py
+
+pytest_plugins = ['app.testing']
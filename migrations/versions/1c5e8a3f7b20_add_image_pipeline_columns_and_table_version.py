@@ -0,0 +1,64 @@
+"""add image pipeline columns and table version
+
+Revision ID: 1c5e8a3f7b20
+Revises:
+Create Date: 2026-10-16 08:00:00.000000
+
+First tracked revision: brings a baseline database up to the schema the later revisions
+build on (image processing state and hashes, image derivatives, table versions). Databases
+created by `flask init_db` (db.create_all) already have all of it, so every operation
+checks what exists first.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c5e8a3f7b20'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# product_image columns added by the background image pipeline
+IMAGE_COLUMNS = [
+    sa.Column('content_hash', sa.String(length=64), nullable=True),
+    sa.Column('status', sa.String(length=10), nullable=False, server_default='ready'),
+    sa.Column('source_path', sa.String(length=255), nullable=True),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = {column['name'] for column in inspector.get_columns('product_image')}
+    missing = [column for column in IMAGE_COLUMNS if column.name not in existing]
+    if missing:
+        with op.batch_alter_table('product_image', schema=None) as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+
+    op.create_table('image_derivative',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('image_id', sa.Integer(), nullable=False),
+        sa.Column('width', sa.Integer(), nullable=False),
+        sa.Column('format', sa.String(length=10), nullable=False),
+        sa.Column('file_path', sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['image_id'], ['product_image.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_table('table_version',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    op.drop_table('table_version')
+    op.drop_table('image_derivative')
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        for column in reversed(IMAGE_COLUMNS):
+            batch_op.drop_column(column.name)
@@ -0,0 +1,46 @@
+"""add foreign key and lookup indexes
+
+Revision ID: 3f9c2a71d0b4
+Revises: 1c5e8a3f7b20
+Create Date: 2026-10-16 09:00:00.000000
+
+Tables are created by `flask init_db` (db.create_all), which already builds these
+indexes on new databases, so every operation is IF [NOT] EXISTS and the revision is
+safe to apply to both old and new databases.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a71d0b4'
+down_revision = '1c5e8a3f7b20'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_product_category_id', 'product', ['category_id']),
+    ('ix_product_brand_id', 'product', ['brand_id']),
+    ('ix_product_material_id', 'product', ['material_id']),
+    ('ix_product_supplier_id', 'product', ['supplier_id']),
+    ('ix_product_facets', 'product', ['style_id', 'category_id', 'brand_id', 'material_id', 'supplier_id']),
+    ('ix_product_name_id', 'product', ['name', 'id']),
+    ('ix_product_color_association_color_id', 'product_color_association', ['color_id']),
+    ('ix_product_image_product_id_type', 'product_image', ['product_id', 'type']),
+    ('ix_product_image_color_id', 'product_image', ['color_id']),
+    ('ix_product_image_content_hash', 'product_image', ['content_hash']),
+    ('ix_image_derivative_image_id', 'image_derivative', ['image_id']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,55 @@
+"""add dashboard stat counters
+
+Revision ID: 5b7e3d9a1c24
+Revises: 8d41b6e2c9a7
+Create Date: 2026-10-16 15:00:00.000000
+
+The counters are maintained incrementally from here on (app/dashboard.py); the upgrade
+fills them once from the existing catalog, like `flask recompute_dashboard`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e3d9a1c24'
+down_revision = '8d41b6e2c9a7'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = [
+    "INSERT INTO dashboard_stat (metric, key, value) SELECT 'products', 'total', count(*) FROM product",
+    "INSERT INTO dashboard_stat (metric, key, value) SELECT 'products', 'missing_base_photo', count(*) "
+    "FROM product WHERE NOT EXISTS (SELECT 1 FROM product_image "
+    "WHERE product_image.product_id = product.id AND product_image.type = 'base')",
+    "INSERT INTO dashboard_stat (metric, key, value) SELECT 'category', CAST(category_id AS VARCHAR), count(*) "
+    "FROM product WHERE category_id IS NOT NULL GROUP BY category_id",
+    "INSERT INTO dashboard_stat (metric, key, value) SELECT 'brand', CAST(brand_id AS VARCHAR), count(*) "
+    "FROM product WHERE brand_id IS NOT NULL GROUP BY brand_id",
+    "INSERT INTO dashboard_stat (metric, key, value) SELECT 'supplier', CAST(supplier_id AS VARCHAR), count(*) "
+    "FROM product WHERE supplier_id IS NOT NULL GROUP BY supplier_id",
+    "INSERT INTO dashboard_stat (metric, key, value) SELECT 'color', CAST(color_id AS VARCHAR), count(*) "
+    "FROM product_color_association GROUP BY color_id",
+    "INSERT INTO dashboard_stat (metric, key, value) SELECT 'suppliers', 'total', count(*) FROM supplier",
+    "INSERT INTO dashboard_stat (metric, key, value) SELECT 'supplier_type', CAST(supplier_type AS VARCHAR), count(*) "
+    "FROM supplier GROUP BY supplier_type",
+]
+
+
+def upgrade():
+    op.create_table('dashboard_stat',
+        sa.Column('metric', sa.String(length=30), nullable=False),
+        sa.Column('key', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('metric', 'key'),
+        if_not_exists=True,
+    )
+    op.execute("DELETE FROM dashboard_stat")
+    for statement in BACKFILL:
+        op.execute(statement)
+
+
+def downgrade():
+    op.drop_table('dashboard_stat')
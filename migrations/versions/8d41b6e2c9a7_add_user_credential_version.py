@@ -0,0 +1,30 @@
+"""add user credential version
+
+Revision ID: 8d41b6e2c9a7
+Revises: 3f9c2a71d0b4
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41b6e2c9a7'
+down_revision = '3f9c2a71d0b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by `flask init_db` already have the column
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('user')}
+    if 'credential_version' in columns:
+        return
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('credential_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('credential_version')
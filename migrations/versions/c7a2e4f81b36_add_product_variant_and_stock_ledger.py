@@ -0,0 +1,62 @@
+"""add product variants and the stock movement ledger
+
+Revision ID: c7a2e4f81b36
+Revises: 5b7e3d9a1c24
+Create Date: 2026-10-16 23:00:00.000000
+
+product_variant.on_hand is the running total of the variant's stock_movement rows,
+maintained by app/inventory.py (`flask recompute_stock` rebuilds it from the ledger).
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a2e4f81b36'
+down_revision = '5b7e3d9a1c24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_variant',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('color_id', sa.Integer(), nullable=False),
+        sa.Column('sku', sa.String(length=64), nullable=False),
+        sa.Column('price', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('on_hand', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('reorder_level', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['color_id'], ['color.id'], ),
+        sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('product_id', 'color_id', name='uq_product_variant_product_color'),
+        sa.UniqueConstraint('sku'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_product_variant_color_id', 'product_variant', ['color_id'], unique=False, if_not_exists=True)
+
+    op.create_table('stock_movement',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('variant_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=10), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('reference', sa.String(length=100), nullable=True),
+        sa.Column('note', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['variant_id'], ['product_variant.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_stock_movement_variant_id_id', 'stock_movement', ['variant_id', 'id'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_stock_movement_variant_id_id', table_name='stock_movement')
+    op.drop_table('stock_movement')
+
+    op.drop_index('ix_product_variant_color_id', table_name='product_variant')
+    op.drop_table('product_variant')
@@ -0,0 +1,88 @@
+"""add purchase orders and goods receipts
+
+Revision ID: e3b8f0d27a95
+Revises: c7a2e4f81b36
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b8f0d27a95'
+down_revision = 'c7a2e4f81b36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('purchase_order',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('supplier_id', sa.Integer(), nullable=False),
+        sa.Column('reference', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=10), nullable=False),
+        sa.Column('note', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['supplier_id'], ['supplier.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('reference'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_purchase_order_supplier_id', 'purchase_order', ['supplier_id'], unique=False, if_not_exists=True)
+
+    op.create_table('purchase_order_line',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('variant_id', sa.Integer(), nullable=False),
+        sa.Column('quantity_ordered', sa.Integer(), nullable=False),
+        sa.Column('quantity_received', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('unit_cost', sa.Numeric(precision=10, scale=2), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['purchase_order.id'], ),
+        sa.ForeignKeyConstraint(['variant_id'], ['product_variant.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('order_id', 'variant_id', name='uq_purchase_order_line_order_variant'),
+        if_not_exists=True,
+    )
+
+    op.create_table('goods_receipt',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('supplier_id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('reference', sa.String(length=50), nullable=False),
+        sa.Column('note', sa.String(length=255), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['purchase_order.id'], ),
+        sa.ForeignKeyConstraint(['supplier_id'], ['supplier.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('supplier_id', 'reference', name='uq_goods_receipt_supplier_reference'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_goods_receipt_order_id', 'goods_receipt', ['order_id'], unique=False, if_not_exists=True)
+
+    op.create_table('goods_receipt_line',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('receipt_id', sa.Integer(), nullable=False),
+        sa.Column('variant_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('unit_cost', sa.Numeric(precision=10, scale=2), nullable=True),
+        sa.ForeignKeyConstraint(['receipt_id'], ['goods_receipt.id'], ),
+        sa.ForeignKeyConstraint(['variant_id'], ['product_variant.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_goods_receipt_line_receipt_id', 'goods_receipt_line', ['receipt_id'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_goods_receipt_line_receipt_id', table_name='goods_receipt_line')
+    op.drop_table('goods_receipt_line')
+    op.drop_index('ix_goods_receipt_order_id', table_name='goods_receipt')
+    op.drop_table('goods_receipt')
+    op.drop_table('purchase_order_line')
+    op.drop_index('ix_purchase_order_supplier_id', table_name='purchase_order')
+    op.drop_table('purchase_order')
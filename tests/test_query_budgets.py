@@ -0,0 +1,30 @@
+# tests/test_query_budgets.py
+#
+# List pages must run a fixed number of statements however many rows they show; the
+# app fixture runs with QUERY_DETECTOR='raise', so a lazy load per row also fails.
+
+import pytest
+from app.benchmarks import BENCH_PASSWORD, seed_dataset
+
+ROWS = 30
+
+
+@pytest.fixture
+def admin_client(app, client):
+    """Test client logged in as the seeded Admin, over ROWS products and suppliers."""
+    seed_dataset(products=ROWS, suppliers=ROWS, colors=5, images_per_product=1, users=2)
+    # Each request gets its own app context, as in production, so `g` is not shared
+    with app.app_context():
+        client.post('/login', data={'username': 'bench-admin', 'password': BENCH_PASSWORD})
+    return client
+
+
+@pytest.mark.parametrize('url, max_queries', [
+    ('/products/', 5),
+    ('/suppliers/', 3),
+    ('/products/styles', 3),
+])
+def test_list_query_budget(app, admin_client, query_budget, url, max_queries):
+    with app.app_context(), query_budget(max_queries):
+        response = admin_client.get(url)
+    assert response.status_code == 200